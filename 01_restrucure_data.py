@@ -6,10 +6,23 @@ import re
 from tqdm import tqdm
 
 # Import Homebrew
-from src.utils.preprocessing import preprocess_trades, preprocess_orders, preprocess_events
-from src.constants.constants import STOCKS, PATHS, MONTHS_STR
+from src.utils.preprocessing import preprocess_orders_to_parquet, COMPACT_PROFILE
+from src.utils.preprocessing.polars_backend import preprocessing_functions
+from src.constants.constants import STOCKS, PATHS, MONTHS_STR, PREPROCESSING_BACKEND
 from src.utils.time_utils import timeit
 
+
+# How the order, history and trade files are written (compression, row
+# groups, dtypes, see src/utils/preprocessing/storage_profile.py). The row
+# group statistics on o_dtm_va let windowed reconstructions skip the rest of
+# the day.
+STORAGE_PROFILE = COMPACT_PROFILE
+
+# Order files (VHOX) preprocessed by chunks of rows (memory bounded by the
+# chunk, rows kept in file order), None to read each file at once. Chunks are
+# only read by the pandas backend.
+ORDERS_CHUNK_SIZE = 500_000
+
 @timeit
 def create_isin_folder_structure(name: str, path: str) -> None:
     """
@@ -52,6 +65,9 @@ def reorganize_data() -> None:
         name: str, name of the new folder. eg: 'trades'
         path: str, path to the new folder. eg: 'root/trades/'
         """
+        # Preprocessing functions of the backend (pandas or polars)
+        preprocessing = preprocessing_functions(PREPROCESSING_BACKEND)
+        stream_orders = ORDERS_CHUNK_SIZE is not None and PREPROCESSING_BACKEND == 'pandas'
         
         # For each month
         for month in tqdm(MONTHS_STR):
@@ -64,7 +80,7 @@ def reorganize_data() -> None:
                 event_file = [file for file in os.listdir(os.path.join(PATHS['raw'], month, date)) if file[-4:] == '.csv'][0]
                 origin_path = os.path.join(PATHS['raw'], month, date, event_file)
                 destination_path = os.path.join(PATHS['root'], 'events', event_file[:-4] + '.parquet')
-                df = preprocess_events(origin_path)
+                df = preprocessing['events'](origin_path)
                 df.to_parquet(destination_path, index=False)
                 del df
                 
@@ -83,24 +99,27 @@ def reorganize_data() -> None:
                                 if re.match(pattern='^VHOX_.*', string=file):
                                     origin_path = os.path.join(PATHS['raw'], month, date, isin_group, isin, file)
                                     destination_path = os.path.join(PATHS['root'], 'orders', isin, file[:-4] + '.parquet')
-                                    df = preprocess_orders(origin_path)
-                                    df.to_parquet(destination_path, index=False)
-                                    del df
+                                    if stream_orders:
+                                        preprocess_orders_to_parquet(origin_path, destination_path, STORAGE_PROFILE, chunk_size=ORDERS_CHUNK_SIZE)
+                                    else:
+                                        df = preprocessing['orders'](origin_path)
+                                        STORAGE_PROFILE.write(df, destination_path, 'orders')
+                                        del df
                                 
                                 # Trade files
                                 elif re.match(pattern='^VHD_.*', string=file):
                                     origin_path = os.path.join(PATHS['raw'], month, date, isin_group, isin, file)
                                     destination_path = os.path.join(PATHS['root'], 'trades', isin, file[:-4] + '.parquet')
-                                    df = preprocess_trades(origin_path)
-                                    df.to_parquet(destination_path, index=False)
+                                    df = preprocessing['trades'](origin_path)
+                                    STORAGE_PROFILE.write(df, destination_path, 'trades')
                                     del df
 
                                 # History files
                                 elif re.match(pattern='^VHOXhistory.*', string=file):
                                     origin_path = os.path.join(PATHS['raw'], month, date, isin_group, isin, file)
                                     destination_path = os.path.join(PATHS['root'], 'histories', isin, file[:-4] + '.parquet')
-                                    df = preprocess_orders(origin_path)
-                                    df.to_parquet(destination_path, index=False)
+                                    df = preprocessing['orders'](origin_path)
+                                    STORAGE_PROFILE.write(df, destination_path, 'histories')
                                     del df
             #break # Stop after 1 month (for testing only)
 
@@ -111,7 +130,7 @@ if __name__ == '__main__':
     for key, value in PATHS.items():
         if key in ('root', 'raw'):
             continue
-        elif key in ('orders', 'trades', 'histories', 'removed_orders', 'limit_order_books', 'volume_by_interval'): 
+        elif key in ('orders', 'trades', 'histories', 'removed_orders', 'limit_order_books', 'volume_by_interval', 'checkpoints', 'replay_cache'): 
             create_isin_folder_structure(name=key, path=value)
         else:
             create_single_folder(name=key, path=value)
@@ -3,11 +3,11 @@ import os
 
 # Import Third-Party
 from tqdm import tqdm
-import pandas as pd
-from pathlib import Path
 
 # Import Homebrew
-from src.constants.constants import STOCKS, PATHS
+from src.constants.constants import STOCKS, PATHS, PREPROCESSING_BACKEND
+from src.orderbook.removed_orders import get_removed_orders_file
+from src.utils.preprocessing import polars_backend
 
 
 def get_removed_orders() -> None:
@@ -25,6 +25,8 @@ def get_removed_orders() -> None:
     This is because if an order is not updated during the day (not in order file)
     and is executed during that day, the information is only obtainable in the 
     history file when that order is re-introduced.
+    (see src/orderbook/removed_orders.py, 04_recreate_orderbooks can also derive
+    them in memory with fused=True).
 
     Returns
     -------
@@ -34,44 +36,14 @@ def get_removed_orders() -> None:
     o_dtm_mo, o_id_fd, o_cha_id, o_state.
     """
 
+    # Backend of the preprocessing (pandas or polars)
+    get_file = polars_backend.get_removed_orders_file if PREPROCESSING_BACKEND == 'polars' else get_removed_orders_file
+
     for isin in tqdm(STOCKS.all):
         for file in tqdm(os.listdir(os.path.join(PATHS['orders'], isin))):
             # Date of the file
             date = file[-16:-8]
-
-            # Paths
-            origin_orders = os.path.join(PATHS['orders'], isin, file)
-            origin_history = os.path.join(PATHS['histories'], isin, f'VHOXhistory_{isin}_{date}.parquet')
-            output_filename = f'removedOrders_{isin}_{date}.parquet'
-            destination = os.path.join(PATHS['removed_orders'], isin, output_filename)
-
-            # Columns needed 
-            columns_to_select = ['o_dtm_br', 'o_id_fd', 'o_bs', 'o_state', 'o_account', 'o_member', 'o_nb_tr']
-
-            # Read files and merge history and orders
-            df_orders = pd.read_parquet(origin_orders)
-            if len(df_orders) == 0:
-                p = Path(origin_orders)
-                print(f'File: \'{p.stem}\' is empty (path: \'{p.parent}\').')
-
-            try:
-                df_history = pd.read_parquet(origin_history)
-                df = pd.concat([df_history[columns_to_select], df_orders[columns_to_select]])
-
-            except FileNotFoundError:
-                df = df_orders
-                p = Path(origin_history)
-                print(f'File: \'{p.stem}\' does not exist (path: \'{p.parent}\').')
-            
-            # Specify the unvalid states (everything except order removal)
-            unvalid_states = ['0', '1', '5']
-            
-            # Create df with only removed orders
-            removed_orders = df.drop_duplicates(subset=['o_id_fd'], keep='last')
-            removed_orders = removed_orders[~removed_orders.o_state.isin(unvalid_states)]
-
-            # Save file
-            removed_orders.to_parquet(destination, index=False)
+            get_file(isin, date)
         #break # Limit to one isin (for testing only)
 
 
@@ -6,7 +6,8 @@ import pandas as pd
 from tqdm import tqdm
 
 # Import Homebrew
-from src.constants.constants import STOCKS, PATHS, CLOSING_AUCTION_CUTOFF
+from src.constants.constants import STOCKS, PATHS, CLOSING_AUCTION_CUTOFF, PREPROCESSING_BACKEND
+from src.utils.preprocessing import polars_backend
 from src.utils.time_utils import timeit
 
 
@@ -16,7 +17,18 @@ def get_auctions() -> None:
     Get auction time and price for each day and isin.
     Save it all to one file. (Can be saved to csv for easier readability).
     """
+    if PREPROCESSING_BACKEND == 'polars':
+        df_all_auctions = polars_backend.get_auctions()
+    else:
+        df_all_auctions = auctions_pandas()
 
+    # Save file
+    df_all_auctions.to_parquet(os.path.join(PATHS['root'], 'auctions.parquet'), index=False)
+
+
+def auctions_pandas() -> pd.DataFrame:
+    """ Auction time and price for each day and isin, one trade file read
+    at a time. """
     columns = [
         'isin', 
         'date', 
@@ -67,8 +79,8 @@ def get_auctions() -> None:
             else:
                 df_all_auctions = df_row.copy()
 
-    # Save file
-    df_all_auctions.to_parquet(os.path.join(PATHS['root'], 'auctions.parquet'), index=False)
+    return df_all_auctions
+
 
 if __name__ == '__main__':
     # Get auctions 
@@ -2,6 +2,7 @@
 import os
 import datetime as dt
 import logging
+from typing import List, Tuple
 
 # Import Third-Party
 import pandas as pd
@@ -13,173 +14,285 @@ sns.set()
 # Import Homebrew
 from logger import logger
 from src.orderbook.orderbook import Orderbook
+from src.orderbook.sampling import Sampler, SnapshotSink, EventClock, TradeClock, time_grids, SNAPSHOT_START
+from src.orderbook.checkpoint import list_checkpoints, nearest_checkpoint, save_checkpoint, load_checkpoint
+from src.orderbook.inputs import ReplayTapes, read_orders, read_history, read_removed_orders, read_trades, read_auction_times
+from src.orderbook.replay_cache import open_replay_cache, read_tapes
+from src.orderbook.removed_orders import read_fused_tapes
+from src.orderbook.lob_dataset import LOB_ROW_GROUP_SIZE
+from src.orderbook.tensor_export import TensorSink
+from src.orderbook.change_stream import ChangeStreamSink
 from src.utils.time_utils import timeit
-from src.constants.constants import STOCKS, PATHS, DATES
+from src.utils.gc_utils import replay_gc
+from src.utils.prefetch_utils import prefetch
+from src.constants.constants import STOCKS, PATHS, DATES, MARKET_OPEN, MARKET_CLOSE
+
+
+# Time grids of the snapshots (name: step), from SNAPSHOT_START to MARKET_CLOSE.
+SNAPSHOT_STEPS = {'1s': '1s', '1min': '1min'}
+
+# Clock of the snapshots exported as tensors (see tensor_export).
+TENSOR_CLOCK = '1s'
 
 
 @timeit
-def reconstruct_orderbook(isin: str, date: dt.date) -> None:
-    # READ FILES
-    #---------------------------------------------------------------------------
-    date_str = format(date, '%Y%m%d')
-    date_datetime = dt.datetime.strptime(date_str, '%Y%m%d').date()
+def reconstruct_orderbook(
+    isin: str, date: dt.date, start: dt.time=None, end: dt.time=None, 
+    gc_mode: str='frozen', checkpoint_every: dt.timedelta=None,
+    inputs: ReplayTapes=None, fused: bool=False, persist_removed_orders: bool=False,
+    export_tensors: bool=False, change_stream: bool=False
+) -> None:
+    """
+    Reconstructs the orderbook of an isin for one day (or a window of the day)
+    and saves its snapshots. A window starts from the latest checkpoint at or
+    before start (if any) and stops at end, only the row groups of the order 
+    file up to end are read (unless the inputs are given).
+
+    Args:
+        isin (str): isin code of the security.
+        date (dt.date): date of the orders and trades.
+        start (dt.time, optional): start of the window. Defaults to None (the
+            whole day).
+        end (dt.time, optional): end of the window. Defaults to None (the 
+            whole day).
+        gc_mode (str, optional): garbage collector mode during the replay (see
+            replay_gc). Defaults to 'frozen'.
+        checkpoint_every (dt.timedelta, optional): interval between the 
+            checkpoints saved during the replay (eg: CHECKPOINT_EVERY), for
+            the windows of later replays. Defaults to None (no checkpoints).
+        inputs (ReplayTapes, optional): inputs already read (see read_tapes).
+            Defaults to None (read here).
+        fused (bool, optional): the removed orders are derived from the order
+            and history files read for the replay (see read_fused_tapes),
+            02_get_removed_orders is not needed. Defaults to False.
+        persist_removed_orders (bool, optional): save the removed orders
+            derived in fused mode. Defaults to False.
+        export_tensors (bool, optional): append the snapshots of TENSOR_CLOCK
+            to the tensor of the isin (see tensor_export), whole days only.
+            Defaults to False.
+        change_stream (bool, optional): also save the changes of the levels
+            after every message and at every snapshot, with keyframes (see
+            change_stream). Defaults to False.
+    """
+    if inputs is None and fused:
+        inputs = read_inputs(isin, format(date, '%Y%m%d'), fused, persist_removed_orders)
+    with replay_gc(gc_mode):
+        _reconstruct_orderbook(isin, date, start, end, checkpoint_every, inputs, export_tensors, change_stream)
 
-    # Read history file (VHOXhistory)
-    history_name = f'VHOXhistory_{isin}_{date_str}.parquet'
-    history_path = os.path.join(PATHS['histories'], isin, history_name)
-    df_history = pd.read_parquet(history_path)
 
-    # Read order file (VHOX)
-    orders_name = f'VHOX_{isin}_{date_str}.parquet'
-    orders_path = os.path.join(PATHS['orders'], isin, orders_name)
-    df_orders = pd.read_parquet(orders_path)
+def _reconstruct_orderbook(
+    isin: str, date: dt.date, start: dt.time, end: dt.time, checkpoint_every: dt.timedelta,
+    inputs: ReplayTapes, export_tensors: bool=False, change_stream: bool=False
+) -> None:
+    date_str = format(date, '%Y%m%d')
+    date_datetime = dt.datetime.strptime(date_str, '%Y%m%d').date()
 
-    # Read removed order file
-    removed_orders_name = f'removedOrders_{isin}_{date_str}.parquet'
-    removed_orders_path = os.path.join(PATHS['removed_orders'], isin, removed_orders_name)
-    df_removed_orders = pd.read_parquet(removed_orders_path)
+    # Window (int64 nanoseconds) and checkpoint to start from
+    start_ns = pd.Timestamp(dt.datetime.combine(date_datetime, start)).value if start is not None else None
+    end_ns = pd.Timestamp(dt.datetime.combine(date_datetime, end)).value if end is not None else None
+    checkpoint = nearest_checkpoint(isin, date_str, start_ns) if start_ns is not None else None
 
-    # Read trades file (VHD)
-    trades_name = f'VHD_{isin}_{date_str}.parquet'
-    trades_path = os.path.join(PATHS['trades'], isin, trades_name)
-    df_trades = pd.read_parquet(trades_path)
+    # READ FILES
+    #---------------------------------------------------------------------------
 
-    # DATAFRAME TO STORE SNAPSHOTS
+    # Replay cache if built (see 07_build_replay_cache), input files otherwise:
+    # order file (VHOX) with only the row groups of the window, no history if
+    # the replay starts from a checkpoint. All times are handled as int64 
+    # nanoseconds during the replay
+    if inputs is None:
+        inputs = open_replay_cache(isin, date_str)
+    if inputs is None:
+        inputs = ReplayTapes.from_frames(
+            isin, date_str,
+            read_history(isin, date_str) if checkpoint is None else None,
+            read_orders(isin, date_str, after=checkpoint, end=end_ns),
+            read_removed_orders(isin, date_str),
+            read_trades(isin, date_str),
+        )
+
+    # CLOCKS AND SNAPSHOTS STORAGE
     #---------------------------------------------------------------------------
-    rows = []
+    depth = 5
+    bar_size = dt.timedelta(minutes=1) # time-weighted liquidity and order flow bars
+
+    # Snapshots every second, every minute and after every trade (shared book
+    # state when several clocks sample at the same time)
+    snapshot_start = max(SNAPSHOT_START, start) if start is not None else SNAPSHOT_START
+    snapshot_end = min(MARKET_CLOSE, end) if end is not None else MARKET_CLOSE
+    clocks = time_grids(date_datetime, snapshot_start, snapshot_end, SNAPSHOT_STEPS)
+    clocks.append(TradeClock('trades'))
+    snapshots = SnapshotSink(depth)
+    tensors = TensorSink(TENSOR_CLOCK, depth) if export_tensors and start is None and end is None else None
+
+    # Changes of the levels at every sample, after every message at least
+    changes = ChangeStreamSink() if change_stream else None
+    if changes is not None:
+        clocks.append(EventClock('changes'))
+
+    # Checkpoints of the book (not already saved) during the replay
+    if checkpoint_every is not None:
+        clocks += time_grids(date_datetime, MARKET_OPEN, MARKET_CLOSE, {'checkpoint': checkpoint_every})
+    saved_checkpoints = set(list_checkpoints(isin, date_str))
+
+    def sink(clock: str, timestamp: int, orderbook: Orderbook) -> None:
+        if changes is not None:
+            changes(clock, timestamp, orderbook)
+        if clock == 'changes':
+            return
+        if clock != 'checkpoint':
+            snapshots(clock, timestamp, orderbook)
+            if tensors is not None:
+                tensors(clock, timestamp, orderbook)
+        elif timestamp not in saved_checkpoints:
+            save_checkpoint(orderbook, isin, date_str, timestamp)
+
+    sampler = Sampler(clocks, sink)
  
     # WE SET UP THE ORDERBOOK CLASS
     #---------------------------------------------------------------------------
-
-    # Get (and set) auction times
-    df_auctions = pd.read_parquet(os.path.join(PATHS['root'], 'auctions.parquet'))
-    mask = (df_auctions['isin'] == isin) & (df_auctions['date'] == date_datetime)
-    auct_open_datetime = df_auctions.loc[mask].auct_open_datetime.item()
-    auct_close_datetime = df_auctions.loc[mask].auct_close_datetime.item()
-
-    orderbook = Orderbook(date, isin, auct_open_datetime, auct_close_datetime)#####
-    orderbook.set_removed_orders(df_removed_orders)
-    orderbook.set_trades(df_trades)
-
-    # WE FIRST ADD TO THE BOOK ALL ORDERS PRESENT BEFORE THE START OF THE DAY
-    #---------------------------------------------------------------------------
-    for message in df_history.to_dict('records'):
-        orderbook.process(message)
+    if checkpoint is not None:
+        # Book at the checkpoint, history and messages before already processed
+        orderbook = load_checkpoint(isin, date_str, checkpoint, inputs.removed_orders, inputs.trades())
+        sampler.skip(checkpoint)
+        logger.info(f'Replay from checkpoint: {checkpoint}')
+
+    else:
+        # Get (and set) auction times
+        auct_open_datetime, auct_close_datetime = read_auction_times(isin, date_datetime)
+
+        orderbook = Orderbook(date, isin, auct_open_datetime, auct_close_datetime)#####
+        orderbook.set_inputs(inputs.removed_orders, inputs.trades())
+
+        # WE FIRST ADD TO THE BOOK ALL ORDERS PRESENT BEFORE THE START OF THE DAY
+        #-----------------------------------------------------------------------
+        for message in inputs.history_messages():
+            orderbook.process(message)
+
+    # Liquidity integrated over time from the start of continuous trading (or
+    # of the window), order flow statistics of the day only (history excluded)
+    day_start = pd.Timestamp(dt.datetime.combine(date_datetime, MARKET_OPEN)).value
+    orderbook.set_time_weighted_liquidity(bar_size, depth=depth, start=max(day_start, start_ns or day_start))
+    orderbook.set_order_flow_stats(bar_size)
         
     # WE NOW ADD TO THE BOOK ALL ORDERS SUBMITTED FOR AUCTION 1
     #---------------------------------------------------------------------------
 
-    # Create timestamps for orderbook snapshot
-    #timestamps = _create_datetime_range(date_datetime, minutes=1)
-    
-    timestamps = _create_datetime_range(date_datetime, seconds=1)
-    timestamps_for_df = []
-    spreads = []
+    # Last message time to handle (int64 nanoseconds)
+    cutoff = (pd.Timestamp(date_datetime) + dt.timedelta(hours=17, minutes=40)).value
+    if end_ns is not None:
+        cutoff = min(cutoff, end_ns)
 
-    for message in df_orders.to_dict('records'): 
+    for message in inputs.order_messages(after=checkpoint): 
         
         message_dtm = message['o_dtm_va']
-        #next_timestamp = timestamps[-1]
-        #### stop here (to have orderbook before auction)
-
-        #print("\n", message_dtm)
-        #print(timestamps[-1])
 
-        # Get snapshot of the orderbook
-        while len(timestamps) > 0 and message_dtm > timestamps[-1] :
-            timestamp = timestamps.pop()
-
-            # remove cancelled orders between last maessage and snapshot
-            orderbook._check_for_order_cancelations(timestamp)
-            
-            timestamps_for_df.append(timestamp)
-            logger.info(f'Snapshot: {timestamp}')
-            logger.info(f'Orderbook: {orderbook.get_levels(5)}')
-            logger.info(f'Spread: {orderbook.spread}')
-            logger.debug(f'Next trade: {orderbook.trades[-1]}')
-            logger.debug(f'Orders best bid: {orderbook.best_bid.orders}')
-            logger.debug(f'Orders best ask: {orderbook.best_ask.orders}')
-            logger.debug(f'Last price: {orderbook.last_trading_price}')
-            logger.debug(f'Last message: {orderbook.current_message_datetime}')
-
-            spreads.append(orderbook.spread)
-
-            if orderbook.spread == 0:
-                #raise NotImplementedError
-                logger.error(f'{timestamp} - Spread null: {orderbook.spread}')
-                pass
-            elif orderbook.spread < 0:
-                logger.error(f'{timestamp} - Spread negative: {orderbook.spread}')
-                pass
-
-
-            row = {
-                'timestamp': timestamp,
-                'spread': orderbook.spread,
-                'best_bid': orderbook.best_bid.price,
-                'best_ask': orderbook.best_ask.price,
-                'depth_3': None,
-                'depth_5': None,
-            }
-
-            levels = orderbook.get_levels(depth=5, detailed=True)
-
-            for side in levels.keys():
-                for n, limit_level in enumerate(levels[side]):
-                    row[f'{side}_{n}_price'] = limit_level.price
-                    row[f'{side}_{n}_qty'] = limit_level.size
-                    row[f'{side}_{n}_hft_dis'] = limit_level.disclosed_size_hft
-                    row[f'{side}_{n}_mix_dis'] = limit_level.disclosed_size_mixed
-                    row[f'{side}_{n}_non_dis'] = limit_level.disclosed_size_non
-                    row[f'{side}_{n}_hft_hid'] = limit_level.hidden_size_hft
-                    row[f'{side}_{n}_mix_hid'] = limit_level.hidden_size_mixed
-                    row[f'{side}_{n}_non_hid'] = limit_level.hidden_size_non
-                    row[f'EMPTY FOR SUM'] = limit_level.hidden_size_non
-
-            
-            rows.append(row)
-            
+        # Snapshots of the time grids before the message (canceled orders 
+        # removed up to each snapshot)
+        sampler.before_message(orderbook, message_dtm)
+        if end_ns is not None and message_dtm > end_ns:
+            break
             
         logger.debug(f'{message["o_dtm_va"]} - Handling message: {message["o_id_fd"]} | {message["o_cha_id"]}')
         orderbook.process(message)
-        #### or here (to have auction)
+
+        # Snapshots of the event clocks (every trade), within the window
+        if start_ns is None or message_dtm >= start_ns:
+            sampler.after_message(orderbook, message_dtm)
        
-        if message_dtm.time() > dt.time(hour=17, minute=40, second=0) or len(timestamps) == 0: #### Testing 
+        # Nothing sampled after the last grid time (the trade, event and
+        # checkpoint clocks do not keep the replay going)
+        if message_dtm > cutoff or sampler.grids_done:
             break
-    
-    df = pd.DataFrame.from_records(rows)
-    export_path = os.path.join(PATHS['limit_order_books'], isin, f'LOBs_{isin}_{date_str}.parquet')
-    #df.to_parquet(export_path, index=False)
-    df.to_excel(os.path.join(PATHS['limit_order_books'], isin, f'LOBs_{isin}_{date_str}.xlsx'), index=False)
 
-    #print(df.tail())
+    # Snapshots of the window after its last message
+    if end_ns is not None:
+        sampler.before_message(orderbook, end_ns + 1)
+    
+    logger.info(f'Allocations: {orderbook.allocation_stats}')
+
+    # One file per clock, by row groups of an hour (see lob_dataset)
+    folder = os.path.join(PATHS['limit_order_books'], isin)
+    suffix = _window_suffix(start, end)
+    for clock in snapshots.rows:
+        df = snapshots.to_frame(clock)
+        df.to_parquet(os.path.join(folder, f'LOBs_{isin}_{date_str}{suffix}_{clock}.parquet'), index=False, row_group_size=LOB_ROW_GROUP_SIZE)
+        if clock == '1s':
+            df.to_excel(os.path.join(folder, f'LOBs_{isin}_{date_str}{suffix}.xlsx'), index=False)
+
+    if tensors is not None:
+        tensors.append(isin)
+    if changes is not None:
+        df_changes, df_keyframes = changes.to_frames()
+        df_changes.to_parquet(os.path.join(folder, f'LOBChanges_{isin}_{date_str}{suffix}.parquet'), index=False, compression='zstd')
+        df_keyframes.to_parquet(os.path.join(folder, f'LOBKeyframes_{isin}_{date_str}{suffix}.parquet'), index=False, compression='zstd')
+
+    # Time-weighted liquidity up to the last snapshot of the grids
+    last_snapshot = max((snapshots.rows[name][-1]['timestamp'] for name in SNAPSHOT_STEPS if snapshots.rows.get(name)), default=None)
+    if last_snapshot is not None:
+        df_time_weighted = orderbook.get_time_weighted_liquidity(end=last_snapshot)
+        df_time_weighted.to_excel(os.path.join(folder, f'TWLiquidity_{isin}_{date_str}{suffix}.xlsx'), index=False)
+
+    # Order flow statistics per interval and member category (bars of the window)
+    df_order_flow = orderbook.get_order_flow_stats()
+    if start_ns is not None:
+        df_order_flow = df_order_flow.loc[df_order_flow['bar_start'] >= pd.Timestamp(start_ns).floor(bar_size)]
+    df_order_flow.to_excel(os.path.join(folder, f'OrderFlow_{isin}_{date_str}{suffix}.xlsx'), index=False)
 
     #### debugging
     #orderbook.df_trades.to_csv('/Users/australien/Desktop/estimated_trades.csv')
 
 
-def _create_datetime_range(curr_date: dt.date, **kwargs):
+def read_inputs(isin: str, date_str: str, fused: bool=False, persist_removed_orders: bool=False) -> ReplayTapes:
+    """ Inputs of a whole day: replay cache if built, otherwise the input
+    files, with the removed orders derived in memory if fused (see
+    reconstruct_orderbook). """
+    if not fused:
+        return read_tapes(isin, date_str)
+    inputs = open_replay_cache(isin, date_str)
+    if inputs is None:
+        inputs = read_fused_tapes(isin, date_str, persist=persist_removed_orders)
+    return inputs
+
+
+def reconstruct_orderbooks(
+    jobs: List[Tuple[str, dt.date]], prefetch_depth: int=1, fused: bool=False,
+    persist_removed_orders: bool=False, **kwargs
+) -> None:
     """
-    Returns a list of datetime object spaced by the specified frequency. The 
-    datetimes will start at 9am + delta and end at 5:30 pm.
-    **kwargs take the form: unit=frequency.
+    Reconstructs the orderbooks of several days (see reconstruct_orderbook).
+    The input files of the next jobs are read in a background thread while the
+    current day is replayed.
+
+    Args:
+        jobs (List[Tuple[str, dt.date]]): isins and dates.
+        prefetch_depth (int, optional): number of jobs read ahead. Defaults to 1.
+        fused (bool, optional): removed orders derived in memory (see
+            reconstruct_orderbook). Defaults to False.
+        persist_removed_orders (bool, optional): save the removed orders
+            derived in fused mode. Defaults to False.
+        **kwargs: arguments of reconstruct_orderbook (start, end, gc_mode, ...).
     """
-    time_delta = dt.timedelta(**kwargs)
+    def load(job: Tuple[str, dt.date]) -> ReplayTapes:
+        return read_inputs(job[0], format(job[1], '%Y%m%d'), fused, persist_removed_orders)
 
-    start = pd.to_datetime(curr_date) + dt.timedelta(hours=9, minutes=1)
-    end = pd.to_datetime(curr_date) + dt.timedelta(hours=17, minutes=30)
-    
-    datetime_range = pd.date_range(start, end, freq=time_delta).tolist()
-    datetime_range_sorted = sorted(datetime_range, reverse=True)
+    for (isin, date), inputs in prefetch(jobs, load, depth=prefetch_depth):
+        print(f'Reconstructing order books - {isin} - {date}')
+        try:
+            reconstruct_orderbook(isin, date, inputs=inputs.result(), **kwargs)
+        except Exception as e:
+            print(f'Reconstruction failed: {isin} {date} ({e!r})')
 
-    return datetime_range_sorted
+
+def _window_suffix(start: dt.time, end: dt.time) -> str:
+    """ Suffix of the output files of a window, eg: '_100000-110000'. """
+    if start is None and end is None:
+        return ''
+    start_str = format(start, '%H%M%S') if start is not None else ''
+    end_str = format(end, '%H%M%S') if end is not None else ''
+    return f'_{start_str}-{end_str}'
 
 
 if __name__ == '__main__':
     isin = STOCKS.all[0]
-    
-    for date in tqdm(DATES.all):
-        if date == dt.date(2017, 1, 3):
-            print(f'Reconstructing order books - {isin} - {date}')
-            reconstruct_orderbook(isin, date)
-            break
\ No newline at end of file
+    jobs = [(isin, date) for date in DATES.all if date == dt.date(2017, 1, 3)] #### Testing
+    reconstruct_orderbooks(jobs)
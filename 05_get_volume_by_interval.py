@@ -0,0 +1,76 @@
+# Import Built-Ins
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+# Import Third-Party
+import pandas as pd
+from tqdm import tqdm
+
+# Import Homebrew
+from src.constants.constants import STOCKS, PATHS
+from src.utils.time_utils import timeit
+from src.volume import volume_by_intervals
+from src.volume.volume_by_interval import TRADE_COLUMNS
+
+
+# Bar sizes computed (all from one read of each trade file).
+BAR_SIZES = ['1s', '1min', '5min']
+
+
+def volume_by_interval_file(isin: str, date: str, bar_sizes: List[str]=BAR_SIZES) -> int:
+    """
+    Computes the volume by interval of one trade file (isin, day) for each bar
+    size and saves it in the volume_by_interval folder, partitioned by bar size:
+    {isin}/bar_size={bar_size}/volumeByInterval_{isin}_{date}.parquet.
+
+    Args:
+        isin (str): isin code of the security.
+        date (str): date of the trade file (YYYYMMDD).
+        bar_sizes (List[str], optional): bar sizes. Defaults to BAR_SIZES.
+
+    Returns:
+        int: number of trades in the file.
+    """
+    trades_path = os.path.join(PATHS['trades'], isin, f'VHD_{isin}_{date}.parquet')
+    df_trades = pd.read_parquet(trades_path, columns=TRADE_COLUMNS)
+
+    for bar_size, df in volume_by_intervals(df_trades, bar_sizes).items():
+        folder = os.path.join(PATHS['volume_by_interval'], isin, f'bar_size={bar_size}')
+        os.makedirs(folder, exist_ok=True)
+        df.to_parquet(os.path.join(folder, f'volumeByInterval_{isin}_{date}.parquet'), index=False)
+
+    return len(df_trades)
+
+
+@timeit
+def get_volume_by_interval(bar_sizes: List[str]=BAR_SIZES, max_workers: int=None) -> None:
+    """
+    Volume by interval for every isin and day, trade files are handled in
+    parallel (one process per file).
+
+    Args:
+        bar_sizes (List[str], optional): bar sizes. Defaults to BAR_SIZES.
+        max_workers (int, optional): number of processes. Defaults to None
+            (number of CPUs).
+    """
+    tasks = []
+    for isin in STOCKS.all:
+        for file in os.listdir(os.path.join(PATHS['trades'], isin)):
+            # Date of the file
+            date = file[-16:-8]
+            tasks.append((isin, date))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(volume_by_interval_file, isin, date, bar_sizes): (isin, date) for isin, date in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                future.result()
+            except Exception as e:
+                isin, date = futures[future]
+                print(f'Volume by interval failed: {isin} {date} ({e})')
+
+
+if __name__ == '__main__':
+    print('Getting volume by interval ...')
+    get_volume_by_interval()
@@ -0,0 +1,44 @@
+# Import Built-Ins
+import os
+import datetime as dt
+
+# Import Third-Party
+from tqdm import tqdm
+
+# Import Homebrew
+from src.orderbook.cross_section import replay_cross_section
+from src.constants.constants import STOCKS, PATHS, DATES
+from src.utils.time_utils import timeit
+
+
+# Grid of the cross-sectional snapshots and number of isin groups (processes).
+CROSS_SECTION_STEP = '1min'
+CROSS_SECTION_GROUPS = 4
+
+
+@timeit
+def get_cross_section(date: dt.date, step: str=CROSS_SECTION_STEP, groups: int=CROSS_SECTION_GROUPS) -> None:
+    """
+    Replays the books of every isin for one day on a shared clock and saves the
+    synchronized snapshots in the limit order book folder:
+    cross_section/LOBs_cross_section_{date}_{step}.parquet.
+
+    Args:
+        date (dt.date): date of the orders and trades.
+        step (str, optional): step of the grid. Defaults to CROSS_SECTION_STEP.
+        groups (int, optional): number of isin groups, replayed in parallel. 
+            Defaults to CROSS_SECTION_GROUPS.
+    """
+    date_str = format(date, '%Y%m%d')
+    df, stats = replay_cross_section(STOCKS.all, date, groups=groups, step=step)
+    print(f'Cross section {date_str}: {stats}')
+
+    folder = os.path.join(PATHS['limit_order_books'], 'cross_section')
+    os.makedirs(folder, exist_ok=True)
+    df.to_parquet(os.path.join(folder, f'LOBs_cross_section_{date_str}_{step}.parquet'), index=False)
+
+
+if __name__ == '__main__':
+    print('Replaying cross sections ...')
+    for date in tqdm(DATES.all):
+        get_cross_section(date)
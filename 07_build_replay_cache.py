@@ -0,0 +1,44 @@
+# Import Built-Ins
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Import Third-Party
+from tqdm import tqdm
+
+# Import Homebrew
+from src.constants.constants import STOCKS, PATHS
+from src.orderbook.replay_cache import write_replay_cache
+from src.utils.time_utils import timeit
+
+
+@timeit
+def build_replay_cache(max_workers: int=None) -> None:
+    """
+    Builds the replay cache (see src/orderbook/replay_cache.py) of every isin
+    and day, one process per file. Replays (04, 06, book_at) then map the
+    cached tapes instead of decoding the Parquet files.
+
+    Args:
+        max_workers (int, optional): number of processes. Defaults to None
+            (number of CPUs).
+    """
+    tasks = []
+    for isin in STOCKS.all:
+        for file in os.listdir(os.path.join(PATHS['orders'], isin)):
+            # Date of the file
+            date = file[-16:-8]
+            tasks.append((isin, date))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(write_replay_cache, isin, date): (isin, date) for isin, date in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                future.result()
+            except Exception as e:
+                isin, date = futures[future]
+                print(f'Replay cache failed: {isin} {date} ({e})')
+
+
+if __name__ == '__main__':
+    print('Building replay cache ...')
+    build_replay_cache()
@@ -0,0 +1,92 @@
+# Import Built-Ins
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+# Import Third-Party
+import pandas as pd
+from tqdm import tqdm
+
+# Import Homebrew
+from src.constants.constants import STOCKS, PATHS
+from src.utils.time_utils import timeit
+from src.trade_analytics import trade_costs, summarize_trade_costs, pool_summaries, read_quotes
+from src.trade_analytics.trade_costs import HORIZONS, TRADE_COLUMNS
+
+
+def trade_analytics_file(isin: str, date: str, horizons: List[str]=HORIZONS) -> pd.DataFrame:
+    """
+    Costs of the trades of one trade file (isin, day) against the books
+    reconstructed by 04_recreate_orderbooks (see trade_costs), saved in the
+    trade_analytics folder: {isin}/tradeAnalytics_{isin}_{date}.parquet.
+
+    Args:
+        isin (str): isin code of the security.
+        date (str): date of the trade file (YYYYMMDD).
+        horizons (List[str], optional): horizons. Defaults to HORIZONS.
+
+    Returns:
+        pd.DataFrame: summary of the costs per member category (see
+            summarize_trade_costs), None if the book was not reconstructed.
+    """
+    quotes = read_quotes(isin, date)
+    if quotes is None:
+        return None
+
+    trades_path = os.path.join(PATHS['trades'], isin, f'VHD_{isin}_{date}.parquet')
+    df_costs = trade_costs(pd.read_parquet(trades_path, columns=TRADE_COLUMNS), quotes, horizons)
+
+    folder = os.path.join(PATHS['trade_analytics'], isin)
+    os.makedirs(folder, exist_ok=True)
+    df_costs.to_parquet(os.path.join(folder, f'tradeAnalytics_{isin}_{date}.parquet'), index=False)
+
+    df_summary = summarize_trade_costs(df_costs)
+    df_summary.insert(0, 'date', date)
+    df_summary.insert(0, 'isin', isin)
+    return df_summary
+
+
+@timeit
+def get_trade_analytics(horizons: List[str]=HORIZONS, max_workers: int=None) -> None:
+    """
+    Trade costs for every isin and day with a reconstructed book, trade files
+    are handled in parallel (one process per file). The summaries per isin and
+    day, and pooled over all of them, are saved in the trade_analytics folder.
+
+    Args:
+        horizons (List[str], optional): horizons. Defaults to HORIZONS.
+        max_workers (int, optional): number of processes. Defaults to None
+            (number of CPUs).
+    """
+    tasks = []
+    for isin in STOCKS.all:
+        for file in os.listdir(os.path.join(PATHS['trades'], isin)):
+            # Date of the file
+            date = file[-16:-8]
+            tasks.append((isin, date))
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(trade_analytics_file, isin, date, horizons): (isin, date) for isin, date in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                df_summary = future.result()
+            except Exception as e:
+                isin, date = futures[future]
+                print(f'Trade analytics failed: {isin} {date} ({e})')
+                continue
+            if df_summary is not None:
+                summaries.append(df_summary)
+
+    if not summaries:
+        print('No reconstructed books for the trade analytics.')
+        return
+
+    df_summaries = pd.concat(summaries, ignore_index=True).sort_values(['isin', 'date'], kind='stable')
+    df_summaries.to_parquet(os.path.join(PATHS['trade_analytics'], 'tradeAnalytics_summary.parquet'), index=False)
+    pool_summaries(df_summaries).to_excel(os.path.join(PATHS['trade_analytics'], 'tradeAnalytics_pooled.xlsx'), index=False)
+
+
+if __name__ == '__main__':
+    print('Getting trade analytics ...')
+    get_trade_analytics()
@@ -0,0 +1,92 @@
+# Import Built-Ins
+import argparse
+import os
+import time
+from typing import Callable, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+
+# Import Homebrew
+from src.constants.constants import STOCKS, PATHS
+from src.orderbook.removed_orders import derive_removed_orders
+from src.orderbook.inputs import orders_path, history_path
+from src.utils.preprocessing import preprocess_events, preprocess_orders, preprocess_trades
+from src.utils.preprocessing import polars_backend
+
+
+def frames_equal(df_pandas: pd.DataFrame, df_polars: pd.DataFrame) -> bool:
+    """ True if both frames hold the same values in the same columns and rows
+    (categories compared by value, index ignored). """
+    df_pandas = df_pandas.reset_index(drop=True)
+    df_polars = df_polars.reset_index(drop=True)
+    if list(df_pandas.columns) != list(df_polars.columns) or len(df_pandas) != len(df_polars):
+        return False
+    for column in df_pandas.columns:
+        a, b = df_pandas[column], df_polars[column]
+        if isinstance(a.dtype, pd.CategoricalDtype) or isinstance(b.dtype, pd.CategoricalDtype) or a.dtype == object:
+            a, b = a.astype(object), b.astype(object)
+            if not ((a == b) | (a.isna() & b.isna())).all():
+                return False
+        elif not a.equals(b.astype(a.dtype)):
+            return False
+    return True
+
+
+def timed(function: Callable, *args) -> Tuple[object, float]:
+    """ Result and time of a call. """
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def compare(name: str, pandas_function: Callable, polars_function: Callable, *args) -> dict:
+    """ Runs a stage with both backends. """
+    df_pandas, pandas_seconds = timed(pandas_function, *args)
+    df_polars, polars_seconds = timed(polars_function, *args)
+    return {
+        'stage': name, 'rows': len(df_pandas), 'pandas': pandas_seconds, 'polars': polars_seconds,
+        'speedup': pandas_seconds / polars_seconds if polars_seconds > 0 else float('nan'),
+        'equal': frames_equal(df_pandas, df_polars),
+    }
+
+
+def _derive_removed_orders_pandas(isin: str, date_str: str) -> pd.DataFrame:
+    """ Removed orders with pandas, files read as 02_get_removed_orders. """
+    df_orders = pd.read_parquet(orders_path(isin, date_str))
+    df_history = pd.read_parquet(history_path(isin, date_str)) if os.path.exists(history_path(isin, date_str)) else None
+    return derive_removed_orders(df_orders, df_history)
+
+
+def benchmark_backends(events: List[str], orders: List[str], trades: List[str], isins: List[str], max_days: int) -> pd.DataFrame:
+    """
+    Runs each stage with the pandas and Polars backends: preprocessing of the
+    raw files given, removed orders of the first days of the isins. Reports
+    times and whether the results are equal.
+    """
+    rows = []
+    for path in events:
+        rows.append(compare(f'events {os.path.basename(path)}', preprocess_events, polars_backend.preprocess_events, path))
+    for path in orders:
+        rows.append(compare(f'orders {os.path.basename(path)}', preprocess_orders, polars_backend.preprocess_orders, path))
+    for path in trades:
+        rows.append(compare(f'trades {os.path.basename(path)}', preprocess_trades, polars_backend.preprocess_trades, path))
+
+    for isin in isins:
+        for file in sorted(os.listdir(os.path.join(PATHS['orders'], isin)))[:max_days]:
+            date_str = file[-16:-8]
+            rows.append(compare(f'removed orders {isin} {date_str}', _derive_removed_orders_pandas, polars_backend.derive_removed_orders, isin, date_str))
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Preprocessing stages with the pandas and Polars backends.')
+    parser.add_argument('--events', nargs='*', default=[], help='raw event files (csv)')
+    parser.add_argument('--orders', nargs='*', default=[], help='raw order or history files (csv)')
+    parser.add_argument('--trades', nargs='*', default=[], help='raw trade files (csv)')
+    parser.add_argument('--isins', nargs='*', default=STOCKS.all[:1], help='isins of the removed orders')
+    parser.add_argument('--days', type=int, default=5, help='days of removed orders per isin')
+    args = parser.parse_args()
+
+    df = benchmark_backends(args.events, args.orders, args.trades, args.isins, args.days)
+    print(df.to_string(index=False, float_format=lambda value: f'{value:.4f}'))
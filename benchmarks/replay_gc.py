@@ -0,0 +1,51 @@
+# Import Built-Ins
+import argparse
+import logging
+import time
+
+# Import Third-Party
+
+# Import Homebrew
+from benchmarks.synthetic import simulate_day
+from src.orderbook.orderbook import Orderbook
+from src.utils.gc_utils import GcTimer, replay_gc
+
+
+def replay(day: dict) -> Orderbook:
+    """ Replays a synthetic day through the orderbook. """
+    orderbook = Orderbook(day['auction_open'].date(), 'SYNTHETIC', day['auction_open'], day['auction_close'])
+    orderbook.set_removed_orders(day['removed_orders'])
+    orderbook.set_trades(day['trades'])
+
+    for message in day['orders'].to_dict('records'):
+        orderbook.process(message)
+
+    return orderbook
+
+
+def benchmark_gc(n_orders: int, seed: int) -> None:
+    """
+    Replays the same synthetic day with each garbage collector mode and reports
+    the time spent in the collector before (default) and after (tuned, frozen).
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    day = simulate_day(n_orders=n_orders, seed=seed)
+    print(f'Synthetic day: {len(day["orders"])} messages, {len(day["removed_orders"])} cancelations.')
+
+    for mode in ('default', 'tuned', 'frozen'):
+        with GcTimer() as gc_timer, replay_gc(mode):
+            start_time = time.perf_counter()
+            orderbook = replay(day)
+            total_time = time.perf_counter() - start_time
+        print(f'{mode:>8}: replay {total_time:.4f} seconds | {gc_timer}')
+
+    print(f'Allocations: {orderbook.allocation_stats}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Garbage collector time during replays.')
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    benchmark_gc(args.orders, args.seed)
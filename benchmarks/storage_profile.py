@@ -0,0 +1,99 @@
+# Import Built-Ins
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+# Import Third-Party
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Import Homebrew
+from src.constants.constants import STOCKS, PATHS
+from src.utils.preprocessing.storage_profile import StorageProfile, DEFAULT_PROFILE, COMPACT_PROFILE
+
+
+# Columns read by a replay (see src/orderbook/inputs.py), timed apart from
+# the full reads.
+REPLAY_COLUMNS = {
+    'orders': ['o_id_fd', 'o_cha_id', 'o_bs', 'o_type', 'o_price', 'o_price_stop', 'o_q_ini', 'o_q_dis', 'o_dtm_va'],
+    'histories': ['o_id_fd', 'o_cha_id', 'o_bs', 'o_type', 'o_price', 'o_price_stop', 'o_q_ini', 'o_q_dis', 'o_dtm_va'],
+    'trades': ['t_dtm_neg', 't_id_b_fd', 't_id_s_fd', 't_q_exchanged', 't_price', 't_agg'],
+}
+
+
+def list_files(table: str, max_files: int) -> List[str]:
+    """ Paths of the files of a table (orders, histories, trades), at most
+    max_files. """
+    paths = []
+    for isin in STOCKS.all:
+        folder = os.path.join(PATHS[table], isin)
+        if not os.path.isdir(folder):
+            continue
+        paths += [os.path.join(folder, file) for file in sorted(os.listdir(folder)) if file.endswith('.parquet')]
+    return paths[:max_files]
+
+
+def read_seconds(path: str, columns: List[str]=None, repeat: int=3) -> float:
+    """ Best time of repeat reads of a Parquet file. """
+    seconds = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        pd.read_parquet(path, columns=columns)
+        seconds.append(time.perf_counter() - start_time)
+    return min(seconds)
+
+
+def profile_file(path: str, table: str, profiles: List[StorageProfile], folder: str) -> Dict[str, dict]:
+    """ Writes a file with each profile and measures size and read times. """
+    df = pd.read_parquet(path)
+    results = {}
+    for profile in profiles:
+        destination = os.path.join(folder, f'{profile.name}_{os.path.basename(path)}')
+        profile.write(df.copy(), destination, table)
+        columns = [column for column in REPLAY_COLUMNS[table] if column in pq.read_schema(destination).names]
+        results[profile.name] = {
+            'bytes': os.path.getsize(destination),
+            'read_all': read_seconds(destination),
+            'read_replay': read_seconds(destination, columns),
+        }
+        os.remove(destination)
+    return results
+
+
+def report(tables: List[str], max_files: int, profiles: List[StorageProfile]) -> pd.DataFrame:
+    """
+    Disk size and read times of the files of each table written with each
+    profile, summed over the files, with the change against the first profile.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as folder:
+        for table in tables:
+            totals = {profile.name: {'bytes': 0, 'read_all': 0.0, 'read_replay': 0.0} for profile in profiles}
+            paths = list_files(table, max_files)
+            for path in paths:
+                for name, result in profile_file(path, table, profiles, folder).items():
+                    for key, value in result.items():
+                        totals[name][key] += value
+
+            for profile in profiles:
+                rows.append({'table': table, 'profile': profile.name, 'files': len(paths), **totals[profile.name]})
+
+    df = pd.DataFrame(rows)
+    baseline = df.groupby('table')[['bytes', 'read_all', 'read_replay']].transform('first')
+    df['size_ratio'] = df['bytes'] / baseline['bytes']
+    df['read_all_ratio'] = df['read_all'] / baseline['read_all']
+    df['read_replay_ratio'] = df['read_replay'] / baseline['read_replay']
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Disk size and read speed of the storage profiles.')
+    parser.add_argument('--tables', nargs='+', default=['orders', 'histories', 'trades'])
+    parser.add_argument('--files', type=int, default=1_000, help='files per table')
+    args = parser.parse_args()
+
+    df = report(args.tables, args.files, [DEFAULT_PROFILE, COMPACT_PROFILE])
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(df.to_string(index=False, float_format=lambda value: f'{value:.4f}'))
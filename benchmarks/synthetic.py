@@ -0,0 +1,86 @@
+# Import Built-Ins
+import datetime as dt
+
+# Import Third-Party
+import numpy as np
+import pandas as pd
+
+# Import Homebrew
+
+
+def simulate_day(
+    n_orders: int=100_000, seed: int=0, date: dt.date=dt.date(2017, 1, 3)
+) -> dict:
+    """ Synthetic order flow for one day, with the columns of the preprocessed
+    files (times as int64 nanoseconds). Orders are added, some are modified 
+    (price or quantity) and most are canceled. There are no trades, auctions 
+    are set after the end of the day. Used to benchmark the orderbook without 
+    the Bedofih data.
+
+    Args:
+        n_orders (int, optional): number of orders. Defaults to 100_000.
+        seed (int, optional): random seed. Defaults to 0.
+        date (dt.date, optional): date of the day. Defaults to dt.date(2017, 1, 3).
+
+    Returns:
+        dict: 'orders', 'removed_orders' and 'trades' dataframes, and the auction
+            datetimes ('auction_open', 'auction_close').
+    """
+    rng = np.random.default_rng(seed)
+    day = pd.Timestamp(date).value
+    start = day + pd.Timedelta(hours=9, minutes=5).value
+    end = day + pd.Timedelta(hours=17, minutes=25).value
+
+    o_id_fd = np.arange(1_000_000, 1_000_000 + n_orders, dtype='int64')
+    o_bs = rng.choice(np.array(['B', 'S']), n_orders)
+    ticks = rng.integers(1, 40, n_orders)
+    o_price = np.round(np.where(o_bs == 'B', 40.0 - 0.005 * ticks, 40.0 + 0.005 * ticks), 3)
+    o_q_ini = rng.choice(np.array([10, 50, 100, 200, 500]), n_orders).astype('int32')
+    o_q_dis = np.where(rng.random(n_orders) < 0.1, 10, 0).astype('int32')
+    o_member = rng.choice(np.array(['HFT', 'MIX', 'NON']), n_orders, p=[0.5, 0.2, 0.3])
+    o_dtm_va = np.sort(rng.integers(start, end, n_orders))
+
+    df_adds = pd.DataFrame({
+        'o_id_fd': o_id_fd, 'o_cha_id': np.int16(1), 'o_member': o_member, 'o_account': '1',
+        'o_bs': o_bs, 'o_execution': '0', 'o_validity': '0', 'o_type': '2',
+        'o_price': o_price, 'o_price_stop': 0.0, 'o_q_ini': o_q_ini, 'o_q_min': np.int32(0),
+        'o_q_dis': o_q_dis, 'o_dt_expiration': o_dtm_va, 'o_dtm_be': o_dtm_va, 'o_dtm_va': o_dtm_va,
+        'o_state': '0', 'o_nb_tr': np.int16(0),
+    })
+
+    # Modifications (price or quantity), a few milliseconds to minutes later
+    mask_mod = rng.random(n_orders) < 0.3
+    df_mods = df_adds.loc[mask_mod].copy()
+    delay = rng.exponential(5e9, len(df_mods)).astype('int64') + 1
+    df_mods['o_dtm_va'] = df_mods['o_dtm_va'] + delay
+    price_change = rng.random(len(df_mods)) < 0.5
+    step = np.where(df_mods['o_bs'] == 'B', -0.005, 0.005)
+    df_mods['o_price'] = np.round(np.where(price_change, df_mods['o_price'] + step, df_mods['o_price']), 3)
+    df_mods['o_q_ini'] = np.where(price_change, df_mods['o_q_ini'], df_mods['o_q_ini'] + 10).astype('int32')
+
+    df_orders = pd.concat([df_adds, df_mods], ignore_index=True)
+    df_orders = df_orders.sort_values(by='o_dtm_va', kind='stable', ignore_index=True)
+
+    # Cancelations, after the last message of the order
+    last_message = df_orders.groupby('o_id_fd')['o_dtm_va'].max()
+    mask_cancel = rng.random(len(last_message)) < 0.8
+    canceled = last_message.loc[mask_cancel]
+    df_removed_orders = pd.DataFrame({
+        'o_dtm_br': canceled.to_numpy() + rng.exponential(3e10, len(canceled)).astype('int64') + 1,
+        'o_id_fd': canceled.index.to_numpy(), 'o_state': '4',
+    })
+
+    # No trades, a single trade sentinel at the end of the day
+    sentinel = day + pd.Timedelta(hours=23).value
+    df_trades = pd.DataFrame({
+        't_dtm_neg': [sentinel], 't_id_b_fd': [0], 't_id_s_fd': [0], 't_q_exchanged': [0],
+        't_price': [0.0], 't_agg': ['A'],
+    })
+
+    return {
+        'orders': df_orders,
+        'removed_orders': df_removed_orders,
+        'trades': df_trades,
+        'auction_open': pd.Timestamp(sentinel),
+        'auction_close': pd.Timestamp(sentinel),
+    }
@@ -22,6 +22,15 @@ PATHS['histories'] = os.path.join(PATHS['root'], 'histories')
 PATHS['removed_orders'] = os.path.join(PATHS['root'], 'removed_orders')
 PATHS['limit_order_books'] = os.path.join(PATHS['root'], 'limit_order_books')
 PATHS['volume_by_interval'] = os.path.join(PATHS['root'], 'volume_by_interval')
+PATHS['checkpoints'] = os.path.join(PATHS['root'], 'checkpoints')
+PATHS['query_checkpoints'] = os.path.join(PATHS['root'], 'query_checkpoints')
+PATHS['replay_cache'] = os.path.join(PATHS['root'], 'replay_cache')
+PATHS['tensors'] = os.path.join(PATHS['root'], 'tensors')
+PATHS['trade_analytics'] = os.path.join(PATHS['root'], 'trade_analytics')
+
+# Engine of the preprocessing stages (01, 02, 03): 'pandas', or 'polars' (lazy
+# queries, needs the polars package, same results).
+PREPROCESSING_BACKEND = 'pandas'
 
 # Stocks/list of isins
 STOCKS = Stocks()
@@ -11,17 +11,18 @@ import math
 from logger import logger
 from .limit_level import LimitLevel
 from .trade import Trade
+from src.utils.time_utils import datetime_to_nanoseconds
 
 
 class Auction:
     """
     Auction object.
-    Keep information such as auction time, the auction price or if the auction 
-    has passed. It also performs the related actions such as finding the auction
-    price and making the auction trades.
+    Keep information such as auction time (int64 nanoseconds), the auction price
+    or if the auction has passed. It also performs the related actions such as 
+    finding the auction price and making the auction trades.
     """
     def __init__(self, datetime: dt.datetime):
-        self.datetime = datetime
+        self.datetime = datetime_to_nanoseconds(datetime)
         self.passed = False
         self.price = None
 
@@ -166,7 +167,7 @@ class Auction:
         #while isinstance(orderbook.trades[-1]['t_agg'], float):
         while orderbook.trades[-1]['t_agg'] not in ['A', 'V']:
             #### Normally dtype str; if nan, dtype = float
-            trade = orderbook.trades.pop()
+            trade = orderbook._pop_trade()
             orderbook._fill_order(trade['t_id_b_fd'], trade['t_q_exchanged'])
             orderbook._fill_order(trade['t_id_s_fd'], trade['t_q_exchanged'])
             orderbook.last_trading_price = trade['t_price']
\ No newline at end of file
@@ -0,0 +1,267 @@
+# Import Built-Ins
+import datetime as dt
+import os
+from collections import OrderedDict
+from typing import List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from .orderbook import Orderbook
+from .checkpoint import checkpoint_path, checkpoint_valid, list_checkpoints, dump_state, load_state, write_checkpoint, read_checkpoint
+from .sampling import Sampler, TimeGrid
+from .inputs import read_auction_times
+from .replay_cache import read_tapes
+from src.constants.constants import PATHS, MARKET_OPEN
+
+
+# Interval between two checkpoints kept by the query service.
+QUERY_CHECKPOINT_EVERY = dt.timedelta(minutes=5)
+
+# Size bounds of the checkpoint caches (bytes) and number of days of inputs
+# kept in memory.
+QUERY_MEMORY_BYTES = 512 * 2**20
+QUERY_DISK_BYTES = 8 * 2**30
+QUERY_DAYS = 2
+
+
+class _Day:
+    """ Inputs of one day of an isin, kept in memory between queries. """
+    __slots__ = ['isin', 'date', 'date_str', 'messages', 'message_times', 'history',
+                 'removed_orders', 'trades', 'auction_times']
+
+    def __init__(self, isin: str, date: dt.date) -> None:
+        self.isin = isin
+        self.date = date
+        self.date_str = format(date, '%Y%m%d')
+
+        tapes = read_tapes(isin, self.date_str)
+        self.messages: List[dict] = list(tapes.order_messages())
+        self.message_times: np.ndarray = tapes.message_times
+        self.history: List[dict] = tapes.history_messages()
+        self.removed_orders: Tuple[np.ndarray, np.ndarray] = tapes.removed_orders
+        self.trades: List[dict] = tapes.trades()
+        self.auction_times: Tuple[dt.datetime, dt.datetime] = read_auction_times(isin, date)
+
+
+class BookQuery:
+    """
+    Book of an isin at any time. Checkpoints of the book (pickled states, see
+    Orderbook.get_state) are taken every checkpoint_every from the market open
+    while replaying, and kept in two least recently used caches bounded in
+    size: in memory and on disk (PATHS['query_checkpoints'], apart from the
+    checkpoints of 04_recreate_orderbooks, only the files of the service are
+    evicted). A query restores the latest
+    checkpoint at or before the time asked and replays the messages,
+    cancellations and trades since then only.
+    """
+    def __init__(
+        self, checkpoint_every: dt.timedelta=QUERY_CHECKPOINT_EVERY,
+        memory_bytes: int=QUERY_MEMORY_BYTES, disk_bytes: int=QUERY_DISK_BYTES,
+        days: int=QUERY_DAYS, folder: str=None
+    ) -> None:
+        """
+        Args:
+            checkpoint_every (dt.timedelta, optional): interval between two
+                checkpoints. Defaults to QUERY_CHECKPOINT_EVERY.
+            memory_bytes (int, optional): size of the checkpoints kept in
+                memory. Defaults to QUERY_MEMORY_BYTES.
+            disk_bytes (int, optional): size of the checkpoints kept on disk,
+                0 to keep none. Defaults to QUERY_DISK_BYTES.
+            days (int, optional): number of days of inputs kept in memory.
+                Defaults to QUERY_DAYS.
+            folder (str, optional): folder of the checkpoints kept on disk.
+                Defaults to None (PATHS['query_checkpoints']).
+        """
+        self.checkpoint_every = pd.Timedelta(checkpoint_every).value
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.days = days
+        self.folder = folder if folder is not None else PATHS['query_checkpoints']
+
+        # (isin, date_str, timestamp) -> pickled state, least recently used first
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_size = 0
+
+        # (isin, date_str, timestamp) -> file size, least recently used first
+        # (loaded from the checkpoint files on first use)
+        self._disk: OrderedDict = None
+        self._disk_size = 0
+
+        # (isin, date) -> _Day, least recently used first
+        self._days: OrderedDict = OrderedDict()
+
+
+    def book_at(self, isin: str, timestamp) -> Orderbook:
+        """
+        Returns the book of an isin at timestamp: every message at or before
+        timestamp processed, orders canceled before timestamp removed. The book
+        returned is a copy, it can be modified or replayed further.
+
+        Args:
+            isin (str): isin code of the security.
+            timestamp: time of the book (anything pd.Timestamp accepts, int64
+                nanoseconds included).
+
+        Returns:
+            Orderbook: book at timestamp, without statistics.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        day = self._get_day(isin, timestamp.date())
+        timestamp = timestamp.value
+
+        checkpoint = self._nearest_checkpoint(day, timestamp)
+        if checkpoint is None:
+            orderbook = self._open_book(day)
+        else:
+            state = load_state(self._get_checkpoint(day, checkpoint))
+            orderbook = Orderbook.from_state(state, day.removed_orders, day.trades)
+
+        self._replay(orderbook, day, checkpoint, timestamp)
+        return orderbook
+
+
+    def _get_day(self, isin: str, date: dt.date) -> _Day:
+        """ Inputs of a day, read once. """
+        key = (isin, date)
+        day = self._days.get(key)
+        if day is None:
+            day = self._days[key] = _Day(isin, date)
+            while len(self._days) > self.days:
+                self._days.popitem(last=False)
+        self._days.move_to_end(key)
+        return day
+
+
+    def _open_book(self, day: _Day) -> Orderbook:
+        """ Book of the day with the history processed. """
+        orderbook = Orderbook(day.date, day.isin, *day.auction_times)
+        orderbook.set_inputs(day.removed_orders, list(day.trades))
+
+        # Messages are modified by the book, copies are processed
+        for message in day.history:
+            orderbook.process(dict(message))
+        return orderbook
+
+
+    def _replay(self, orderbook: Orderbook, day: _Day, after: int, timestamp: int) -> None:
+        """ Replays the messages in (after, timestamp], checkpoints taken on
+        the way. """
+        market_open = pd.Timestamp(dt.datetime.combine(day.date, MARKET_OPEN)).value
+        first = market_open
+        if after is not None and after >= market_open:
+            first += ((after - market_open) // self.checkpoint_every + 1) * self.checkpoint_every
+
+        def sink(clock: str, checkpoint: int, orderbook: Orderbook) -> None:
+            self._put_checkpoint(day, checkpoint, orderbook)
+        sampler = Sampler([TimeGrid('checkpoint', first, timestamp, self.checkpoint_every)], sink)
+
+        start = np.searchsorted(day.message_times, after, side='right') if after is not None else 0
+        end = np.searchsorted(day.message_times, timestamp, side='right')
+        for message in day.messages[start:end]:
+            sampler.before_message(orderbook, message['o_dtm_va'])
+            orderbook.process(dict(message))
+
+        # Checkpoints and cancelations up to timestamp
+        sampler.before_message(orderbook, timestamp + 1)
+        orderbook._check_for_order_cancelations(timestamp)
+
+
+    def _nearest_checkpoint(self, day: _Day, timestamp: int) -> int:
+        """ Time of the latest checkpoint (memory or disk) at or before
+        timestamp, None if there is none. """
+        times = [key[2] for key in self._memory if key[:2] == (day.isin, day.date_str) and key[2] <= timestamp]
+        if self.disk_bytes > 0:
+            times += [time for time in list_checkpoints(day.isin, day.date_str, self.folder) if time <= timestamp]
+        return max(times, default=None)
+
+
+    def _get_checkpoint(self, day: _Day, timestamp: int) -> bytes:
+        """ Pickled state of a checkpoint, from memory or else from disk (then
+        kept in memory). """
+        key = (day.isin, day.date_str, timestamp)
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+
+        data = read_checkpoint(*key, root=self.folder)
+        self._touch_disk(key, len(data))
+        self._put_memory(key, data)
+        return data
+
+
+    def _put_checkpoint(self, day: _Day, timestamp: int, orderbook: Orderbook) -> None:
+        """ Keeps the state of the book at timestamp, if not kept already. """
+        key = (day.isin, day.date_str, timestamp)
+        if key in self._memory:
+            return
+        data = dump_state(orderbook)
+        self._put_memory(key, data)
+        if self.disk_bytes > 0 and not checkpoint_valid(*key, root=self.folder):
+            write_checkpoint(*key, data, root=self.folder)
+            self._touch_disk(key, len(data))
+
+
+    def _put_memory(self, key: tuple, data: bytes) -> None:
+        """ Adds a checkpoint to the memory cache, least recently used ones
+        dropped beyond memory_bytes. """
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_size -= len(dropped)
+
+
+    def _touch_disk(self, key: tuple, size: int) -> None:
+        """ Marks a checkpoint file as used, least recently used files deleted
+        beyond disk_bytes. """
+        if self._disk is None:
+            self._disk = self._load_disk_index()
+        if key not in self._disk:
+            self._disk[key] = size
+            self._disk_size += size
+        self._disk.move_to_end(key)
+        os.utime(checkpoint_path(*key, root=self.folder))
+
+        while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+            dropped, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(checkpoint_path(*dropped, root=self.folder))
+            except FileNotFoundError:
+                pass
+
+
+    def _load_disk_index(self) -> OrderedDict:
+        """ Checkpoint files of the service on disk, by last use (modification
+        time). """
+        files = []
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if not name.endswith('.pkl'):
+                    continue
+                _, isin, date_str, timestamp = name[:-4].split('_')
+                stat = os.stat(os.path.join(root, name))
+                files.append((stat.st_mtime, (isin, date_str, int(timestamp)), stat.st_size))
+
+        index = OrderedDict()
+        for _, key, size in sorted(files):
+            index[key] = size
+        self._disk_size = sum(index.values())
+        return index
+
+
+# Query service shared by book_at.
+_BOOK_QUERY: BookQuery = None
+
+
+def book_at(isin: str, timestamp) -> Orderbook:
+    """ Returns the book of an isin at timestamp (see BookQuery.book_at),
+    with a query service shared by the calls. """
+    global _BOOK_QUERY
+    if _BOOK_QUERY is None:
+        _BOOK_QUERY = BookQuery()
+    return _BOOK_QUERY.book_at(isin, timestamp)
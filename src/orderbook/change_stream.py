@@ -0,0 +1,150 @@
+# Import Built-Ins
+import datetime as dt
+from typing import Dict, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from .orderbook import DEPTH_FIELDS
+from src.utils.time_utils import nanoseconds_to_datetime
+
+
+# Quantities of a level in the stream (size, disclosed and hidden sizes of
+# HFT/MIX/NON), all 0 once the level is removed.
+CHANGE_FIELDS = DEPTH_FIELDS[1:]
+
+# Interval between the keyframes (every level of the book).
+KEYFRAME_EVERY = dt.timedelta(minutes=1)
+
+# Quantities of a removed level.
+_EMPTY = (0,) * len(CHANGE_FIELDS)
+
+
+class ChangeStreamSink:
+    """
+    Sink of the replay (see Sampler) storing the book as a stream of level
+    changes: at each sample of any clock (an event clock samples after every
+    message), only the levels whose quantities changed since the last sample
+    (see Orderbook.track_level_changes) are stored, with the time and sequence
+    number of the sample. Every keyframe_every, all the levels are stored as a
+    keyframe. The book at any time is rebuilt from the last keyframe and the
+    changes after it (see rebuild_levels).
+    """
+    def __init__(self, keyframe_every: dt.timedelta=KEYFRAME_EVERY) -> None:
+        """
+        Args:
+            keyframe_every (dt.timedelta, optional): interval between the
+                keyframes. Defaults to KEYFRAME_EVERY.
+        """
+        self.keyframe_every = pd.Timedelta(keyframe_every).value
+
+        # Quantities of the levels as last stored, by (side, price)
+        self._levels: Dict[Tuple[str, float], tuple] = {}
+        self._sequence = 0
+        self._next_keyframe: int = None
+        self._changes: List[tuple] = []
+        self._keyframes: List[tuple] = []
+
+
+    def __call__(self, clock: str, timestamp: int, orderbook) -> None:
+        self._sequence += 1
+
+        # First sample: the whole book as first keyframe, changes from there
+        if self._next_keyframe is None:
+            orderbook.track_level_changes()
+            orderbook.pop_level_changes()
+            for side, levels in (('B', orderbook.bids), ('S', orderbook.asks)):
+                for price, limit_level in levels.items():
+                    quantities = limit_level.quantities()
+                    if quantities != _EMPTY:
+                        self._levels[(side, price)] = quantities
+            self._keyframe(timestamp)
+            return
+
+        for side, price in orderbook.pop_level_changes():
+            limit_level = (orderbook.bids if side == 'B' else orderbook.asks).get(price)
+            quantities = limit_level.quantities() if limit_level is not None else _EMPTY
+            if self._levels.get((side, price), _EMPTY) == quantities:
+                continue
+            if quantities == _EMPTY:
+                del self._levels[(side, price)]
+            else:
+                self._levels[(side, price)] = quantities
+            self._changes.append((timestamp, self._sequence, side, price) + quantities)
+
+        if timestamp >= self._next_keyframe:
+            self._keyframe(timestamp)
+
+
+    def _keyframe(self, timestamp: int) -> None:
+        """ Stores every level of the book (at the sample of timestamp). """
+        for (side, price), quantities in self._levels.items():
+            self._keyframes.append((timestamp, self._sequence, side, price) + quantities)
+        self._next_keyframe = (timestamp // self.keyframe_every + 1) * self.keyframe_every
+
+
+    def __len__(self) -> int:
+        return len(self._changes)
+
+
+    def to_frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """ Returns the changes and the keyframes, one row per level:
+        timestamp, seq, side, price and CHANGE_FIELDS. """
+        return _to_frame(self._changes), _to_frame(self._keyframes)
+
+
+def _to_frame(rows: List[tuple]) -> pd.DataFrame:
+    """ Frame of change or keyframe rows. """
+    columns = ['timestamp', 'seq', 'side', 'price', *CHANGE_FIELDS]
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df['timestamp'] = nanoseconds_to_datetime(df['timestamp'].astype('int64'))
+    df['seq'] = df['seq'].astype('int64')
+    df['side'] = pd.Categorical(df['side'], categories=['B', 'S'])
+    df['price'] = df['price'].astype('float64')
+    for field in CHANGE_FIELDS:
+        df[field] = df[field].astype('int64')
+    return df
+
+
+def rebuild_levels(
+    df_changes: pd.DataFrame, df_keyframes: pd.DataFrame, timestamp, depth: int=None
+) -> pd.DataFrame:
+    """
+    Levels of the book at a time from the change stream (see ChangeStreamSink):
+    the last keyframe at or before the time, then the changes after it.
+
+    Args:
+        df_changes (pd.DataFrame): changes, in stream order.
+        df_keyframes (pd.DataFrame): keyframes, in stream order.
+        timestamp: time of the book (anything pd.Timestamp accepts), the
+            changes sampled at that time included.
+        depth (int, optional): number of levels per side. Defaults to None
+            (all).
+
+    Returns:
+        pd.DataFrame: one row per level (side, price, CHANGE_FIELDS), bids
+            from the best then asks from the best.
+    """
+    timestamp = pd.Timestamp(timestamp)
+
+    # Last keyframe (empty book if none, or if the book was empty then)
+    keyframe_end = np.searchsorted(df_keyframes['timestamp'].to_numpy(), timestamp.to_datetime64(), side='right')
+    sequence = df_keyframes['seq'].iloc[keyframe_end - 1] if keyframe_end > 0 else 0
+    keyframe = df_keyframes.iloc[np.searchsorted(df_keyframes['seq'].to_numpy(), sequence, side='left'):keyframe_end]
+
+    changes_start = np.searchsorted(df_changes['seq'].to_numpy(), sequence, side='right')
+    changes_end = np.searchsorted(df_changes['timestamp'].to_numpy(), timestamp.to_datetime64(), side='right')
+    changes = df_changes.iloc[changes_start:max(changes_start, changes_end)]
+
+    columns = ['side', 'price', *CHANGE_FIELDS]
+    df = pd.concat([keyframe[columns], changes[columns]], ignore_index=True)
+    df = df.drop_duplicates(['side', 'price'], keep='last')
+    df = df.loc[(df[list(CHANGE_FIELDS)] != 0).any(axis=1)]
+
+    bids = df.loc[df['side'] == 'B'].sort_values('price', ascending=False)
+    asks = df.loc[df['side'] == 'S'].sort_values('price')
+    if depth is not None:
+        bids, asks = bids.head(depth), asks.head(depth)
+    return pd.concat([bids, asks], ignore_index=True)
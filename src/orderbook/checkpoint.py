@@ -0,0 +1,152 @@
+# Import Built-Ins
+import datetime as dt
+import io
+import os
+import pickle
+from typing import List, Tuple
+
+# Import Third-Party
+import numpy as np
+
+# Import Homebrew
+from .orderbook import STATE_VERSION, Orderbook
+from .inputs import input_fingerprint
+from src.constants.constants import PATHS
+
+
+# Interval between two checkpoints of a replay.
+CHECKPOINT_EVERY = dt.timedelta(minutes=30)
+
+
+def checkpoint_folder(isin: str, date_str: str, root: str=None) -> str:
+    """ Folder of the checkpoints of an isin for one day (YYYYMMDD), in root
+    (PATHS['checkpoints'] if None). """
+    return os.path.join(root if root is not None else PATHS['checkpoints'], isin, date_str)
+
+
+def checkpoint_path(isin: str, date_str: str, timestamp: int, root: str=None) -> str:
+    """ Path of the checkpoint taken at timestamp (int64 nanoseconds). """
+    return os.path.join(checkpoint_folder(isin, date_str, root), f'checkpoint_{isin}_{date_str}_{timestamp}.pkl')
+
+
+def list_checkpoints(isin: str, date_str: str, root: str=None) -> List[int]:
+    """ Returns the times (int64 nanoseconds) of the checkpoints saved for an
+    isin and day, sorted. Checkpoints of another state version or of other
+    input files are left out (see checkpoint_valid), replays save them again. """
+    folder = checkpoint_folder(isin, date_str, root)
+    if not os.path.isdir(folder):
+        return []
+    prefix = f'checkpoint_{isin}_{date_str}_'
+    times = sorted(
+        int(file[len(prefix):-4]) for file in os.listdir(folder)
+        if file.startswith(prefix) and file.endswith('.pkl')
+    )
+    inputs = input_fingerprint(isin, date_str)
+    return [time for time in times if checkpoint_valid(isin, date_str, time, inputs, root)]
+
+
+def checkpoint_valid(isin: str, date_str: str, timestamp: int, inputs: dict=None, root: str=None) -> bool:
+    """
+    True if the checkpoint taken at timestamp can be restored: saved with
+    STATE_VERSION, from the input files as they are now. Only the header of
+    the checkpoint is read (see dump_state).
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date of the checkpoint (YYYYMMDD).
+        timestamp (int): time of the checkpoint (int64 nanoseconds).
+        inputs (dict, optional): fingerprint of the input files (see
+            input_fingerprint). Defaults to None (taken here).
+        root (str, optional): folder of the checkpoints. Defaults to None
+            (PATHS['checkpoints']).
+
+    Returns:
+        bool: True if the checkpoint is valid.
+    """
+    inputs = input_fingerprint(isin, date_str) if inputs is None else inputs
+    try:
+        with open(checkpoint_path(isin, date_str, timestamp, root), 'rb') as file:
+            header = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False
+    return isinstance(header, dict) and header.get('state_version') == STATE_VERSION and header.get('inputs') == inputs
+
+
+def nearest_checkpoint(isin: str, date_str: str, timestamp: int) -> int:
+    """ Returns the time of the latest checkpoint at or before timestamp, None
+    if there is none. """
+    times = [time for time in list_checkpoints(isin, date_str) if time <= timestamp]
+    return times[-1] if times else None
+
+
+def dump_state(orderbook: Orderbook) -> bytes:
+    """ Returns the checkpoint of the book: a pickled header (state version and
+    fingerprint of the input files, see input_fingerprint) followed by the
+    pickled state (see Orderbook.get_state). """
+    inputs = input_fingerprint(orderbook.ISIN, format(orderbook.DATE, '%Y%m%d'))
+    header = {'state_version': STATE_VERSION, 'inputs': inputs}
+    return (
+        pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+        + pickle.dumps(orderbook.get_state(inputs), protocol=pickle.HIGHEST_PROTOCOL)
+    )
+
+
+def load_state(data: bytes) -> dict:
+    """ Returns the state of a checkpoint (see dump_state), header skipped. """
+    file = io.BytesIO(data)
+    pickle.load(file)
+    return pickle.load(file)
+
+
+def write_checkpoint(isin: str, date_str: str, timestamp: int, data: bytes, root: str=None) -> str:
+    """ Writes a pickled state (see dump_state) as the checkpoint taken at 
+    timestamp (in root, PATHS['checkpoints'] if None), returns its path. """
+    path = checkpoint_path(isin, date_str, timestamp, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Written aside first, a replay stopped while saving leaves no partial file
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def read_checkpoint(isin: str, date_str: str, timestamp: int, root: str=None) -> bytes:
+    """ Reads the pickled state of the checkpoint taken at timestamp (in root,
+    PATHS['checkpoints'] if None). """
+    with open(checkpoint_path(isin, date_str, timestamp, root), 'rb') as file:
+        return file.read()
+
+
+def save_checkpoint(orderbook: Orderbook, isin: str, date_str: str, timestamp: int) -> str:
+    """
+    Saves the state of the book (see Orderbook.get_state) taken at timestamp:
+    every message at or before timestamp processed, orders canceled before
+    timestamp removed. The replay resumes with the messages after timestamp.
+
+    Returns:
+        str: path of the checkpoint.
+    """
+    return write_checkpoint(isin, date_str, timestamp, dump_state(orderbook))
+
+
+def load_checkpoint(
+    isin: str, date_str: str, timestamp: int, removed_orders: Tuple[np.ndarray, np.ndarray],
+    trades: List[dict]
+) -> Orderbook:
+    """
+    Restores the book of a checkpoint (see Orderbook.from_state).
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date of the checkpoint (YYYYMMDD).
+        timestamp (int): time of the checkpoint (int64 nanoseconds).
+        removed_orders (Tuple[np.ndarray, np.ndarray]): removal timestamps and
+            ids of the canceled orders of the day (see removed_orders_arrays).
+        trades (List[dict]): reversed trades of the day (see trades_list).
+
+    Returns:
+        Orderbook: book at the checkpoint.
+    """
+    state = load_state(read_checkpoint(isin, date_str, timestamp))
+    return Orderbook.from_state(state, removed_orders, trades)
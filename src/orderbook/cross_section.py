@@ -0,0 +1,216 @@
+# Import Built-Ins
+import datetime as dt
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+
+# Import Homebrew
+from logger import logger
+from .orderbook import Orderbook
+from .sampling import SnapshotSink, TimeGrid, SNAPSHOT_START
+from .inputs import ReplayTapes, read_auctions, auction_times
+from .replay_cache import read_tapes
+from src.constants.constants import MARKET_CLOSE
+
+
+# Last message time handled (same cutoff as 04_recreate_orderbooks).
+REPLAY_CUTOFF = dt.time(hour=17, minute=40)
+
+
+def _tape(rank: int, tapes: ReplayTapes, end: int) -> Iterator[Tuple[int, int, int, dict]]:
+    """ Messages of the order file up to end, as (time, rank of the isin,
+    sequence, message). """
+    for sequence, message in enumerate(tapes.order_messages(end=end)):
+        yield message['o_dtm_va'], rank, sequence, message
+
+
+class CrossSectionReplay:
+    """
+    Replays the books of several isins for one day on one clock. The message
+    tapes of the isins are merged (heap) in time order, and at each time of the
+    grid every book is sampled (canceled orders removed up to that time), so
+    the snapshots of the isins are synchronized. Each snapshot holds the same
+    fields as the snapshots of 04_recreate_orderbooks (see SnapshotSink).
+    """
+    def __init__(
+        self, isins: List[str], date: dt.date, step: str='1s', start: dt.time=SNAPSHOT_START,
+        end: dt.time=MARKET_CLOSE, depth: int=5, df_auctions: pd.DataFrame=None
+    ) -> None:
+        """
+        Args:
+            isins (List[str]): isin codes of the securities.
+            date (dt.date): date of the orders and trades.
+            step (str, optional): step of the grid. Defaults to '1s'.
+            start (dt.time, optional): time of the first snapshot. Defaults to
+                SNAPSHOT_START.
+            end (dt.time, optional): time of the last snapshot. Defaults to
+                MARKET_CLOSE.
+            depth (int, optional): number of levels of the depth matrices.
+                Defaults to 5.
+            df_auctions (pd.DataFrame, optional): auction times (see
+                read_auctions), shared by the replays. Defaults to None (read).
+        """
+        self.isins = list(isins)
+        self.date = date
+        self.date_str = format(date, '%Y%m%d')
+        self.grid = TimeGrid(
+            'cross_section',
+            pd.Timestamp(dt.datetime.combine(date, start)).value,
+            pd.Timestamp(dt.datetime.combine(date, end)).value,
+            pd.Timedelta(step).value,
+        )
+        self.cutoff = pd.Timestamp(dt.datetime.combine(date, REPLAY_CUTOFF)).value
+        self.df_auctions = df_auctions if df_auctions is not None else read_auctions()
+        self.snapshots = SnapshotSink(depth)
+        self.books: Dict[str, Orderbook] = {}
+        self.stats: Dict[str, float] = {}
+
+
+    def _open_books(self) -> List[Iterator]:
+        """ Creates the book of each isin (history processed) and returns the
+        message tapes. Isins without files this day are skipped. """
+        tape_list = []
+        for rank, isin in enumerate(self.isins):
+            try:
+                tapes = read_tapes(isin, self.date_str)
+                orderbook = Orderbook(self.date, isin, *auction_times(self.df_auctions, isin, self.date))
+                orderbook.set_inputs(tapes.removed_orders, tapes.trades())
+                for message in tapes.history_messages():
+                    orderbook.process(message)
+            except (FileNotFoundError, ValueError) as e:
+                print(f'Cross section: {isin} {self.date_str} skipped ({e})')
+                continue
+
+            self.books[isin] = orderbook
+            tape_list.append(_tape(rank, tapes, self.cutoff))
+        return tape_list
+
+
+    def _sample(self, timestamp: int) -> None:
+        """ Snapshot of every book at timestamp. """
+        for isin, orderbook in self.books.items():
+            orderbook._check_for_order_cancelations(timestamp)
+            self.snapshots(isin, timestamp, orderbook)
+
+
+    def run(self) -> pd.DataFrame:
+        """
+        Replays the day and returns the snapshots, one row per time and isin.
+        Throughput is reported in stats. A book failing on a message is dropped
+        (logged), the others go on.
+
+        Returns:
+            pd.DataFrame: snapshots sorted by timestamp and isin.
+        """
+        start_time = time.perf_counter()
+        tapes = self._open_books()
+
+        grid_times = self.grid.times()
+        next_time = next(grid_times, None)
+        messages = 0
+
+        for message_dtm, rank, _, message in heapq.merge(*tapes):
+            # Every book sampled at the grid times before the message
+            while next_time is not None and message_dtm > next_time:
+                self._sample(next_time)
+                next_time = next(grid_times, None)
+
+            if message_dtm > self.cutoff:
+                break
+
+            isin = self.isins[rank]
+            orderbook = self.books.get(isin)
+            if orderbook is None:
+                continue
+            try:
+                orderbook.process(message)
+            except Exception as e:
+                logger.error(f'{message_dtm} - Cross section: {isin} dropped ({e!r})')
+                del self.books[isin]
+            messages += 1
+
+        # Grid times after the last message
+        while next_time is not None:
+            self._sample(next_time)
+            next_time = next(grid_times, None)
+
+        seconds = time.perf_counter() - start_time
+        self.stats = {
+            'isins': len(self.books),
+            'messages': messages,
+            'snapshots': len(self.snapshots),
+            'seconds': seconds,
+            'messages_per_second': messages / seconds if seconds > 0 else 0,
+        }
+        return self.to_frame()
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """ Snapshots of every isin, sorted by timestamp and isin. """
+        frames = [self.snapshots.to_frame(isin).assign(isin=isin) for isin in self.snapshots.rows]
+        if not frames:
+            return pd.DataFrame(columns=['timestamp', 'isin'])
+        df = pd.concat(frames, ignore_index=True)
+        df = df[['timestamp', 'isin'] + [column for column in df.columns if column not in ('timestamp', 'isin')]]
+        return df.sort_values(['timestamp', 'isin'], kind='stable', ignore_index=True)
+
+
+def _replay_group(isins: List[str], date: dt.date, df_auctions: pd.DataFrame, kwargs: dict) -> Tuple[pd.DataFrame, dict]:
+    """ Replays a group of isins (one process). """
+    replay = CrossSectionReplay(isins, date, df_auctions=df_auctions, **kwargs)
+    return replay.run(), replay.stats
+
+
+def replay_cross_section(
+    isins: List[str], date: dt.date, groups: int=1, max_workers: int=None, **kwargs
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Cross-sectional snapshots of several isins for one day (see
+    CrossSectionReplay). The isins can be sharded in groups, one process per
+    group, the auction times are read once and shared.
+
+    Args:
+        isins (List[str]): isin codes of the securities.
+        date (dt.date): date of the orders and trades.
+        groups (int, optional): number of groups of isins. Defaults to 1 (in
+            this process).
+        max_workers (int, optional): number of processes. Defaults to None
+            (number of CPUs).
+        **kwargs: arguments of CrossSectionReplay (step, start, end, depth).
+
+    Returns:
+        Tuple[pd.DataFrame, dict]: snapshots sorted by timestamp and isin, and
+            aggregate throughput.
+    """
+    start_time = time.perf_counter()
+    df_auctions = read_auctions()
+    groups = max(1, min(groups, len(isins)))
+
+    if groups == 1:
+        results = [_replay_group(isins, date, df_auctions, kwargs)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_replay_group, isins[g::groups], date, df_auctions, kwargs)
+                for g in range(groups)
+            ]
+            results = [future.result() for future in futures]
+
+    df = pd.concat([df for df, _ in results], ignore_index=True)
+    df = df.sort_values(['timestamp', 'isin'], kind='stable', ignore_index=True)
+
+    seconds = time.perf_counter() - start_time
+    messages = sum(stats['messages'] for _, stats in results)
+    stats = {
+        'groups': groups,
+        'isins': sum(stats['isins'] for _, stats in results),
+        'messages': messages,
+        'snapshots': len(df),
+        'seconds': seconds,
+        'messages_per_second': messages / seconds if seconds > 0 else 0,
+    }
+    return df, stats
@@ -0,0 +1,235 @@
+# Import Built-Ins
+from typing import Dict, List, Tuple
+
+# Import Third-Party
+
+# Import Homebrew
+
+
+# Grid resolution of the index (finer than the tick sizes of the stocks).
+DEPTH_INDEX_TICK = 0.001
+
+# Prices at or beyond these are market order prices (sell at 0, buy at
+# 100_000), they are kept out of the grid.
+MARKET_PRICES = (0, 100_000)
+
+# Maximum number of price ticks of the grid, prices further away from the
+# others are kept out of the grid as well.
+MAX_TICKS = 1 << 20
+
+
+class DepthIndex:
+    """
+    Cumulative depth index of one side of the book: binary indexed (Fenwick)
+    trees over the price ticks holding the quantity and the notional (in ticks)
+    at each price. Prices are ordered from the touch outwards (descending for
+    bids, ascending for asks), so the quantity between the touch and any price,
+    the price reached when filling Q shares and its cost are found in
+    O(log ticks).
+    The grid grows (and is rebuilt) when a price falls outside of it. Market
+    order prices, and prices too far from the grid, are kept in a dict and
+    handled before (better prices) or after (worse prices) the grid.
+    """
+    __slots__ = ['tick', 'descending', '_origin', '_capacity', '_quantity_tree',
+                 '_notional_tree', '_quantities', '_outside']
+
+    def __init__(self, descending: bool, tick: float=DEPTH_INDEX_TICK) -> None:
+        """
+        Args:
+            descending (bool): True for bids (best price is the highest).
+            tick (float, optional): grid resolution. Defaults to DEPTH_INDEX_TICK.
+        """
+        self.tick = tick
+        self.descending = descending
+
+        # Position in the grid of a price: key (signed tick) minus origin
+        self._origin: int = None
+        self._capacity: int = 0
+        self._quantity_tree: List[int] = [0]
+        self._notional_tree: List[int] = [0]
+
+        # Quantities per price within the grid (to rebuild it) and out of it
+        self._quantities: Dict[float, int] = {}
+        self._outside: Dict[float, int] = {}
+
+
+    def _key(self, price: float) -> int:
+        """ Signed price tick, increasing from the touch outwards. """
+        price_tick = round(price / self.tick)
+        return -price_tick if self.descending else price_tick
+
+
+    def _price(self, position: int) -> float:
+        """ Price of a position of the grid. """
+        key = position + self._origin
+        return round((-key if self.descending else key) * self.tick, 6)
+
+
+    def add(self, price: float, quantity: int) -> None:
+        """
+        Adds a quantity (can be negative) at a price.
+        """
+        if quantity == 0:
+            return
+
+        if price <= MARKET_PRICES[0] or price >= MARKET_PRICES[1] or not self._fits(price):
+            total = self._outside.get(price, 0) + quantity
+            if total:
+                self._outside[price] = total
+            else:
+                self._outside.pop(price, None)
+            return
+
+        total = self._quantities.get(price, 0) + quantity
+        if total:
+            self._quantities[price] = total
+        else:
+            self._quantities.pop(price, None)
+
+        key = self._key(price)
+        i = key - self._origin + 1
+        notional = abs(key) * quantity
+        quantity_tree, notional_tree = self._quantity_tree, self._notional_tree
+        while i <= self._capacity:
+            quantity_tree[i] += quantity
+            notional_tree[i] += notional
+            i += i & -i
+
+
+    def _fits(self, price: float) -> bool:
+        """
+        Checks if a price is within the grid, growing the grid if needed.
+        Returns False if the grid would be larger than MAX_TICKS.
+        """
+        key = self._key(price)
+        if self._origin is not None and 0 <= key - self._origin < self._capacity:
+            return True
+
+        keys = [self._key(p) for p in self._quantities]
+        lowest = min(keys + [key])
+        highest = max(keys + [key])
+        if highest - lowest >= MAX_TICKS:
+            return False
+
+        # New grid, centered on the prices, with room to move
+        capacity = 1024
+        while capacity < 2 * (highest - lowest + 1):
+            capacity *= 2
+        capacity = min(capacity, MAX_TICKS)
+        self._origin = (lowest + highest) // 2 - capacity // 2
+        self._origin = min(self._origin, lowest)
+        self._origin = max(self._origin, highest - capacity + 1)
+        self._capacity = capacity
+
+        # Prices kept out of the previous grid that are now within it
+        for outside_price in list(self._outside):
+            if MARKET_PRICES[0] < outside_price < MARKET_PRICES[1] and \
+                    0 <= self._key(outside_price) - self._origin < capacity:
+                self._quantities[outside_price] = self._outside.pop(outside_price)
+
+        self._rebuild()
+        return True
+
+
+    def _rebuild(self) -> None:
+        """ Rebuilds the trees from the quantities of the grid in O(ticks). """
+        quantity_tree = [0] * (self._capacity + 1)
+        notional_tree = [0] * (self._capacity + 1)
+        for price, quantity in self._quantities.items():
+            key = self._key(price)
+            quantity_tree[key - self._origin + 1] += quantity
+            notional_tree[key - self._origin + 1] += abs(key) * quantity
+
+        for i in range(1, self._capacity + 1):
+            j = i + (i & -i)
+            if j <= self._capacity:
+                quantity_tree[j] += quantity_tree[i]
+                notional_tree[j] += notional_tree[i]
+
+        self._quantity_tree = quantity_tree
+        self._notional_tree = notional_tree
+
+
+    def _prefix(self, position: int) -> Tuple[int, int]:
+        """ Quantity and notional (in ticks) of the grid up to a position. """
+        quantity = notional = 0
+        i = min(position + 1, self._capacity)
+        while i > 0:
+            quantity += self._quantity_tree[i]
+            notional += self._notional_tree[i]
+            i -= i & -i
+        return quantity, notional
+
+
+    def _search(self, quantity: int) -> int:
+        """ First position of the grid at which the cumulative quantity reaches
+        quantity (capacity if never). """
+        position = 0
+        step = self._capacity
+        while step:
+            i = position + step
+            if i <= self._capacity and self._quantity_tree[i] < quantity:
+                position = i
+                quantity -= self._quantity_tree[i]
+            step >>= 1
+        return position
+
+
+    def _outside_levels(self, before: bool) -> List[Tuple[float, int]]:
+        """ Prices out of the grid, better (before) or worse than the grid,
+        from the touch outwards. """
+        levels = []
+        for price, quantity in self._outside.items():
+            key = self._key(price)
+            if price <= MARKET_PRICES[0] or price >= MARKET_PRICES[1]:
+                # Market buy prices are the best bids and the worst asks
+                is_before = (price >= MARKET_PRICES[1]) == self.descending
+            else:
+                is_before = self._origin is None or key < self._origin
+            if is_before == before:
+                levels.append((key, price, quantity))
+        return [(price, quantity) for _, price, quantity in sorted(levels)]
+
+
+    def depth(self, price: float) -> int:
+        """ Returns the quantity at prices from the touch up to price (included). """
+        key = self._key(price)
+        total = sum(q for p, q in self._outside.items() if self._key(p) <= key)
+        if self._origin is not None and key >= self._origin:
+            total += self._prefix(key - self._origin)[0]
+        return total
+
+
+    def fill(self, quantity: int) -> Tuple[float, float]:
+        """ Returns the worst price reached and the cost (price times quantity)
+        of filling a quantity against this side. (None, None) if there is not
+        enough quantity. """
+        cost = 0.0
+        remaining = quantity
+
+        before = self._outside_levels(before=True)
+        after = self._outside_levels(before=False)
+        for price, level_quantity in before:
+            if remaining <= level_quantity:
+                return price, cost + remaining * price
+            cost += level_quantity * price
+            remaining -= level_quantity
+
+        if self._capacity:
+            grid_quantity, grid_notional = self._prefix(self._capacity - 1)
+            if remaining <= grid_quantity:
+                position = self._search(remaining)
+                quantity_before, notional_before = self._prefix(position - 1) if position > 0 else (0, 0)
+                price = self._price(position)
+                cost += notional_before * self.tick + (remaining - quantity_before) * price
+                return price, cost
+            cost += grid_notional * self.tick
+            remaining -= grid_quantity
+
+        for price, level_quantity in after:
+            if remaining <= level_quantity:
+                return price, cost + remaining * price
+            cost += level_quantity * price
+            remaining -= level_quantity
+
+        return None, None
@@ -0,0 +1,232 @@
+# Import Built-Ins
+import datetime as dt
+import os
+from typing import Dict, Iterator, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from .orderbook import removed_orders_arrays, trades_list
+from src.constants.constants import PATHS
+from src.utils.time_utils import datetime_columns_to_nanoseconds
+
+
+# Columns of the removed orders and trades used by a replay (see
+# removed_orders_arrays and trades_list).
+REMOVED_ORDERS_COLUMNS = ['o_id_fd', 'o_dtm_br', 'o_state']
+TRADE_COLUMNS = ['t_dtm_neg', 't_id_b_fd', 't_id_s_fd', 't_q_exchanged', 't_price', 't_agg']
+
+# Messages turned into dicts at once during a replay (see ReplayTapes).
+MESSAGE_CHUNK_SIZE = 10_000
+
+
+def orders_path(isin: str, date_str: str) -> str:
+    """ Path of the order file (VHOX) of an isin for one day. """
+    return os.path.join(PATHS['orders'], isin, f'VHOX_{isin}_{date_str}.parquet')
+
+
+def history_path(isin: str, date_str: str) -> str:
+    """ Path of the history file (VHOXhistory) of an isin for one day. """
+    return os.path.join(PATHS['histories'], isin, f'VHOXhistory_{isin}_{date_str}.parquet')
+
+
+def removed_orders_path(isin: str, date_str: str) -> str:
+    """ Path of the removed orders file of an isin for one day. """
+    return os.path.join(PATHS['removed_orders'], isin, f'removedOrders_{isin}_{date_str}.parquet')
+
+
+def trades_path(isin: str, date_str: str) -> str:
+    """ Path of the trade file (VHD) of an isin for one day. """
+    return os.path.join(PATHS['trades'], isin, f'VHD_{isin}_{date_str}.parquet')
+
+
+def auctions_path() -> str:
+    """ Path of the auction times of every isin and day (see 03_get_auctions). """
+    return os.path.join(PATHS['root'], 'auctions.parquet')
+
+
+def input_fingerprint(isin: str, date_str: str) -> Dict[str, tuple]:
+    """
+    Sizes and modification times of the input files of a replay of an isin
+    for one day (history, orders, removed orders, trades and auction times),
+    by file name, None for a missing file. Books and tapes saved from the
+    files are only used while the fingerprint is the same (see checkpoint,
+    replay_cache).
+    """
+    paths = [
+        history_path(isin, date_str), orders_path(isin, date_str), removed_orders_path(isin, date_str),
+        trades_path(isin, date_str), auctions_path(),
+    ]
+    fingerprint = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint[os.path.basename(path)] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            fingerprint[os.path.basename(path)] = None
+    return fingerprint
+
+
+def read_orders(isin: str, date_str: str, after: int=None, end: int=None) -> pd.DataFrame:
+    """
+    Reads the order file (VHOX) of an isin for one day, times as int64
+    nanoseconds. Only the row groups holding messages in (after, end] are read.
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date of the file (YYYYMMDD).
+        after (int, optional): messages strictly after this time only. Defaults
+            to None.
+        end (int, optional): messages at or before this time only. Defaults to
+            None.
+
+    Returns:
+        pd.DataFrame: messages of the order file.
+    """
+    path = orders_path(isin, date_str)
+    filters = []
+    if after is not None:
+        filters.append(('o_dtm_va', '>', pd.Timestamp(after)))
+    if end is not None:
+        filters.append(('o_dtm_va', '<=', pd.Timestamp(end)))
+    return datetime_columns_to_nanoseconds(pd.read_parquet(path, filters=filters or None))
+
+
+def read_history(isin: str, date_str: str) -> pd.DataFrame:
+    """ Reads the history file (VHOXhistory): orders in the book before the
+    start of the day, times as int64 nanoseconds. """
+    return datetime_columns_to_nanoseconds(pd.read_parquet(history_path(isin, date_str)))
+
+
+def read_removed_orders(isin: str, date_str: str) -> pd.DataFrame:
+    """ Reads the removed orders file (see 02_get_removed_orders), times as
+    int64 nanoseconds. """
+    return datetime_columns_to_nanoseconds(pd.read_parquet(removed_orders_path(isin, date_str), columns=REMOVED_ORDERS_COLUMNS))
+
+
+def read_trades(isin: str, date_str: str) -> pd.DataFrame:
+    """ Reads the trade file (VHD), times as int64 nanoseconds. """
+    return datetime_columns_to_nanoseconds(pd.read_parquet(trades_path(isin, date_str), columns=TRADE_COLUMNS))
+
+
+def read_auctions() -> pd.DataFrame:
+    """ Reads the auction times of every isin and day (see 03_get_auctions). """
+    return pd.read_parquet(auctions_path())
+
+
+def auction_times(df_auctions: pd.DataFrame, isin: str, date: dt.date) -> Tuple[dt.datetime, dt.datetime]:
+    """ Returns the opening and closing auction datetimes of an isin for one
+    day, from the auction times read once (see read_auctions). """
+    mask = (df_auctions['isin'] == isin) & (df_auctions['date'] == date)
+    return df_auctions.loc[mask].auct_open_datetime.item(), df_auctions.loc[mask].auct_close_datetime.item()
+
+
+def read_auction_times(isin: str, date: dt.date) -> Tuple[dt.datetime, dt.datetime]:
+    """ Returns the opening and closing auction datetimes of an isin for one
+    day (see 03_get_auctions). """
+    return auction_times(read_auctions(), isin, date)
+
+
+class DayInputs:
+    """ Input files of a replay of one isin for one day (see read_day_inputs). """
+    __slots__ = ['isin', 'date_str', 'history', 'orders', 'removed_orders', 'trades']
+
+    def __init__(
+        self, isin: str, date_str: str, history: pd.DataFrame, orders: pd.DataFrame, 
+        removed_orders: pd.DataFrame, trades: pd.DataFrame
+    ) -> None:
+        self.isin = isin
+        self.date_str = date_str
+        self.history = history
+        self.orders = orders
+        self.removed_orders = removed_orders
+        self.trades = trades
+
+
+def read_day_inputs(isin: str, date_str: str) -> DayInputs:
+    """ Reads every input file of a replay of one isin for one day (history, 
+    orders, removed orders, trades), times as int64 nanoseconds. """
+    return DayInputs(
+        isin, date_str, read_history(isin, date_str), read_orders(isin, date_str),
+        read_removed_orders(isin, date_str), read_trades(isin, date_str),
+    )
+
+
+class ReplayTapes:
+    """
+    Replay-ready inputs of one isin for one day: messages (history then
+    orders, in file order), cancellations as time-sorted arrays (see 
+    removed_orders_arrays) and trades in reverse order (see trades_list). 
+    Messages are held as a DataFrame or an Arrow table (see replay_cache) and
+    turned into dicts by chunks when replayed.
+    """
+    __slots__ = ['isin', 'date_str', '_messages', 'history_rows', 'message_times', 
+                 'removed_orders', '_trades']
+
+    def __init__(
+        self, isin: str, date_str: str, messages, history_rows: int, 
+        removed_orders: Tuple[np.ndarray, np.ndarray], trades
+    ) -> None:
+        """
+        Args:
+            isin (str): isin code of the security.
+            date_str (str): date (YYYYMMDD).
+            messages (pd.DataFrame or pa.Table): history then order messages,
+                times as int64 nanoseconds.
+            history_rows (int): number of history messages (first rows).
+            removed_orders (Tuple[np.ndarray, np.ndarray]): removal timestamps
+                and ids of the canceled orders.
+            trades (List[dict] or pa.Table): trades in reverse order.
+        """
+        self.isin = isin
+        self.date_str = date_str
+        self._messages = messages
+        self.history_rows = history_rows
+        self.message_times: np.ndarray = np.asarray(messages['o_dtm_va'])[history_rows:].astype('int64', copy=False)
+        self.removed_orders = removed_orders
+        self._trades = trades
+
+
+    @classmethod
+    def from_frames(
+        cls, isin: str, date_str: str, df_history: pd.DataFrame, df_orders: pd.DataFrame,
+        df_removed_orders: pd.DataFrame, df_trades: pd.DataFrame
+    ) -> 'ReplayTapes':
+        """ Tapes of the input files read (see read_day_inputs), df_history
+        can be None (replay from a checkpoint). """
+        frames = [df_orders] if df_history is None else [df_history, df_orders]
+        messages = pd.concat(frames, ignore_index=True) if len(frames) > 1 else df_orders.reset_index(drop=True)
+        history_rows = 0 if df_history is None else len(df_history)
+        return cls(isin, date_str, messages, history_rows, removed_orders_arrays(df_removed_orders), trades_list(df_trades))
+
+
+    def _records(self, start: int, end: int) -> List[dict]:
+        """ Messages of rows [start, end) as dicts. """
+        if isinstance(self._messages, pd.DataFrame):
+            return self._messages.iloc[start:end].to_dict('records')
+        return self._messages.slice(start, end - start).to_pylist()
+
+
+    def history_messages(self) -> List[dict]:
+        """ Messages of the history file. """
+        return self._records(0, self.history_rows)
+
+
+    def order_messages(self, after: int=None, end: int=None) -> Iterator[dict]:
+        """ Messages of the order file in (after, end] (int64 nanoseconds), 
+        built by chunks of MESSAGE_CHUNK_SIZE. """
+        start = np.searchsorted(self.message_times, after, side='right') if after is not None else 0
+        stop = np.searchsorted(self.message_times, end, side='right') if end is not None else len(self.message_times)
+        for chunk_start in range(start, stop, MESSAGE_CHUNK_SIZE):
+            chunk_end = min(chunk_start + MESSAGE_CHUNK_SIZE, stop)
+            yield from self._records(self.history_rows + chunk_start, self.history_rows + chunk_end)
+
+
+    def trades(self) -> List[dict]:
+        """ Trades in reverse order (a new list, consumed by the replay). """
+        if isinstance(self._trades, list):
+            return list(self._trades)
+        return self._trades.to_pylist()
+
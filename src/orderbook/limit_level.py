@@ -1,50 +1,151 @@
 # Import Built-Ins
+from typing import Tuple
 
 # Import Third-Party
 
 # Import Homebrew
 from .order import OrderList, Order
+from .queue_index import QueueIndex
 
 
 class LimitLevel:
     """
-    Limit level class. Allows for total quantity, and detail about quantity 
+    Limit level class. Allows for total quantity, and detail about quantity
     provided by HFTs as well as iceberg orders.
+    The queue index (position and quantity ahead of each order) is only built
+    once a queue position is asked for, then kept up to date.
     """
-    __slots__ = ['price', 'size', 
+    __slots__ = ['price', 'size',
                  'disclosed_size_hft', 'disclosed_size_mixed', 'disclosed_size_non',
                  'hidden_size_hft', 'hidden_size_mixed', 'hidden_size_non',
-                 'orders']
+                 'orders', 'queue']
 
     def __init__(self, order: Order) -> None:
         # Data Values
         self.price = order.o_price
-        self.size = order.o_q_rem
+        self.size = 0
 
-        displayed_qty = min(order.o_q_rem, order.o_q_dis)
-
-        self.disclosed_size_hft = displayed_qty if order.o_member == 'HFT' else 0
-        self.disclosed_size_mixed = displayed_qty if order.o_member == 'MIX' else 0
-        self.disclosed_size_non = displayed_qty if order.o_member == 'NON' else 0
-        self.hidden_size_hft = order.o_q_rem - displayed_qty if order.o_member == 'HFT' else 0
-        self.hidden_size_mixed = order.o_q_rem - displayed_qty if order.o_member == 'MIX' else 0
-        self.hidden_size_non = order.o_q_rem - displayed_qty if order.o_member == 'NON' else 0
+        self.disclosed_size_hft = 0
+        self.disclosed_size_mixed = 0
+        self.disclosed_size_non = 0
+        self.hidden_size_hft = 0
+        self.hidden_size_mixed = 0
+        self.hidden_size_non = 0
 
-        # Doubly-Linked-list
-        self.orders = OrderList(self)
+        # Orders in time priority
+        self.orders = OrderList()
+        self.queue: QueueIndex = None
         self.append(order)
 
 
     def __repr__(self):
         return str((self.price, self.size))
-    
+
 
     def __len__(self):
         return len(self.orders)
 
 
-    def append(self, order: Order) -> None:
+    def quantities(self) -> Tuple[int]:
+        """
+        Returns the quantities of the level: size, disclosed size (HFT, MIX, 
+        NON) and hidden size (HFT, MIX, NON).
+        """
+        return (
+            self.size,
+            self.disclosed_size_hft, self.disclosed_size_mixed, self.disclosed_size_non,
+            self.hidden_size_hft, self.hidden_size_mixed, self.hidden_size_non,
+        )
+
+
+    def append(self, order: Order) -> Tuple[int]:
+        """
+        Appends an order to the level and adds its quantities. Returns the 
+        change of the level's quantities (see update).
+        """
+        self.orders.append(order)
+        if self.queue is not None:
+            self.queue.append(order)
+
+        displayed_qty = min(order.o_q_rem, order.o_q_dis)
+        return self.update(order.o_member, displayed_qty, order.o_q_rem - displayed_qty)
+
+
+    def remove(self, order: Order) -> Tuple[int]:
+        """
+        Removes an order from the level and subtracts its quantities. Returns 
+        the change of the level's quantities (see update).
+        """
+        self.unlink(order)
+        return self.update(order.o_member, -order.o_q_dis, order.o_q_dis - order.o_q_rem)
+
+
+    def unlink(self, order: Order) -> None:
+        """
+        Removes an order from the level's queue, without changing the level's
+        quantities (see subtract).
+        """
+        if self.queue is not None:
+            self.queue.remove(order)
+        self.orders.remove(order)
+
+
+    def update_order(self, order: Order, disclosed: int, hidden: int) -> Tuple[int]:
+        """
+        The quantities of an order of the level changed (disclosed and hidden, 
+        can be negative). Returns the change of the level's quantities.
+        """
+        if self.queue is not None:
+            self.queue.update(order, disclosed + hidden, disclosed)
+        return self.update(order.o_member, disclosed, hidden)
+
+
+    def queue_position(self, order: Order) -> Tuple[int, int, int]:
+        """
+        Returns the position of an order in the queue (0 for the first order),
+        the remaining and displayed quantity ahead of it, in O(log n).
+        """
+        if self.queue is None:
+            self.queue = QueueIndex(self.orders)
+        return self.queue.ahead(order)
+
+
+    def update(self, member: str, disclosed: int, hidden: int) -> Tuple[int]:
+        """
+        Adds quantities (disclosed and hidden, can be negative) provided by a
+        member category to the level. Returns the change of the level's 
+        quantities, in the same order as quantities.
+        """
+        self.size += disclosed + hidden
+
+        if member == 'HFT':
+            self.disclosed_size_hft += disclosed
+            self.hidden_size_hft += hidden
+            return (disclosed + hidden, disclosed, 0, 0, hidden, 0, 0)
+        elif member == 'MIX':
+            self.disclosed_size_mixed += disclosed
+            self.hidden_size_mixed += hidden
+            return (disclosed + hidden, 0, disclosed, 0, 0, hidden, 0)
+        elif member == 'NON':
+            self.disclosed_size_non += disclosed
+            self.hidden_size_non += hidden
+            return (disclosed + hidden, 0, 0, disclosed, 0, 0, hidden)
+        
+        return (disclosed + hidden, 0, 0, 0, 0, 0, 0)
+
+
+    def subtract(
+        self, size: int, disclosed_hft: int, disclosed_mixed: int, disclosed_non: int,
+        hidden_hft: int, hidden_mixed: int, hidden_non: int
+    ) -> None:
         """
-        Wrapper function to make appending an order easier.
+        Subtract quantities from the limit level at once (used when several
+        orders of the level are removed together).
         """
-        return self.orders.append(order)
\ No newline at end of file
+        self.size -= size
+        self.disclosed_size_hft -= disclosed_hft
+        self.disclosed_size_mixed -= disclosed_mixed
+        self.disclosed_size_non -= disclosed_non
+        self.hidden_size_hft -= hidden_hft
+        self.hidden_size_mixed -= hidden_mixed
+        self.hidden_size_non -= hidden_non
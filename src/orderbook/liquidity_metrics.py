@@ -0,0 +1,260 @@
+# Import Built-Ins
+from typing import Dict, List, Tuple
+import bisect
+import math
+
+# Import Third-Party
+
+# Import Homebrew
+from .limit_level import LimitLevel
+
+
+# Number of levels (per side) and distances to the mid (basis points) of the
+# cumulative depths kept by the orderbook.
+LIQUIDITY_DEPTHS = (3, 5)
+LIQUIDITY_BPS = (10, 50)
+
+# Quantities of a limit level, in the order of LimitLevel.quantities.
+QUANTITY_FIELDS = ('qty', 'hft_dis', 'mix_dis', 'non_dis', 'hft_hid', 'mix_hid', 'non_hid')
+
+
+class _Window:
+    """
+    Cumulative quantities of the limit levels of one side within a price range
+    (lower and upper bounds included).
+    """
+    __slots__ = ['lower', 'upper', 'quantities', 'dirty']
+
+    def __init__(self) -> None:
+        self.lower = math.inf
+        self.upper = -math.inf
+        self.quantities = [0] * len(QUANTITY_FIELDS)
+        self.dirty = True
+
+
+class LiquidityMetrics:
+    """
+    Running liquidity aggregates of an orderbook: cumulative depth over the
+    best N levels and within X bps of the mid (split by member category and
+    disclosed/hidden quantity), queue imbalances and microprice.
+    The orderbook reports each change of a limit level (see level_changed), the
+    aggregates are then updated in O(1). Only the creation or removal of a
+    level among the best N flags a depth aggregate to be rebuilt, which is done
+    when the metrics are read. When the mid moves, the ranges within X bps are
+    moved: only the levels between the old and the new bounds are added or
+    subtracted, found in the sorted prices of each side (kept up to date on the
+    creation and removal of levels, O(log n) search).
+    Only the sides (dicts of limit levels) are kept, not the orderbook.
+    """
+    __slots__ = ['depths', 'bps', '_sides', '_prices', '_depth_windows', '_bps_windows', '_mid']
+
+    def __init__(
+        self, bids: Dict[float, LimitLevel], asks: Dict[float, LimitLevel],
+        depths: Tuple[int]=LIQUIDITY_DEPTHS, bps: Tuple[float]=LIQUIDITY_BPS
+    ) -> None:
+        """
+        Args:
+            bids (Dict[float, LimitLevel]): bid limit levels of the orderbook.
+            asks (Dict[float, LimitLevel]): ask limit levels of the orderbook.
+            depths (Tuple[int], optional): numbers of levels of the cumulative
+                depths. Defaults to LIQUIDITY_DEPTHS.
+            bps (Tuple[float], optional): distances to the mid (basis points)
+                of the cumulative depths. Defaults to LIQUIDITY_BPS.
+        """
+        self.depths = tuple(depths)
+        self.bps = tuple(bps)
+        self._sides = (bids, asks)
+
+        # Sorted prices of the levels per side (0: bids, 1: asks)
+        self._prices: Tuple[List[float]] = (sorted(bids), sorted(asks))
+
+        # Windows per side, the ranges within X bps empty until there is a mid
+        self._depth_windows: Tuple[List[_Window]] = tuple([_Window() for _ in self.depths] for _ in range(2))
+        self._bps_windows: Tuple[List[_Window]] = tuple([_Window() for _ in self.bps] for _ in range(2))
+        for side_index, side_windows in enumerate(self._bps_windows):
+            for window in side_windows:
+                window.lower, window.upper = _empty_range(side_index)
+                window.dirty = False
+        self._mid: float = None
+
+
+    def level_changed(
+        self, side_index: int, price: float, delta: Tuple[int], structural: bool
+    ) -> None:
+        """
+        Updates the aggregates after a change of a limit level.
+
+        Args:
+            side_index (int): 0 for bids, 1 for asks.
+            price (float): price of the limit level.
+            delta (Tuple[int]): change of the level's quantities (as in
+                QUANTITY_FIELDS).
+            structural (bool): True if the level was created or removed.
+        """
+        if structural:
+            # Created if not in the prices yet, removed otherwise
+            prices = self._prices[side_index]
+            position = bisect.bisect_left(prices, price)
+            if position < len(prices) and prices[position] == price:
+                del prices[position]
+            else:
+                prices.insert(position, price)
+
+        for window in self._depth_windows[side_index]:
+            if window.dirty or not window.lower <= price <= window.upper:
+                continue
+            if structural:
+                # The best N levels are not the same anymore
+                window.dirty = True
+            else:
+                window.quantities = [q + d for q, d in zip(window.quantities, delta)]
+
+        for window in self._bps_windows[side_index]:
+            if window.lower <= price <= window.upper:
+                window.quantities = [q + d for q, d in zip(window.quantities, delta)]
+
+
+    def get_depth(self, side_index: int, depth: int) -> List[int]:
+        """ Returns the cumulative quantities (as in QUANTITY_FIELDS) of the 
+        best levels of a side. depth must be one of the depths kept. """
+        window = self._depth_windows[side_index][self.depths.index(depth)]
+        if window.dirty:
+            self._refresh_depth_windows(side_index)
+        return window.quantities
+
+
+    def get_metrics(self, best_bid: LimitLevel, best_ask: LimitLevel) -> Dict[str, float]:
+        """ Returns the liquidity metrics as a flat dict, eg: 'depth_3',
+        'bid_depth_3_hft_dis', 'imbalance_bps_10', 'microprice'.
+
+        Args:
+            best_bid (LimitLevel): best bid of the orderbook (can be None).
+            best_ask (LimitLevel): best ask of the orderbook (can be None).
+
+        Returns:
+            Dict[str, float]: liquidity metrics.
+        """
+        mid = None
+        if best_bid is not None and best_ask is not None:
+            mid = (best_bid.price + best_ask.price) / 2
+
+        if mid != self._mid:
+            # Price ranges within X bps of the mid have moved
+            self._mid = mid
+            self._move_bps_windows(0)
+            self._move_bps_windows(1)
+
+        for side_index in range(2):
+            if any(window.dirty for window in self._depth_windows[side_index]):
+                self._refresh_depth_windows(side_index)
+
+        metrics = {'mid': mid if mid is not None else math.nan}
+
+        # Best level imbalance and microprice
+        if mid is not None:
+            bid_size, ask_size = best_bid.size, best_ask.size
+            metrics['imbalance'] = _imbalance(bid_size, ask_size)
+            if bid_size + ask_size > 0:
+                metrics['microprice'] = (best_ask.price * bid_size + best_bid.price * ask_size) / (bid_size + ask_size)
+            else:
+                metrics['microprice'] = mid
+        else:
+            metrics['imbalance'] = math.nan
+            metrics['microprice'] = math.nan
+
+        for n, depth in enumerate(self.depths):
+            self._add_window_metrics(metrics, f'depth_{depth}', self._depth_windows[0][n], self._depth_windows[1][n])
+        for n, bps in enumerate(self.bps):
+            self._add_window_metrics(metrics, f'bps_{bps}', self._bps_windows[0][n], self._bps_windows[1][n])
+
+        return metrics
+
+
+    @staticmethod
+    def _add_window_metrics(
+        metrics: Dict[str, float], name: str, bid_window: _Window, ask_window: _Window
+    ) -> None:
+        """ Adds the quantities and imbalance of a pair of windows to metrics. """
+        bid_quantities = bid_window.quantities
+        ask_quantities = ask_window.quantities
+
+        metrics[name] = bid_quantities[0] + ask_quantities[0]
+        metrics[f'imbalance_{name}'] = _imbalance(bid_quantities[0], ask_quantities[0])
+        for field, bid_quantity, ask_quantity in zip(QUANTITY_FIELDS, bid_quantities, ask_quantities):
+            metrics[f'bid_{name}_{field}'] = bid_quantity
+            metrics[f'ask_{name}_{field}'] = ask_quantity
+
+
+    def _refresh_depth_windows(self, side_index: int) -> None:
+        """ Rebuilds the cumulative depths over the best levels of a side. """
+        side = self._sides[side_index]
+        max_depth = max(self.depths, default=0)
+        if side_index == 0:
+            prices = self._prices[0][::-1][:max_depth]
+        else:
+            prices = self._prices[1][:max_depth]
+
+        # Cumulative quantities after each level
+        cumulative = [[0] * len(QUANTITY_FIELDS)]
+        for price in prices:
+            cumulative.append([q + d for q, d in zip(cumulative[-1], side[price].quantities())])
+
+        for depth, window in zip(self.depths, self._depth_windows[side_index]):
+            window.quantities = cumulative[min(depth, len(prices))]
+
+            # Range of the included levels, a side with less than N levels
+            # includes any new level
+            if len(prices) >= depth > 0:
+                bound = prices[depth - 1]
+            else:
+                bound = -math.inf if side_index == 0 else math.inf
+
+            if side_index == 0:
+                window.lower, window.upper = bound, math.inf
+            else:
+                window.lower, window.upper = -math.inf, bound
+            window.dirty = False
+
+
+    def _move_bps_windows(self, side_index: int) -> None:
+        """ Moves the ranges within X bps of a side to the current mid: the
+        levels between the old and the new bound are added or subtracted. """
+        side = self._sides[side_index]
+        prices = self._prices[side_index]
+        for bps, window in zip(self.bps, self._bps_windows[side_index]):
+            if self._mid is None:
+                lower, upper = _empty_range(side_index)
+            elif side_index == 0:
+                lower, upper = self._mid * (1 - bps / 10_000), math.inf
+            else:
+                lower, upper = -math.inf, self._mid * (1 + bps / 10_000)
+
+            # Levels entering (sign 1) or leaving (sign -1) the range
+            if side_index == 0:
+                sign = 1 if lower < window.lower else -1
+                start = bisect.bisect_left(prices, min(lower, window.lower))
+                end = bisect.bisect_left(prices, max(lower, window.lower))
+            else:
+                sign = 1 if upper > window.upper else -1
+                start = bisect.bisect_right(prices, min(upper, window.upper))
+                end = bisect.bisect_right(prices, max(upper, window.upper))
+
+            quantities = window.quantities
+            for price in prices[start:end]:
+                quantities = [q + sign * d for q, d in zip(quantities, side[price].quantities())]
+            window.quantities = quantities
+            window.lower, window.upper = lower, upper
+
+
+def _empty_range(side_index: int) -> Tuple[float, float]:
+    """ Range within X bps without mid (no level included), bounds such that
+    the levels of the side are added when a mid is set. """
+    return (math.inf, math.inf) if side_index == 0 else (-math.inf, -math.inf)
+
+
+def _imbalance(bid_quantity: int, ask_quantity: int) -> float:
+    """ Queue imbalance between -1 (only asks) and 1 (only bids). """
+    total = bid_quantity + ask_quantity
+    if total == 0:
+        return math.nan
+    return (bid_quantity - ask_quantity) / total
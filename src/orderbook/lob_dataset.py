@@ -0,0 +1,173 @@
+# Import Built-Ins
+import datetime as dt
+import os
+import re
+from typing import Dict, Iterator, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+# Import Homebrew
+from src.constants.constants import PATHS
+
+
+# Rows per row group of the snapshot files (one hour of 1s snapshots): time
+# filters of LobDataset skip the rest of the day.
+LOB_ROW_GROUP_SIZE = 3_600
+
+# Rows per batch of LobDataset.iter_batches.
+LOB_BATCH_SIZE = 100_000
+
+
+def lob_files(isin: str, clock: str='1s') -> Dict[dt.date, str]:
+    """ Snapshot files of whole days of an isin for a clock (see
+    04_recreate_orderbooks), by date. Files of windows are left out. """
+    folder = os.path.join(PATHS['limit_order_books'], isin)
+    if not os.path.isdir(folder):
+        return {}
+    pattern = re.compile(rf'^LOBs_{re.escape(isin)}_(\d{{8}})_{re.escape(clock)}\.parquet$')
+    files = {}
+    for file in os.listdir(folder):
+        match = pattern.match(file)
+        if match:
+            files[dt.datetime.strptime(match.group(1), '%Y%m%d').date()] = os.path.join(folder, file)
+    return dict(sorted(files.items()))
+
+
+class LobDataset:
+    """
+    Snapshots of several isins and days (one clock) as one lazy dataset: the
+    files are only opened when rows are asked for. Columns are selected and
+    time filters pushed down to the files and row groups (statistics on
+    timestamp), rows come as an Arrow table, a pandas frame, numpy arrays or
+    by batches. The isin and date of each row are columns of the dataset.
+    """
+    def __init__(self, isins: List[str], dates: List[dt.date]=None, clock: str='1s') -> None:
+        """
+        Args:
+            isins (List[str]): isin codes of the securities.
+            dates (List[dt.date], optional): dates. Defaults to None (every
+                date with a file).
+            clock (str, optional): clock of the snapshots. Defaults to '1s'.
+        """
+        self.clock = clock
+        wanted = set(dates) if dates is not None else None
+        self.files: List[Tuple[str, dt.date, str]] = [
+            (isin, date, path)
+            for isin in isins
+            for date, path in lob_files(isin, clock).items()
+            if wanted is None or date in wanted
+        ]
+        if not self.files:
+            raise FileNotFoundError(f'No snapshot files ({clock}) for isins {isins}.')
+
+        schema = pa.unify_schemas([pq.read_schema(path) for _, _, path in self.files])
+        schema = schema.append(pa.field('isin', pa.string())).append(pa.field('date', pa.date32()))
+        self.dataset = ds.FileSystemDataset.from_paths(
+            [path for _, _, path in self.files], schema=schema, format=ds.ParquetFileFormat(),
+            filesystem=fs.LocalFileSystem(),
+            partitions=[(ds.field('isin') == isin) & (ds.field('date') == date) for isin, date, _ in self.files],
+        )
+
+
+    @property
+    def columns(self) -> List[str]:
+        """ Columns of the dataset. """
+        return self.dataset.schema.names
+
+
+    @property
+    def dates(self) -> List[dt.date]:
+        """ Dates with a file. """
+        return sorted({date for _, date, _ in self.files})
+
+
+    def _filter(self, start=None, end=None, times: Tuple[dt.time, dt.time]=None) -> ds.Expression:
+        """
+        Filter on timestamp: rows in [start, end] (anything pd.Timestamp
+        accepts) and, each day, between times (start and end time of day,
+        both included).
+        """
+        expression = None
+        if start is not None:
+            expression = ds.field('timestamp') >= pd.Timestamp(start)
+        if end is not None:
+            condition = ds.field('timestamp') <= pd.Timestamp(end)
+            expression = condition if expression is None else expression & condition
+        if times is not None:
+            # One range per day, the files and row groups of the other times skipped
+            condition = None
+            for date in self.dates:
+                day = (
+                    (ds.field('date') == date)
+                    & (ds.field('timestamp') >= pd.Timestamp(dt.datetime.combine(date, times[0])))
+                    & (ds.field('timestamp') <= pd.Timestamp(dt.datetime.combine(date, times[1])))
+                )
+                condition = day if condition is None else condition | day
+            expression = condition if expression is None else expression & condition
+        return expression
+
+
+    def to_table(self, columns: List[str]=None, start=None, end=None, times: Tuple[dt.time, dt.time]=None) -> pa.Table:
+        """
+        Reads the rows asked for as an Arrow table.
+
+        Args:
+            columns (List[str], optional): columns. Defaults to None (all).
+            start (optional): first time. Defaults to None.
+            end (optional): last time. Defaults to None.
+            times (Tuple[dt.time, dt.time], optional): times of day. Defaults
+                to None.
+
+        Returns:
+            pa.Table: rows, by isin then time.
+        """
+        return self.dataset.to_table(columns=columns, filter=self._filter(start, end, times))
+
+
+    def to_pandas(self, columns: List[str]=None, start=None, end=None, times: Tuple[dt.time, dt.time]=None) -> pd.DataFrame:
+        """ Reads the rows asked for as a pandas frame (see to_table). """
+        return self.to_table(columns, start, end, times).to_pandas()
+
+
+    def to_numpy(self, columns: List[str], start=None, end=None, times: Tuple[dt.time, dt.time]=None) -> Dict[str, np.ndarray]:
+        """ Reads the rows asked for as one numpy array per column (see
+        to_table), timestamps as int64 nanoseconds. """
+        table = self.to_table(columns, start, end, times)
+        arrays = {}
+        for column in columns:
+            array = table.column(column)
+            if pa.types.is_timestamp(array.type):
+                array = array.cast(pa.int64())
+            arrays[column] = array.to_numpy()
+        return arrays
+
+
+    def iter_batches(
+        self, columns: List[str]=None, start=None, end=None, times: Tuple[dt.time, dt.time]=None,
+        batch_size: int=LOB_BATCH_SIZE
+    ) -> Iterator[pd.DataFrame]:
+        """ Rows asked for by batches of at most batch_size rows, as pandas
+        frames (see to_table). Only one batch is in memory at a time. """
+        scanner = self.dataset.scanner(columns=columns, filter=self._filter(start, end, times), batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows > 0:
+                yield batch.to_pandas()
+
+
+    def count_rows(self, start=None, end=None, times: Tuple[dt.time, dt.time]=None) -> int:
+        """ Number of rows asked for (see to_table). """
+        return self.dataset.count_rows(filter=self._filter(start, end, times))
+
+
+def load_lobs(
+    isins: List[str], dates: List[dt.date]=None, clock: str='1s', columns: List[str]=None,
+    start=None, end=None, times: Tuple[dt.time, dt.time]=None
+) -> pd.DataFrame:
+    """ Snapshots of several isins and days in one frame (see LobDataset). """
+    return LobDataset(isins, dates, clock).to_pandas(columns, start, end, times)
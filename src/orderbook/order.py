@@ -1,6 +1,6 @@
 # Import Built-Ins
 from __future__ import annotations
-import datetime as dt 
+from typing import Dict
 
 # Import Third-Party
 
@@ -9,203 +9,131 @@ import datetime as dt
 
 class OrderList:
     """
-    Doubly-Linked List Container Class.
-    Stores head and tail orders, as well as count.
-    Keeps a reference to its parent LimitLevel Instance.
-    This container was added because it makes deleting the LimitLevels easier.
+    Queue Container Class (time priority).
+    Orders are stored in a dict keyed by o_id_fd. Dicts keep insertion order,
+    so iterating gives the orders in time priority, and appending or removing
+    an order is O(1).
+    Orders do not keep any reference to their list or limit level, so a book
+    holds no reference cycles and is freed by reference counting alone (the
+    cyclic garbage collector can be paused during replays).
     """
-    __slots__ = ['head', 'tail', 'count', 'parent_limit']
+    __slots__ = ['orders']
+
+    def __init__(self) -> None:
+        self.orders: Dict[int, Order] = {}
 
-    def __init__(self, parent_limit) -> None:
-        self.head = None
-        self.tail = None
-        self.count = 0
-        self.parent_limit = parent_limit
-        
 
     def __len__(self) -> int:
-        return self.count
+        return len(self.orders)
+
+
+    def __contains__(self, o_id_fd: int) -> bool:
+        return o_id_fd in self.orders
+
+
+    @property
+    def head(self) -> Order:
+        """ First order in line (None if the list is empty). """
+        return next(iter(self.orders.values()), None)
+
+
+    @property
+    def tail(self) -> Order:
+        """ Last order in line (None if the list is empty). """
+        return next(reversed(self.orders.values()), None)
+
 
     def append(self, order: Order) -> None:
         """
         Appends an order to this List.
-        Same as LimitLevel append, except it automatically updates head and tail
-        if it's the first order in this list.
         """
-        if not self.tail:
-            order.root = self
-            self.tail = order
-            self.head = order
-            self.count += 1
-        else:
-            self.tail.append(order)
+        self.orders[order.o_id_fd] = order
+        order.resting = True
+
+
+    def remove(self, order: Order) -> None:
+        """
+        Removes an order from this List.
+        """
+        del self.orders[order.o_id_fd]
+        order.resting = False
 
 
     def __repr__(self):
         return str([order for order in self.__iter__()])
-    
+
 
     def __iter__(self):
-        current = self.head
-        while current:
-            yield current.o_id_fd
-            current = current.next_item
+        return iter(self.orders)
 
 
 class Order:
     """
-    Doubly-Linked List Order item.
-    Keeps a reference to root, as well as previous and next order in line.
-    It also performs any and all updates to the root's tail, head and count
-    references, as well as updating the related LimitLevel's size, whenever
-    a method is called on this instance.
+    Order item.
+    Only holds the order's data. The limit level it rests in is found from the
+    book with its side and price (o_bs, o_price). The resting flag tells if the
+    order is currently in a limit level (False for stop orders not triggered or
+    orders only valid for the closing auction). The queue slot is the order's
+    slot in the queue index of its limit level, if the level keeps one.
+    Order instances are recycled by the orderbook (see Orderbook._new_order), 
+    load resets all the data from a new message.
     """
-    __slots__ = ['o_id_cha', 'o_id_fd', 'o_member', 'o_account', 'o_bs', 
+    __slots__ = ['o_id_cha', 'o_id_fd', 'o_member', 'o_account', 'o_bs',
                  'o_execution', 'o_validity', 'o_type', 'o_price', 'o_price_stop',
                  'o_q_ini', 'o_q_rem', 'o_q_neg', 'o_q_min', 'o_q_dis', 'o_dt_expiration', 'o_dtm_be',
-                 'o_dtm_va', 'next_item', 'previous_item', 'root']
-
-    def __init__(self, o_id_cha: int, o_id_fd: str,
-                 o_member: str, o_account: int, o_bs: str, o_execution: str, o_validity: int, o_type: str,     
-                 o_price, o_price_stop,
-                 o_q_ini, o_q_min, o_q_dis,
-                 o_dt_expiration: dt.datetime, o_dtm_be: dt.datetime, o_dtm_va: dt.datetime,
-                 next_item=None, previous_item=None, root=None):
-        
-        # Data Values
-        self.o_id_cha        = o_id_cha  # not used
-        self.o_id_fd         = o_id_fd   
-
-        self.o_member        = o_member
-        self.o_account       = o_account
-        self.o_bs            = o_bs
-        self.o_execution     = o_execution # not used
-        self.o_validity      = o_validity
-        self.o_type          = o_type
-
-        self.o_price         = o_price 
-        self.o_price_stop    = o_price_stop
-
-        self.o_q_ini         = o_q_ini
-        self.o_q_rem         = o_q_ini  # when created, remaining shares is the same, then it decreases up to 0                             
-        self.o_q_neg         = 0        # do not trust o_q_rem because it is updated. when created, no quantity negotiated 
-        self.o_q_min         = o_q_min 
-        self.o_q_dis         = o_q_dis 
-        
-        self.o_dt_expiration = o_dt_expiration # not needed, have book release
-        self.o_dtm_be        = o_dtm_be  # maybe needed for time priority
-        self.o_dtm_va        = o_dtm_va        
-
-        # DLL Attributes
-        self.next_item = next_item
-        self.previous_item = previous_item
-        self.root = root
+                 'o_dtm_va', 'resting', 'queue_slot']
 
-
-    @property
-    def parent_limit(self):
-        return self.root.parent_limit
+    def __init__(self, message: dict) -> None:
+        self.load(message)
 
 
-    #def append(self, order: Order):
-    def append(self, order):
-        """
-        Append an order.
-        """
-        if self.next_item is None:
-            self.next_item = order
-            self.next_item.previous_item = self
-            self.next_item.root = self.root
-
-            # Update Root Statistics in OrderList root obj
-            self.root.count += 1
-            self.root.tail = order
-
-            # Update quantities
-            displayed_qty = min(order.o_q_rem, order.o_q_dis)
-
-            self.parent_limit.size += order.o_q_rem
-            self.parent_limit.disclosed_size_hft += displayed_qty if order.o_member == 'HFT' else 0
-            self.parent_limit.disclosed_size_mixed += displayed_qty if order.o_member == 'MIX' else 0
-            self.parent_limit.disclosed_size_non += displayed_qty if order.o_member == 'NON' else 0
-            self.parent_limit.hidden_size_hft += order.o_q_rem - displayed_qty if order.o_member == 'HFT' else 0
-            self.parent_limit.hidden_size_mixed += order.o_q_rem - displayed_qty if order.o_member == 'MIX' else 0
-            self.parent_limit.hidden_size_non += order.o_q_rem - displayed_qty if order.o_member == 'NON' else 0
-
-        else:
-            ####
-            print('Does this happen ? Yes it does.')
-            self.next_item.append(order)
-
-    def overwrite_quantity_negociated(self, q_neg) -> None:
+    def load(self, message: dict) -> Order:
         """
-        Override to change quantity negociated, quantity remaining and update 
-        the limit level accordingly. This is used in orderbook when an order partially filled 
+        Sets the order's data from an order message (preprocessed). Times are
+        int64 nanoseconds since epoch.
         """
+        # Data Values
+        self.o_id_cha        = message['o_id_cha']  # not used
+        self.o_id_fd         = message['o_id_fd']
 
-        self.o_q_neg = q_neg
-        self.o_q_rem = self.o_q_ini - q_neg
+        self.o_member        = message['o_member']
+        self.o_account       = message['o_account']
+        self.o_bs            = message['o_bs']
+        self.o_execution     = message['o_execution'] # not used
+        self.o_validity      = message['o_validity']
+        self.o_type          = message['o_type']
 
-        old_q_dis = self.o_q_dis
-        self.o_q_dis = min(self.o_q_dis, self.o_q_rem)
+        self.o_price         = message['o_price']
+        self.o_price_stop    = message['o_price_stop']
 
-        impact_q_dis = old_q_dis - self.o_q_dis
-        impact_q_hid = q_neg - impact_q_dis
+        self.o_q_ini         = message['o_q_ini']
+        self.o_q_rem         = message['o_q_ini']  # when created, remaining shares is the same, then it decreases up to 0
+        self.o_q_neg         = 0        # do not trust o_q_rem because it is updated. when created, no quantity negotiated
+        self.o_q_min         = message['o_q_min']
+        self.o_q_dis         = message['o_q_dis']
 
-        # Update quantities
-        self.parent_limit.size -= q_neg
-        self.parent_limit.disclosed_size_hft -= (impact_q_dis if self.o_member == 'HFT' else 0)
-        self.parent_limit.disclosed_size_mixed -= (impact_q_dis if self.o_member == 'MIX' else 0)
-        self.parent_limit.disclosed_size_non -= (impact_q_dis if self.o_member == 'NON' else 0)
-        self.parent_limit.hidden_size_hft -= (impact_q_hid if self.o_member == 'HFT' else 0)
-        self.parent_limit.hidden_size_mixed -= (impact_q_hid if self.o_member == 'MIX' else 0)
-        self.parent_limit.hidden_size_non -= (impact_q_hid if self.o_member == 'NON' else 0)
+        self.o_dt_expiration = message['o_dt_expiration'] # not needed, have book release
+        self.o_dtm_be        = message['o_dtm_be']  # maybe needed for time priority
+        self.o_dtm_va        = message['o_dtm_va']
 
+        # Book Attributes
+        self.resting = False
+        self.queue_slot = None
 
-    def pop_from_list(self):
-        """
-        Pops this item from the DoublyLinkedList it belongs to.
+        return self
 
-        :return: Order() instance values as tuple
-        """
-        if self.previous_item is None:
-            # We're head
-            self.root.head = self.next_item
-
-        if self.next_item is None:
-            # We're tail
-            self.root.tail = self.previous_item
-        
-        if self.next_item:
-            self.next_item.previous_item = self.previous_item
-
-        if self.previous_item:
-            self.previous_item.next_item = self.next_item
-        
-        
-
-        # Update the Limit Level and root
-        self.root.count -= 1
-        self.parent_limit.size -= self.o_q_rem
-        #### This is clearly not definit
-        
-        self.parent_limit.disclosed_size_hft -= self.o_q_dis if self.o_member == 'HFT' else 0
-        self.parent_limit.disclosed_size_mixed -= self.o_q_dis if self.o_member == 'MIX' else 0
-        self.parent_limit.disclosed_size_non -= self.o_q_dis if self.o_member == 'NON' else 0
-        self.parent_limit.hidden_size_hft -= self.o_q_rem - self.o_q_dis if self.o_member == 'HFT' else 0
-        self.parent_limit.hidden_size_mixed -= self.o_q_rem - self.o_q_dis if self.o_member == 'MIX' else 0
-        self.parent_limit.hidden_size_non -= self.o_q_rem - self.o_q_dis if self.o_member == 'NON' else 0
-        
-        return self.__repr__()
-    
 
-    def reset(self):
+    def reload(self, message: dict) -> Order:
         """
-        Resets DLL attributes (used for pegged orders).
+        Sets the order's data from a modification message, keeping the quantity
+        already negociated (used when the order changes price and is relinked).
         """
-        self.next_item = None
-        self.previous_item = None
-        self.root = None
+        q_neg = self.o_q_neg
+        self.load(message)
+
+        self.o_q_neg = q_neg
+        self.o_q_rem = self.o_q_ini - q_neg
+        self.o_q_dis = min(self.o_q_dis, self.o_q_rem)
 
         return self
 
@@ -215,4 +143,4 @@ class Order:
 
 
     def __repr__(self):
-        return str((self.o_id_fd, self.o_bs, self.o_price, self.o_q_rem, self.o_dtm_va))
\ No newline at end of file
+        return str((self.o_id_fd, self.o_bs, self.o_price, self.o_q_rem, self.o_dtm_va))
@@ -0,0 +1,112 @@
+# Import Built-Ins
+from typing import Dict, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from .order import Order
+from src.utils.time_utils import NAT_NANOSECONDS
+
+
+# Counters kept per interval and member category.
+FLOW_FIELDS = (
+    'orders',           # orders submitted
+    'quantity',         # quantity submitted
+    'modifications',    # modifications of orders in the book
+    'cancels',          # orders canceled
+    'quantity_canceled',
+    'fills',            # executions (an order filled by a trade)
+    'quantity_filled',
+    'orders_filled',    # orders filled entirely
+    'lifetime_canceled',# sum of the lifetimes (seconds) of canceled orders
+    'lifetime_filled',  # sum of the lifetimes (seconds) of filled orders
+)
+
+_INDEX = {field: i for i, field in enumerate(FLOW_FIELDS)}
+
+
+class OrderFlowStats:
+    """
+    Streaming order flow statistics per interval and member category (HFT,
+    MIX, NON). The orderbook reports each event (new order, modification,
+    cancellation, fill), each costs one dict lookup and a few additions.
+    Ratios (order to trade, cancel rate, fill rate, mean lifetimes) are only
+    computed when the table is emitted.
+    """
+    __slots__ = ['bar_size', '_counters']
+
+    def __init__(self, bar_size: int) -> None:
+        """
+        Args:
+            bar_size (int): interval size (int64 nanoseconds).
+        """
+        self.bar_size = bar_size
+        self._counters: Dict[Tuple[int, str], List[float]] = {}
+
+
+    def _get_counters(self, timestamp: int, member: str) -> List[float]:
+        """ Counters of the interval of timestamp for a member category. """
+        key = (timestamp - timestamp % self.bar_size, member)
+        counters = self._counters.get(key)
+        if counters is None:
+            counters = self._counters[key] = [0] * len(FLOW_FIELDS)
+        return counters
+
+
+    @staticmethod
+    def _lifetime(order: Order, timestamp: int) -> float:
+        """ Time (seconds) since the order entered the book, 0 if unknown. """
+        if order.o_dtm_be is None or order.o_dtm_be == NAT_NANOSECONDS:
+            return 0
+        return (timestamp - order.o_dtm_be) / 1e9
+
+
+    def on_add(self, order: Order, timestamp: int) -> None:
+        """ New order submitted. """
+        counters = self._get_counters(timestamp, order.o_member)
+        counters[0] += 1
+        counters[1] += order.o_q_ini
+
+
+    def on_modify(self, order: Order, timestamp: int) -> None:
+        """ Order modified (price, stop price or quantity). """
+        self._get_counters(timestamp, order.o_member)[2] += 1
+
+
+    def on_cancel(self, order: Order, timestamp: int) -> None:
+        """ Order canceled (or expired), with its remaining quantity. """
+        counters = self._get_counters(timestamp, order.o_member)
+        counters[3] += 1
+        counters[4] += order.o_q_rem
+        counters[8] += self._lifetime(order, timestamp)
+
+
+    def on_fill(self, order: Order, quantity: int, filled: bool, timestamp: int) -> None:
+        """ Order (partially) filled by a trade. """
+        counters = self._get_counters(timestamp, order.o_member)
+        counters[5] += 1
+        counters[6] += quantity
+        if filled:
+            counters[7] += 1
+            counters[9] += self._lifetime(order, timestamp)
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """ Returns the statistics per interval and member category: counters
+        (FLOW_FIELDS) and ratios (order_to_trade, cancel_rate, fill_rate,
+        mean lifetimes in seconds). """
+        rows = [(bar_start, member, *counters) for (bar_start, member), counters in self._counters.items()]
+        df = pd.DataFrame.from_records(rows, columns=['bar_start', 'member', *FLOW_FIELDS])
+        df = df.sort_values(['bar_start', 'member'], ignore_index=True)
+        df['bar_start'] = pd.to_datetime(df['bar_start'].astype('int64'))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['order_to_trade'] = df['orders'] / df['fills'].replace(0, np.nan)
+            df['cancel_rate'] = df['cancels'] / df['orders'].replace(0, np.nan)
+            df['fill_rate'] = df['quantity_filled'] / df['quantity'].replace(0, np.nan)
+            df['lifetime_canceled'] = df['lifetime_canceled'] / df['cancels'].replace(0, np.nan)
+            df['lifetime_filled'] = df['lifetime_filled'] / df['orders_filled'].replace(0, np.nan)
+
+        return df
@@ -1,10 +1,11 @@
 # Import Built-Ins
 import datetime as dt
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from itertools import islice
 from collections import deque
 import logging
 import traceback
+import heapq
 
 # Import Third-Party
 import pandas as pd 
@@ -16,7 +17,57 @@ from .order import Order, OrderList
 from .trade import Trade 
 from .limit_level import LimitLevel
 from .auction import Auction
+from .liquidity_metrics import LiquidityMetrics, LIQUIDITY_DEPTHS, LIQUIDITY_BPS
+from .depth_index import DepthIndex, DEPTH_INDEX_TICK
+from .time_weighted import TimeWeightedLiquidity
+from .order_flow import OrderFlowStats
 from src.utils.preprocessing.preprocess_message import preprocess_message
+from src.utils.time_utils import to_nanoseconds, NAT_NANOSECONDS
+
+
+# Position of the member categories in the limit level quantities 
+# (size, disclosed hft/mix/non, hidden hft/mix/non).
+MEMBER_INDEX = {'HFT': 1, 'MIX': 2, 'NON': 3}
+
+# Fields of the depth matrix (see Orderbook.fill_depth_matrix).
+DEPTH_FIELDS = ('price', 'qty', 'hft_dis', 'mix_dis', 'non_dis', 'hft_hid', 'mix_hid', 'non_hid')
+
+# Attributes left out of the saved state (see Orderbook.get_state): day inputs,
+# statistics, released orders and tracked level changes.
+STATE_EXCLUDED = (
+    'removed_orders_dtm', 'removed_orders_id', 'trades', 'time_weighted',
+    'order_flow', '_order_pool', '_changed_levels',
+)
+
+# Version of the states of get_state, to raise when the attributes of the book
+# or of the objects it holds change: states of other versions are not restored.
+STATE_VERSION = 2
+
+
+def removed_orders_arrays(df_removed_orders: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """ 
+    Returns the time-sorted arrays (int64) of removal timestamps and ids of the 
+    canceled orders. Filled orders (o_state '2') are removed when trades are 
+    processed.
+    """
+    df_canceled = df_removed_orders.loc[df_removed_orders.o_state != '2']
+    df_canceled = df_canceled.sort_values(by='o_dtm_br', kind='stable')
+    if pd.api.types.is_datetime64_any_dtype(df_canceled['o_dtm_br']):
+        removed_orders_dtm = to_nanoseconds(df_canceled['o_dtm_br'])
+    else:
+        removed_orders_dtm = df_canceled['o_dtm_br'].to_numpy(dtype='int64')
+    return removed_orders_dtm, df_canceled['o_id_fd'].to_numpy(dtype='int64')
+
+
+def trades_list(df_trades: pd.DataFrame) -> List[dict]:
+    """ Returns the reversed list of trades (t_dtm_neg as int64 nanoseconds), 
+    the next trade last. """
+    fields = ['t_dtm_neg', 't_id_b_fd', 't_id_s_fd', 't_q_exchanged', 't_price', 't_agg']
+    df_trades = df_trades[fields]
+    df_trades_reversed = df_trades.sort_values(by='t_dtm_neg', ascending=False)
+    if pd.api.types.is_datetime64_any_dtype(df_trades_reversed['t_dtm_neg']):
+        df_trades_reversed = df_trades_reversed.assign(t_dtm_neg=to_nanoseconds(df_trades_reversed['t_dtm_neg']))
+    return list(df_trades_reversed.to_dict('records'))
 
 
 class Orderbook:
@@ -30,14 +81,28 @@ class Orderbook:
 
     def __init__(
         self, date: dt.date, isin: str, opening_auction_datetime: dt.datetime, 
-        closing_auction_datetime: dt.datetime
+        closing_auction_datetime: dt.datetime, liquidity_depths: tuple=LIQUIDITY_DEPTHS,
+        liquidity_bps: tuple=LIQUIDITY_BPS, depth_index: bool=False, 
+        depth_index_tick: float=DEPTH_INDEX_TICK
     ) -> None:
         """
+        All times handled by the orderbook (messages, removed orders, trades) are
+        int64 nanoseconds since epoch. Auction datetimes are converted here.
+
         Args:
             date (dt.date): date of the orders and trades.
             isin (str): isin code of the security.
             opening_auction_datetime (dt.datetime): datetime object for the opening auction.
             closing_auction_datetime (dt.datetime): datetime object for the closing auction.
+            liquidity_depths (tuple, optional): numbers of levels of the 
+                cumulative depths (see LiquidityMetrics). Defaults to LIQUIDITY_DEPTHS.
+            liquidity_bps (tuple, optional): distances to the mid (basis points)
+                of the cumulative depths. Defaults to LIQUIDITY_BPS.
+            depth_index (bool, optional): keep a cumulative depth index per 
+                side (see DepthIndex), needed by depth_at, price_to_fill and 
+                cost_to_fill. Defaults to False.
+            depth_index_tick (float, optional): price resolution of the depth
+                index. Defaults to DEPTH_INDEX_TICK.
         """
         # Fixed attributes.
         self.ISIN = isin 
@@ -50,9 +115,11 @@ class Orderbook:
         self.best_ask: LimitLevel = None
         self._orders: Dict[int, Order] = {}
 
-        # List of orders that exit the orderbook (either canceled or filled) and
+        # Orders that exit the orderbook (canceled) as time-sorted arrays, and 
         # list of trades.
-        self.removed_orders: List[dict] = None
+        self.removed_orders_dtm: np.ndarray = np.empty(0, dtype='int64')
+        self.removed_orders_id: np.ndarray = np.empty(0, dtype='int64')
+        self.removed_orders_cursor: int = 0
         self.trades: List[dict] = None
 
         # Containers to store contigent orders. 
@@ -61,19 +128,63 @@ class Orderbook:
         self.buy_stop_orders: Dict[float, Dict[str, deque]] = {}
         self.sell_stop_orders: Dict[float, Dict[str, deque]] = {}
         self.pegged_orders: Dict[int, Order] = {}
+
+        # Depth matrix of the best levels (bids, asks), only refreshed when a 
+        # level at or above the worst level of the matrix (bounds) changes.
+        self._depth_matrix: np.ndarray = np.full((2, 0, len(DEPTH_FIELDS)), np.nan)
+        self._depth_bounds: List[float] = [-np.inf, np.inf]
+        self._depth_dirty: List[bool] = [True, True]
+
+        # Running liquidity aggregates (depths, imbalances, microprice).
+        self.liquidity = LiquidityMetrics(self.bids, self.asks, liquidity_depths, liquidity_bps)
+
+        # Optional cumulative depth indexes (bids, asks) over price ticks.
+        self._depth_indexes: tuple = None
+        if depth_index:
+            self._depth_indexes = (
+                DepthIndex(descending=True, tick=depth_index_tick),
+                DepthIndex(descending=False, tick=depth_index_tick),
+            )
+
+        # Optional time-weighted liquidity (see set_time_weighted_liquidity).
+        self.time_weighted: TimeWeightedLiquidity = None
+
+        # Optional order flow statistics (see set_order_flow_stats).
+        self.order_flow: OrderFlowStats = None
+
+        # Optional (side, price) of the levels changed since the last call of
+        # pop_level_changes (see track_level_changes).
+        self._changed_levels: set = None
+
+        # Orders released by the book, recycled when new orders are added, and
+        # allocation counts (reported after each day).
+        self._order_pool: List[Order] = []
+        self.allocation_stats: Dict[str, int] = {
+            'orders_allocated': 0,
+            'orders_recycled': 0,
+            'limit_levels_allocated': 0,
+        }
     
         self.opening_auction = Auction(opening_auction_datetime)
         self.closing_auction = Auction(closing_auction_datetime)
 
+        # Precomputed auction thresholds (int64 nanoseconds).
+        self.next_auction_threshold: int = None
+        self._set_next_auction_threshold()
+
         # Current update data.
-        self.current_message_datetime = None
+        self.current_message_datetime: int = None
         self.last_trading_price = None
         self.current_order = None
+
+        # Trades processed so far (number and quantity), used by trade and 
+        # volume clocks.
+        self.trade_count: int = 0
+        self.traded_volume: int = 0
     
     @property
     def is_auction(self):
-        return (((self.current_message_datetime > self.opening_auction.datetime) and not self.opening_auction.passed) 
-                or ((self.current_message_datetime > self.closing_auction.datetime) and not self.closing_auction.passed))
+        return self.current_message_datetime > self.next_auction_threshold
 
     @property
     def is_before_auction(self):
@@ -112,7 +223,20 @@ class Orderbook:
             # Opening auction process.
             self.opening_auction.run_auction(self)
             self.last_trading_price = self.opening_auction.price
+            self._set_next_auction_threshold()
             self._trigger_stop_orders()
+
+
+    def _set_next_auction_threshold(self) -> None:
+        """
+        Sets the time (int64 nanoseconds) after which the next auction, not 
+        passed yet, must be run. Auctions without datetime are never run.
+        """
+        thresholds = [
+            auction.datetime for auction in (self.opening_auction, self.closing_auction)
+            if not auction.passed and auction.datetime != NAT_NANOSECONDS
+        ]
+        self.next_auction_threshold = min(thresholds, default=np.iinfo('int64').max)
     
 
     def _update_orderbook(self):
@@ -127,42 +251,37 @@ class Orderbook:
 
     def _add(self, message) -> None:
         """
-        Depending on the order type of the order, it is either added to the book
-        or stored as a contigent order. A special case is made to check if the 
-        order is only valid for the closing auction.
-        """
-        order = Order(
-            o_id_cha = message['o_id_cha'],
-            o_id_fd = message['o_id_fd'],
-            o_member = message['o_member'],
-            o_account = message['o_account'],
-            o_bs = message['o_bs'],
-            o_execution = message['o_execution'],
-            o_validity = message['o_validity'],
-            o_type = message['o_type'],
-            o_price = message['o_price'],
-            o_price_stop = message['o_price_stop'],
-            o_q_ini = message['o_q_ini'],
-            o_q_min = message['o_q_min'],
-            o_q_dis = message['o_q_dis'],
-            o_dt_expiration = message['o_dt_expiration'],
-            o_dtm_be = message['o_dtm_be'],
-            o_dtm_va = message['o_dtm_va'],
-        )
+        Creates the order (recycling a released Order instance if any) and 
+        inserts it in the book.
+        """
+        order = self._new_order(message)
 
         self.current_order = order #### testing
+        if self.order_flow is not None:
+            self.order_flow.on_add(order, self.current_message_datetime)
+
+        if not self._insert(order):
+            self._release_order(order)
 
-        if message['o_validity'] == '7': # valid for closing auction
+
+    def _insert(self, order: Order) -> bool:
+        """
+        Depending on the order type of the order, it is either added to the book
+        or stored as a contigent order. A special case is made to check if the 
+        order is only valid for the closing auction. Returns False if the order
+        is not kept.
+        """
+        if order.o_validity == '7': # valid for closing auction
             self.valid_for_closing.append(order)
             self._orders[order.o_id_fd] = order
-            return
-        elif message['o_validity'] == '2': #### quick way to fix valid for auction
+            return True
+        elif order.o_validity == '2': #### quick way to fix valid for auction
             if self.opening_auction.passed == False:
                 self.valid_for_auctions.append(order.o_id_fd)
             else:
-                return
+                return False
 
-        match message['o_type']:
+        match order.o_type:
             case '1':
                 self._add_limit_order(order)
             case '2':
@@ -175,6 +294,28 @@ class Orderbook:
                 self._add_pegged_order(order)
             case 'K':
                 self._add_limit_order(order)
+            case _:
+                return False
+
+        return True
+
+
+    def _new_order(self, message: dict) -> Order:
+        """ 
+        Returns an order loaded from the message. Released orders are recycled
+        before allocating new instances.
+        """
+        if self._order_pool:
+            self.allocation_stats['orders_recycled'] += 1
+            return self._order_pool.pop().load(message)
+
+        self.allocation_stats['orders_allocated'] += 1
+        return Order(message)
+
+
+    def _release_order(self, order: Order) -> None:
+        """ Gives back an order that left the book, so it can be recycled. """
+        self._order_pool.append(order)
 
 
     def _add_limit_order(self, order: Order) -> None:
@@ -189,8 +330,10 @@ class Orderbook:
         if order.o_price not in side:
             # Limit level must be created
             limit_level = LimitLevel(order)
+            self.allocation_stats['limit_levels_allocated'] += 1
             self._orders[order.o_id_fd] = order
             side[limit_level.price] = limit_level
+            self._level_changed(order.o_bs, order.o_price, limit_level.quantities(), structural=True)
 
             if order.o_bs == 'B':
                 if self.best_bid is None or limit_level.price > self.best_bid.price:
@@ -201,7 +344,8 @@ class Orderbook:
         else:
             # Limit level exists
             self._orders[order.o_id_fd] = order
-            side[order.o_price].append(order)
+            delta = side[order.o_price].append(order)
+            self._level_changed(order.o_bs, order.o_price, delta)
 
         if logging.getLogger().isEnabledFor(logging.DEBUG):
             logger.debug(f'{order.o_dtm_va} - Added order to book: {order.o_id_fd}')
@@ -271,11 +415,10 @@ class Orderbook:
         
 
 
-    def _remove(self, o_id_fd: int) -> None:
+    def _remove(self, o_id_fd: int) -> bool:
         """
-        Removes an order from the book. If the Limit Level is then empty, it is 
-        also removed. If the removed LimitLevel was either the top bid or ask, 
-        it is replaced by the next best price.
+        Removes an order from the book (see _detach) and releases it. Returns 
+        False if the order is not in the book.
         """
         try:
             # Remove order from self._orders
@@ -284,119 +427,104 @@ class Orderbook:
             #raise NotImplementedError
             return False #### for now, let go removal of pegged and stop orders for testing
 
-        #### testing
-        # If stop order not triggered. Remove from stop orders list.
-        if popped_item.o_type in ('3', '4'):
-            
-            if popped_item.o_bs == 'B':
-                side = self.buy_stop_orders
-            else:
-                side = self.sell_stop_orders
-
-            try:
-                stop_order_dict = side[popped_item.o_price_stop]
-
-                if popped_item.o_type == '3': # market stop order
-                    stop_order_dict['stop_market'].remove(popped_item)
-                else: #limit stop order
-                    stop_order_dict['stop_limit'].remove(popped_item)
+        self._detach(popped_item)
+        self._release_order(popped_item)
 
-                #stop_order_list.remove(popped_item)
-                if not stop_order_dict['stop_market'] and not stop_order_dict['stop_limit']:
-                    side.pop(popped_item.o_price_stop)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logger.debug(f'Successfully removed order: {o_id_fd}.')
+        return True
 
-                return popped_item
-            
-            except KeyError: #### prev ValueError
-                # Stop order has been triggered, now a limit order.
-                pass
-        
-        elif popped_item.o_type == 'P':
-            self.pegged_orders.pop(o_id_fd)
 
-        #### Testing
-        if popped_item.o_validity == '7': # valid for closing auction
-            self.valid_for_closing.remove(popped_item)
-            return
-        
-        # Remove order from its doubly linked list
-        popped_item.pop_from_list()
+    def _detach(self, order: Order) -> None:
+        """
+        Detaches an order from the container it is stored in (limit level, stop
+        orders or orders valid for closing), but keeps it in self._orders. If 
+        the Limit Level is then empty, it is also removed. If the removed 
+        LimitLevel was either the top bid or ask, it is replaced by the next 
+        best price.
+        """
+        if order.o_type == 'P':
+            self.pegged_orders.pop(order.o_id_fd, None)
 
-        # Remove limit from bids or asks, if no orders are left at that limit
-        try:
-            if popped_item.o_bs == 'B':
-                # Bid
-                if len(self.bids[popped_item.o_price]) == 0:
-                    popped_limit_level = self.bids.pop(popped_item.o_price)
+        if order.resting:
+            # Remove order from its limit level
+            if order.o_bs == 'B':
+                limit_level = self.bids[order.o_price]
+                delta = limit_level.remove(order)
 
-                    if popped_limit_level == self.best_bid:
+                # Remove limit if no orders are left at that limit
+                if len(limit_level) == 0:
+                    self.bids.pop(order.o_price)
+                    if limit_level == self.best_bid:
                         self._set_best_bid()
             else:
-                # Ask
-                if len(self.asks[popped_item.o_price]) == 0:
-                    popped_limit_level = self.asks.pop(popped_item.o_price)
+                limit_level = self.asks[order.o_price]
+                delta = limit_level.remove(order)
 
-                    if popped_limit_level == self.best_ask:
+                if len(limit_level) == 0:
+                    self.asks.pop(order.o_price)
+                    if limit_level == self.best_ask:
                         self._set_best_ask()
 
-        except KeyError:
-            raise NotImplementedError #### To be checked
-            pass
-        
-        if logging.getLogger().isEnabledFor(logging.DEBUG):
-            logger.debug(f'Successfully removed order: {popped_item.o_id_fd}.')
-        return popped_item
+            self._level_changed(order.o_bs, order.o_price, delta, structural=len(limit_level) == 0)
+
+        elif order.o_validity == '7': # valid for closing auction
+            self.valid_for_closing.remove(order)
+
+        elif order.o_type in ('3', '4'):
+            # Stop order not triggered. Remove from stop orders list.
+            side = self.buy_stop_orders if order.o_bs == 'B' else self.sell_stop_orders
+            stop_order_dict = side[order.o_price_stop]
+
+            if order.o_type == '3': # market stop order
+                stop_order_dict['stop_market'].remove(order)
+            else: #limit stop order
+                stop_order_dict['stop_limit'].remove(order)
+
+            if not stop_order_dict['stop_market'] and not stop_order_dict['stop_limit']:
+                side.pop(order.o_price_stop)
+
+
+    def _relink(self, order: Order, message: dict) -> None:
+        """
+        Moves an order to its new price (or stop price) without creating a new 
+        order. The quantity already negociated is kept.
+        """
+        self._detach(order)
+        order.reload(message)
+
+        if not self._insert(order):
+            self._orders.pop(order.o_id_fd)
+            self._release_order(order)
 
 
     def _modify(self, message: dict) -> None:
         """
         Modifies an existing order in the book.
         It also updates the order's related LimitLevel's size, accordingly.
-        If order update is a change in price, the order is removed from the
-        limit level and a new order is created.
+        If order update is a change in price, the order is moved to the limit 
+        level of its new price (same Order instance, see _relink).
         """
         order = self._orders[message['o_id_fd']]
         self.current_order = order #### testing
+        if self.order_flow is not None:
+            self.order_flow.on_modify(order, self.current_message_datetime)
 
         #                           CHANGE IN PRICE
         #-----------------------------------------------------------------------
         if order.o_price != message['o_price']:
-            # Change in price, remove order, and add new one with new price
-            #quantity_left = message['o_q_ini'] - order.o_q_neg
-            #message['o_q_ini'] = quantity_left
+            # Change in price, move order to its new price
             if logging.getLogger().isEnabledFor(logging.DEBUG):
                 logger.debug(f'{message["o_dtm_va"]} - Modified order price: {order.o_id_fd}')
-            q_neg = order.o_q_neg
-
-            self._remove(message['o_id_fd'])
-            self._add(message)
 
-            ##### new
-            order = self._orders[message['o_id_fd']]
-            order.overwrite_quantity_negociated(q_neg)
+            self._relink(order, message)
 
 
         #                        CHANGE IN PRICE STOP
         #-----------------------------------------------------------------------
         elif order.o_price_stop != message['o_price_stop']:
-            # Remove order from orders list.
-            popped_order = self._orders.pop(message['o_id_fd'])
-
-            # Remove order from stop orders list
-            side = self.buy_stop_orders if popped_order.o_bs == 'B' else self.sell_stop_orders
-            stop_order_dict = side[popped_order.o_price_stop]
-
-            if popped_order.o_type == '3': # market stop order
-                stop_order_dict['stop_market'].remove(popped_order)
-            else: #limit stop order
-                stop_order_dict['stop_limit'].remove(popped_order)
-
-            #stop_order_list.remove(popped_item)
-            if not stop_order_dict['stop_market'] and not stop_order_dict['stop_limit']:
-                side.pop(popped_order.o_price_stop)
-
-            # add stop order with new price
-            self._add(message)
+            # Stop order moved to its new stop price
+            self._relink(order, message)
 
         #                         CHANGE IN QUANTITY
         #-----------------------------------------------------------------------
@@ -422,15 +550,10 @@ class Orderbook:
             order.o_q_dis = min(order.o_q_rem, message['o_q_dis'])
 
             # Update limit level attributes
-            if order.root != None:                 
-                # Root is equal to None for stop orders not triggered. ####
-                order.parent_limit.size += size_diff
-                order.parent_limit.disclosed_size_hft += size_dis_diff if order.o_member == 'HFT' else 0
-                order.parent_limit.disclosed_size_mixed += size_dis_diff if order.o_member == 'MIX' else 0
-                order.parent_limit.disclosed_size_non += size_dis_diff if order.o_member == 'NON' else 0
-                order.parent_limit.hidden_size_hft += size_hid_diff if order.o_member == 'HFT' else 0
-                order.parent_limit.hidden_size_mixed += size_hid_diff if order.o_member == 'MIX' else 0
-                order.parent_limit.hidden_size_non += size_hid_diff if order.o_member == 'NON' else 0
+            if order.resting:
+                # Not resting for stop orders not triggered. ####
+                delta = self._get_limit_level(order).update_order(order, size_dis_diff, size_hid_diff)
+                self._level_changed(order.o_bs, order.o_price, delta)
 
         elif order.o_dt_expiration != message['o_dt_expiration']:
             order.o_dt_expiration = message['o_dt_expiration']
@@ -519,6 +642,9 @@ class Orderbook:
 
         new_quantity = order.o_q_rem - trade_quantity
 
+        if self.order_flow is not None:
+            self.order_flow.on_fill(order, trade_quantity, new_quantity == 0, self.current_message_datetime)
+
         if logging.getLogger().isEnabledFor(logging.DEBUG):
             logger.debug(f'Successfully filled: {order.o_id_fd}; q_traded: {trade_quantity}; q_left: {new_quantity}.')
 
@@ -526,10 +652,11 @@ class Orderbook:
         if new_quantity == 0:
             
             # Remove order
+            o_bs = order.o_bs
             self._remove(order.o_id_fd)
 
             # Update best limit
-            if order.o_bs == 'B':
+            if o_bs == 'B':
                 self._set_best_bid()
             else:
                 self._set_best_ask()
@@ -549,13 +676,8 @@ class Orderbook:
             impact_q_dis = old_q_dis - order.o_q_dis
             impact_q_hid = trade_quantity - impact_q_dis
 
-            order.parent_limit.size -= trade_quantity
-            order.parent_limit.disclosed_size_hft -= (impact_q_dis if order.o_member == 'HFT' else 0)
-            order.parent_limit.disclosed_size_mixed -= (impact_q_dis if order.o_member == 'MIX' else 0)
-            order.parent_limit.disclosed_size_non -= (impact_q_dis if order.o_member == 'NON' else 0)
-            order.parent_limit.hidden_size_hft -= (impact_q_hid if order.o_member == 'HFT' else 0)
-            order.parent_limit.hidden_size_mixed -= (impact_q_hid if order.o_member == 'MIX' else 0)
-            order.parent_limit.hidden_size_non -= (impact_q_hid if order.o_member == 'NON' else 0)
+            delta = self._get_limit_level(order).update_order(order, -impact_q_dis, -impact_q_hid)
+            self._level_changed(order.o_bs, order.o_price, delta)
         
         else: #### to be deleted once we are sure this is not called
             raise NotImplementedError
@@ -568,34 +690,109 @@ class Orderbook:
 
             # Get order
             order = self._orders[pegged_order_id]
-            q_neg = order.o_q_neg # if any
 
             if order.o_bs == 'B':
                 # Bid 
-                if order.o_price < order.o_price_stop:
-                    self._remove(order.o_id_fd)
-                    self._add_pegged_order(order.reset())
+                reprice = order.o_price < order.o_price_stop
             else:
                 # Ask
-                if order.o_price > order.o_price_stop:
-                    self._remove(order.o_id_fd)
-                    self._add_pegged_order(order.reset())
+                reprice = order.o_price > order.o_price_stop
+
+            if reprice:
+                # Same order is added back (quantity negociated is kept)
+                self._detach(order)
+                self._add_pegged_order(order)
+
+
+    def _remove_batch(self, o_id_fds: np.ndarray, o_dtms: np.ndarray) -> None:
+        """
+        Removes several orders at once (canceled at times o_dtms). Orders 
+        resting in the book are unlinked from their limit level, then each 
+        affected limit level is updated once and the best limits are refreshed
+        once per side. Other orders (stop orders not triggered, orders valid for
+        closing) go through _remove.
+        """
+        # Quantities to subtract per limit level: {(side, price): [level, quantities]}
+        levels_impacted = {}
+
+        for o_id_fd, o_dtm in zip(o_id_fds.tolist(), o_dtms.tolist()):
+            order = self._orders.get(o_id_fd)
+            if order is None:
+                continue
+
+            if self.order_flow is not None:
+                self.order_flow.on_cancel(order, o_dtm)
+
+            if not order.resting:
+                # Order not resting in a limit level
+                self._remove(o_id_fd)
+                continue
 
-            ##### new
-            order = self._orders[order.o_id_fd]
-            order.overwrite_quantity_negociated(q_neg)
+            self._orders.pop(o_id_fd)
+            if order.o_type == 'P':
+                self.pegged_orders.pop(o_id_fd)
+            self._release_order(order)
 
+            limit_level = self._get_limit_level(order)
+            limit_level.unlink(order)
 
-    def _check_for_order_cancelations(self, limit: dt.datetime=None) -> None:
-        """ Check for canceled orders since the last message. Removes them if any. """
-        datetime_limit = limit if limit != None else self.current_message_datetime
+            key = (order.o_bs, order.o_price)
+            if key not in levels_impacted:
+                levels_impacted[key] = [limit_level, [0, 0, 0, 0, 0, 0, 0]]
+            quantities = levels_impacted[key][1]
 
-        while self.removed_orders[-1]['o_dtm_br'] < datetime_limit:
-            removed_order = self.removed_orders.pop()
-            if removed_order['o_state'] != '2':
-                if logging.getLogger().isEnabledFor(logging.DEBUG):
-                    logger.debug(f'{removed_order["o_dtm_br"]} - Order cancelled: {removed_order["o_id_fd"]}.')
-                self._remove(removed_order['o_id_fd'])
+            quantities[0] += order.o_q_rem
+            member_index = MEMBER_INDEX.get(order.o_member)
+            if member_index is not None:
+                quantities[member_index] += order.o_q_dis
+                quantities[member_index + 3] += order.o_q_rem - order.o_q_dis
+
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logger.debug(f'Successfully removed order: {order.o_id_fd}.')
+
+        # Update limit levels and remove the empty ones
+        refresh_best_bid = False
+        refresh_best_ask = False
+        for (o_bs, price), (limit_level, quantities) in levels_impacted.items():
+            limit_level.subtract(*quantities)
+            delta = tuple(-quantity for quantity in quantities)
+            self._level_changed(o_bs, price, delta, structural=len(limit_level) == 0)
+
+            if len(limit_level) == 0:
+                if o_bs == 'B':
+                    self.bids.pop(price)
+                    refresh_best_bid = refresh_best_bid or limit_level == self.best_bid
+                else:
+                    self.asks.pop(price)
+                    refresh_best_ask = refresh_best_ask or limit_level == self.best_ask
+
+        if refresh_best_bid:
+            self._set_best_bid()
+        if refresh_best_ask:
+            self._set_best_ask()
+
+
+    def _check_for_order_cancelations(self, limit: int=None) -> None:
+        """ 
+        Check for canceled orders since the last message. Removes them if any,
+        in a single batch.
+        """
+        datetime_limit = limit if limit is not None else self.current_message_datetime
+
+        # Book state up to this event (before any change)
+        if self.time_weighted is not None and self.time_weighted.needs(datetime_limit):
+            self._advance_time_weighted(datetime_limit)
+
+        start = self.removed_orders_cursor
+        end = np.searchsorted(self.removed_orders_dtm, datetime_limit, side='left')
+        if end <= start:
+            return
+
+        self.removed_orders_cursor = end
+        o_id_fds = self.removed_orders_id[start:end]
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logger.debug(f'{datetime_limit} - Orders cancelled: {o_id_fds.tolist()}.')
+        self._remove_batch(o_id_fds, self.removed_orders_dtm[start:end])
                 
     
     def _check_for_trades(self) -> None:
@@ -629,7 +826,7 @@ class Orderbook:
                     break
 
 
-            trade = self.trades.pop()
+            trade = self._pop_trade()
             if logging.getLogger().isEnabledFor(logging.DEBUG):
                 logger.debug(f'{trade["t_dtm_neg"]} - Trade between {trade["t_id_b_fd"]} and {trade["t_id_s_fd"]}.')
             self._fill_order(trade['t_id_b_fd'], trade['t_q_exchanged'])
@@ -655,20 +852,352 @@ class Orderbook:
         #self._trigger_stop_orders()
     
     
+    def _pop_trade(self) -> dict:
+        """ Pops the next trade to process and counts it. """
+        trade = self.trades.pop()
+        self.trade_count += 1
+        self.traded_volume += trade['t_q_exchanged']
+        return trade
+
+
     def set_removed_orders(self, df_removed_orders: pd.DataFrame) -> None:
-        """ Reversed list of removed orders. """
-        df_removed_orders_reversed = df_removed_orders.sort_values(by='o_dtm_br', ascending=False)
-        self.removed_orders = list(df_removed_orders_reversed.to_dict('records'))
+        """ 
+        Time-sorted arrays (int64) of removal timestamps and ids of the canceled 
+        orders (see removed_orders_arrays).
+        """
+        self.removed_orders_dtm, self.removed_orders_id = removed_orders_arrays(df_removed_orders)
+        self.removed_orders_cursor = 0
+
+
+    def set_time_weighted_liquidity(
+        self, bar_size: dt.timedelta, depth: int=None, start: int=None
+    ) -> None:
+        """ Starts integrating the book's liquidity over time (see 
+        TimeWeightedLiquidity), averages are given per bar by 
+        get_time_weighted_liquidity.
+
+        Args:
+            bar_size (dt.timedelta): bar size.
+            depth (int, optional): number of levels of the depth quantities, 
+                one of the liquidity depths. Defaults to the largest one.
+            start (int, optional): time (int64 nanoseconds) from which the book
+                is integrated. Defaults to None (next event).
+        """
+        depth = depth if depth is not None else max(self.liquidity.depths)
+        if depth not in self.liquidity.depths:
+            raise ValueError(f'Depth {depth} not in the liquidity depths {self.liquidity.depths}.')
+
+        bar_size_ns = pd.Timedelta(bar_size).value
+        self.time_weighted = TimeWeightedLiquidity(bar_size_ns, depth, start)
+
+
+    def _advance_time_weighted(self, timestamp: int) -> None:
+        """ Integrates the current state of the book up to timestamp. """
+        values = []
+        touch_times = []
+        for limit_level in (self.best_bid, self.best_ask):
+            if limit_level is None:
+                values += [0] * 6
+                touch_times += [0] * 3
+            else:
+                quantities = limit_level.quantities()
+                values += quantities[1:]
+                touch_times += [int(quantities[i] + quantities[i + 3] > 0) for i in (1, 2, 3)]
+        values += touch_times
+
+        depth = self.time_weighted.depth
+        values += self.liquidity.get_depth(0, depth)[1:]
+        values += self.liquidity.get_depth(1, depth)[1:]
+
+        spread = None
+        if self.best_bid is not None and self.best_ask is not None:
+            spread = self.best_ask.price - self.best_bid.price
+
+        self.time_weighted.advance(timestamp, spread, values)
+
+
+    def get_time_weighted_liquidity(self, end: int=None) -> pd.DataFrame:
+        """ Returns the time-weighted liquidity averages per bar (closed bars), 
+        after integrating the book up to end (int64 nanoseconds) if given. """
+        if self.time_weighted is None:
+            raise ValueError('Time-weighted liquidity not set (see set_time_weighted_liquidity).')
+        if end is not None and self.time_weighted.needs(end):
+            self._advance_time_weighted(end)
+        return self.time_weighted.to_frame()
+
+
+    def set_order_flow_stats(self, bar_size: dt.timedelta) -> None:
+        """ Starts collecting order flow statistics per interval and member 
+        category (see OrderFlowStats), given by get_order_flow_stats. """
+        self.order_flow = OrderFlowStats(pd.Timedelta(bar_size).value)
+
+
+    def get_order_flow_stats(self) -> pd.DataFrame:
+        """ Returns the order flow statistics per interval and member category. """
+        if self.order_flow is None:
+            raise ValueError('Order flow statistics not set (see set_order_flow_stats).')
+        return self.order_flow.to_frame()
 
 
     def set_trades(self, df_trades: pd.DataFrame) -> None:
-        """ Reversed list of trades. """
-        fields = ['t_dtm_neg', 't_id_b_fd', 't_id_s_fd', 't_q_exchanged', 't_price', 't_agg']
-        df_trades = df_trades[fields]
-        df_trades_reversed = df_trades.sort_values(by='t_dtm_neg', ascending=False)
-        self.trades = list(df_trades_reversed.to_dict('records'))
+        """ Reversed list of trades (see trades_list). """
+        self.trades = trades_list(df_trades)
+
+
+    def set_inputs(self, removed_orders: Tuple[np.ndarray, np.ndarray], trades: List[dict]) -> None:
+        """ Sets the day inputs already prepared (see removed_orders_arrays and
+        trades_list), instead of set_removed_orders and set_trades. The trades
+        list is consumed by the replay. """
+        self.removed_orders_dtm, self.removed_orders_id = removed_orders
+        self.removed_orders_cursor = 0
+        self.trades = trades
+
+
+    def get_state(self, inputs: dict=None) -> dict:
+        """
+        Returns the state of the book (to be pickled, see checkpoint), without
+        the day inputs (removed orders, trades) and the statistics. Only the
+        positions in the inputs are kept, see from_state. The state carries
+        STATE_VERSION and the fingerprint of the input files.
+
+        Args:
+            inputs (dict, optional): fingerprint of the input files the book
+                was replayed from (see input_fingerprint). Defaults to None.
+        """
+        state = {key: value for key, value in self.__dict__.items() if key not in STATE_EXCLUDED}
+        state['trades_left'] = len(self.trades) if self.trades is not None else None
+        state['state_version'] = STATE_VERSION
+        state['inputs'] = inputs
+        return state
+
+
+    @classmethod
+    def from_state(
+        cls, state: dict, removed_orders: Tuple[np.ndarray, np.ndarray], trades: List[dict]
+    ) -> 'Orderbook':
+        """
+        Restores a book saved by get_state (of STATE_VERSION, ValueError
+        otherwise). The inputs must be the ones of the replay the state comes
+        from (same files, not filtered). They are not 
+        modified, so they can be shared by several restored books.
+
+        Args:
+            state (dict): state of the book (see get_state).
+            removed_orders (Tuple[np.ndarray, np.ndarray]): removal timestamps
+                and ids of the canceled orders of the day (see removed_orders_arrays).
+            trades (List[dict]): reversed trades of the day (see trades_list).
+
+        Returns:
+            Orderbook: book as it was when saved, without statistics (time-weighted
+                liquidity, order flow).
+        """
+        state = dict(state)
+        if state.pop('state_version', None) != STATE_VERSION:
+            raise ValueError(f'State of another version than {STATE_VERSION}, the checkpoint must be saved again')
+        state.pop('inputs')
+        trades_left = state.pop('trades_left')
+
+        orderbook = cls.__new__(cls)
+        orderbook.__dict__.update(state)
+        orderbook.time_weighted = None
+        orderbook.order_flow = None
+        orderbook._order_pool = []
+        orderbook._changed_levels = None
+
+        orderbook.removed_orders_dtm, orderbook.removed_orders_id = removed_orders
+        orderbook.trades = trades[:trades_left] if trades_left is not None else None
+
+        return orderbook
+
+
+    def _get_limit_level(self, order: Order) -> LimitLevel:
+        """ Returns the limit level an order rests in (found with side and price). """
+        if order.o_bs == 'B':
+            return self.bids.get(order.o_price)
+        else:
+            return self.asks.get(order.o_price)
+
+
+    def get_limit_level(self, o_id_fd: int) -> LimitLevel:
+        """ Returns the limit level of a resting order, None otherwise. """
+        order = self._orders.get(o_id_fd)
+        if order is None or not order.resting:
+            return None
+        return self._get_limit_level(order)
 
     
+    def get_queue_position(self, o_id_fd: int) -> tuple:
+        """ Returns the position of a resting order in its queue (0 for the 
+        first order), the remaining and displayed quantity ahead of it, in 
+        O(log n). None if the order is not resting in the book. """
+        order = self._orders.get(o_id_fd)
+        if order is None or not order.resting:
+            return None
+        return self._get_limit_level(order).queue_position(order)
+
+
+    def get_queue_positions(self, members: tuple=('HFT', 'MIX', 'NON')) -> pd.DataFrame:
+        """ Returns the queue position of every resting order of the given 
+        member categories (see get_queue_position).
+
+        Args:
+            members (tuple, optional): member categories. Defaults to all.
+
+        Returns:
+            pd.DataFrame: one row per order (o_id_fd, o_member, o_bs, o_price, 
+                o_q_rem, position, quantity_ahead, displayed_ahead).
+        """
+        rows = []
+        for order in self._orders.values():
+            if order.resting and order.o_member in members:
+                position = self._get_limit_level(order).queue_position(order)
+                rows.append((order.o_id_fd, order.o_member, order.o_bs, order.o_price, order.o_q_rem, *position))
+
+        columns = ['o_id_fd', 'o_member', 'o_bs', 'o_price', 'o_q_rem', 'position', 'quantity_ahead', 'displayed_ahead']
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+
+    def _level_changed(
+        self, o_bs: str, price: float, delta: tuple, structural: bool=False
+    ) -> None:
+        """
+        Called after any change of a limit level (quantities, creation or 
+        removal). Flags the depth matrix of the side if the level is among the
+        best levels and updates the liquidity aggregates.
+
+        Args:
+            o_bs (str): side of the limit level.
+            price (float): price of the limit level.
+            delta (tuple): change of the level's quantities (see 
+                LimitLevel.quantities).
+            structural (bool, optional): True if the level was created or 
+                removed. Defaults to False.
+        """
+        if o_bs == 'B':
+            side_index = 0
+            if price >= self._depth_bounds[0]:
+                self._depth_dirty[0] = True
+        else:
+            side_index = 1
+            if price <= self._depth_bounds[1]:
+                self._depth_dirty[1] = True
+
+        self.liquidity.level_changed(side_index, price, delta, structural)
+        if self._depth_indexes is not None:
+            self._depth_indexes[side_index].add(price, delta[0])
+        if self._changed_levels is not None:
+            self._changed_levels.add((o_bs, price))
+
+
+    def track_level_changes(self) -> None:
+        """ Starts recording the levels changed (see pop_level_changes). """
+        if self._changed_levels is None:
+            self._changed_levels = set()
+
+
+    def pop_level_changes(self) -> set:
+        """ Returns the (side, price) of the levels changed since the last
+        call (or since track_level_changes), and resets them. """
+        changed_levels = self._changed_levels
+        self._changed_levels = set()
+        return changed_levels
+
+
+    def _get_depth_index(self, o_bs: str) -> DepthIndex:
+        """ Returns the depth index of a side ('B' or 'S'). """
+        if self._depth_indexes is None:
+            raise ValueError('Depth index not kept by the orderbook (see depth_index).')
+        return self._depth_indexes[0] if o_bs == 'B' else self._depth_indexes[1]
+
+
+    def depth_at(self, o_bs: str, price: float) -> int:
+        """ Returns the quantity of a side between its best limit and a price 
+        (included), in O(log ticks).
+
+        Args:
+            o_bs (str): side of the book ('B' or 'S').
+            price (float): price up to which quantities are summed.
+
+        Returns:
+            int: cumulative quantity.
+        """
+        return self._get_depth_index(o_bs).depth(price)
+
+
+    def price_to_fill(self, o_bs: str, quantity: int) -> float:
+        """ Returns the worst price reached when filling a quantity against a 
+        side (eg: o_bs 'S' for a buy order), None if the side is too thin. """
+        return self._get_depth_index(o_bs).fill(quantity)[0]
+
+
+    def cost_to_fill(self, o_bs: str, quantity: int) -> float:
+        """ Returns the cost (sum of price times quantity) of filling a quantity
+        against a side, None if the side is too thin. """
+        return self._get_depth_index(o_bs).fill(quantity)[1]
+
+
+    def get_liquidity_metrics(self) -> Dict[str, float]:
+        """ Returns the liquidity metrics of the book (see 
+        LiquidityMetrics.get_metrics), read from running aggregates. """
+        return self.liquidity.get_metrics(self.best_bid, self.best_ask)
+
+
+    def fill_depth_matrix(self, out: np.ndarray) -> np.ndarray:
+        """ Fills a caller-provided array with the best levels of the book. 
+        Missing levels are filled with NaN. The matrix is kept by the book and
+        a side is only refreshed when one of its best levels has changed.
+
+        Args:
+            out (np.ndarray): float array of shape (2, depth, len(DEPTH_FIELDS)),
+                bids first then asks, fields as in DEPTH_FIELDS (price, size, 
+                and disclosed/hidden sizes of HFT/MIX/NON members).
+
+        Returns:
+            np.ndarray: the array given as input.
+        """
+        depth = out.shape[1]
+        if depth != self._depth_matrix.shape[1]:
+            self._depth_matrix = np.full((2, depth, len(DEPTH_FIELDS)), np.nan)
+            self._depth_dirty = [True, True]
+
+        if self._depth_dirty[0]:
+            self._refresh_depth_matrix(0)
+        if self._depth_dirty[1]:
+            self._refresh_depth_matrix(1)
+
+        out[...] = self._depth_matrix
+        return out
+
+
+    def _refresh_depth_matrix(self, side_index: int) -> None:
+        """ Rebuilds one side (0: bids, 1: asks) of the depth matrix. """
+        matrix = self._depth_matrix[side_index]
+        depth = matrix.shape[0]
+
+        if side_index == 0:
+            side = self.bids
+            prices = heapq.nlargest(depth, side)
+        else:
+            side = self.asks
+            prices = heapq.nsmallest(depth, side)
+
+        matrix.fill(np.nan)
+        for n, price in enumerate(prices):
+            limit_level = side[price]
+            matrix[n] = (
+                limit_level.price, limit_level.size,
+                limit_level.disclosed_size_hft, limit_level.disclosed_size_mixed, limit_level.disclosed_size_non,
+                limit_level.hidden_size_hft, limit_level.hidden_size_mixed, limit_level.hidden_size_non,
+            )
+
+        # Changes beyond the worst level of a full matrix do not affect it
+        if len(prices) == depth and depth > 0:
+            self._depth_bounds[side_index] = prices[-1]
+        else:
+            self._depth_bounds[side_index] = -np.inf if side_index == 0 else np.inf
+        self._depth_dirty[side_index] = False
+
+
     def _set_best_bid(self) -> None:
         """ Sets best bid after order deletion by cancelation or trade. """
         if len(self.bids) > 0:
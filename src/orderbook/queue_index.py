@@ -0,0 +1,111 @@
+# Import Built-Ins
+from typing import Tuple
+
+# Import Third-Party
+
+# Import Homebrew
+from .order import Order, OrderList
+
+
+class QueueIndex:
+    """
+    Order-indexed binary indexed (Fenwick) trees of a limit level's queue. Each
+    order gets a slot (Order.queue_slot) in time priority, the trees hold the
+    number of orders, the remaining quantity and the displayed quantity per
+    slot. The position of an order and the quantities ahead of it are found in
+    O(log n). Slots are not reused: the trees are rebuilt (with the orders
+    left) once all slots are taken.
+    """
+    __slots__ = ['_orders', '_capacity', '_next_slot', '_count_tree', '_quantity_tree',
+                 '_displayed_tree']
+
+    def __init__(self, orders: OrderList) -> None:
+        """
+        Args:
+            orders (OrderList): orders of the limit level (in time priority).
+        """
+        self._orders = orders
+        self._rebuild()
+
+
+    def _rebuild(self) -> None:
+        """ Gives new slots to the orders of the level and rebuilds the trees
+        in O(n). """
+        self._capacity = max(16, 2 * len(self._orders))
+        count_tree = [0] * (self._capacity + 1)
+        quantity_tree = [0] * (self._capacity + 1)
+        displayed_tree = [0] * (self._capacity + 1)
+
+        slot = 0
+        for order in self._orders.orders.values():
+            slot += 1
+            order.queue_slot = slot
+            count_tree[slot] = 1
+            quantity_tree[slot] = order.o_q_rem
+            displayed_tree[slot] = min(order.o_q_rem, order.o_q_dis)
+        self._next_slot = slot + 1
+
+        for i in range(1, self._capacity + 1):
+            j = i + (i & -i)
+            if j <= self._capacity:
+                count_tree[j] += count_tree[i]
+                quantity_tree[j] += quantity_tree[i]
+                displayed_tree[j] += displayed_tree[i]
+
+        self._count_tree = count_tree
+        self._quantity_tree = quantity_tree
+        self._displayed_tree = displayed_tree
+
+
+    def _add(self, slot: int, count: int, quantity: int, displayed: int) -> None:
+        """ Adds values at a slot. """
+        count_tree, quantity_tree, displayed_tree = self._count_tree, self._quantity_tree, self._displayed_tree
+        while slot <= self._capacity:
+            count_tree[slot] += count
+            quantity_tree[slot] += quantity
+            displayed_tree[slot] += displayed
+            slot += slot & -slot
+
+
+    def _prefix(self, slot: int) -> Tuple[int, int, int]:
+        """ Sums of the slots up to slot (included). """
+        count = quantity = displayed = 0
+        while slot > 0:
+            count += self._count_tree[slot]
+            quantity += self._quantity_tree[slot]
+            displayed += self._displayed_tree[slot]
+            slot -= slot & -slot
+        return count, quantity, displayed
+
+
+    def append(self, order: Order) -> None:
+        """ Order appended to the level (already in the OrderList). """
+        if self._next_slot > self._capacity:
+            # Every slot taken, new slots for the orders left (this one included)
+            self._rebuild()
+            return
+
+        order.queue_slot = self._next_slot
+        self._next_slot += 1
+        self._add(order.queue_slot, 1, order.o_q_rem, min(order.o_q_rem, order.o_q_dis))
+
+
+    def remove(self, order: Order) -> None:
+        """ Order removed from the level. The values of its slot are read back,
+        so they are removed whatever the order's quantities are now. """
+        slot = order.queue_slot
+        count, quantity, displayed = self._prefix(slot)
+        count_before, quantity_before, displayed_before = self._prefix(slot - 1)
+        self._add(slot, count_before - count, quantity_before - quantity, displayed_before - displayed)
+        order.queue_slot = None
+
+
+    def update(self, order: Order, quantity: int, displayed: int) -> None:
+        """ Remaining and displayed quantities of an order changed. """
+        self._add(order.queue_slot, 0, quantity, displayed)
+
+
+    def ahead(self, order: Order) -> Tuple[int, int, int]:
+        """ Returns the position of an order in the queue (0 for the first
+        order), the remaining and displayed quantity ahead of it. """
+        return self._prefix(order.queue_slot - 1)
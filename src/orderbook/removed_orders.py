@@ -0,0 +1,99 @@
+# Import Built-Ins
+import os
+from pathlib import Path
+
+# Import Third-Party
+import pandas as pd
+
+# Import Homebrew
+from .inputs import ReplayTapes, orders_path, history_path, removed_orders_path, read_trades
+from src.utils.time_utils import datetime_columns_to_nanoseconds
+
+
+# Columns of the removed orders files.
+REMOVED_ORDERS_SELECTION = ['o_dtm_br', 'o_id_fd', 'o_bs', 'o_state', 'o_account', 'o_member', 'o_nb_tr']
+
+# Order states that are not a removal from the book.
+UNVALID_STATES = ['0', '1', '5']
+
+
+def derive_removed_orders(df_orders: pd.DataFrame, df_history: pd.DataFrame=None) -> pd.DataFrame:
+    """
+    Orders removed from the book (filled or canceled) during the day, from the
+    history and order files. Messages of an order carry its next action, the
+    last message of each order tells whether, when and why it left the book.
+    The history is needed for orders only re-introduced in it and executed
+    during the day.
+
+    Args:
+        df_orders (pd.DataFrame): order file (VHOX).
+        df_history (pd.DataFrame, optional): history file (VHOXhistory).
+            Defaults to None (no history file, every column of the orders
+            kept).
+
+    Returns:
+        pd.DataFrame: last message of each removed order.
+    """
+    if df_history is not None:
+        df = pd.concat([df_history[REMOVED_ORDERS_SELECTION], df_orders[REMOVED_ORDERS_SELECTION]])
+    else:
+        df = df_orders
+
+    removed_orders = df.drop_duplicates(subset=['o_id_fd'], keep='last')
+    return removed_orders[~removed_orders.o_state.isin(UNVALID_STATES)]
+
+
+def get_removed_orders_file(isin: str, date_str: str) -> None:
+    """ Derives and saves the removed orders file of an isin for one day (see
+    derive_removed_orders). """
+    origin_orders = orders_path(isin, date_str)
+    origin_history = history_path(isin, date_str)
+
+    df_orders = pd.read_parquet(origin_orders)
+    if len(df_orders) == 0:
+        p = Path(origin_orders)
+        print(f'File: \'{p.stem}\' is empty (path: \'{p.parent}\').')
+
+    try:
+        df_history = pd.read_parquet(origin_history)
+    except FileNotFoundError:
+        df_history = None
+        p = Path(origin_history)
+        print(f'File: \'{p.stem}\' does not exist (path: \'{p.parent}\').')
+
+    derive_removed_orders(df_orders, df_history).to_parquet(removed_orders_path(isin, date_str), index=False)
+
+
+def read_fused_tapes(isin: str, date_str: str, persist: bool=False) -> ReplayTapes:
+    """
+    Replay-ready inputs of an isin for one day, the order and history files
+    read once: the removed orders are derived in memory (see
+    derive_removed_orders) instead of read from their file. A missing history
+    file is skipped, as in get_removed_orders_file.
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date (YYYYMMDD).
+        persist (bool, optional): also save the removed orders file (as
+            02_get_removed_orders). Defaults to False.
+
+    Returns:
+        ReplayTapes: inputs of the replay.
+    """
+    df_orders = pd.read_parquet(orders_path(isin, date_str))
+    try:
+        df_history = pd.read_parquet(history_path(isin, date_str))
+    except FileNotFoundError:
+        df_history = None
+        p = Path(history_path(isin, date_str))
+        print(f'File: \'{p.stem}\' does not exist (path: \'{p.parent}\').')
+
+    df_removed_orders = derive_removed_orders(df_orders, df_history)
+    if persist:
+        os.makedirs(os.path.dirname(removed_orders_path(isin, date_str)), exist_ok=True)
+        df_removed_orders.to_parquet(removed_orders_path(isin, date_str), index=False)
+
+    return ReplayTapes.from_frames(
+        isin, date_str, datetime_columns_to_nanoseconds(df_history) if df_history is not None else None,
+        datetime_columns_to_nanoseconds(df_orders), df_removed_orders, read_trades(isin, date_str),
+    )
@@ -0,0 +1,115 @@
+# Import Built-Ins
+import json
+import os
+from typing import Dict
+
+# Import Third-Party
+import pandas as pd
+import pyarrow as pa
+
+# Import Homebrew
+from .inputs import TRADE_COLUMNS, ReplayTapes, input_fingerprint, read_day_inputs
+from src.constants.constants import PATHS
+
+
+# Tapes of the replay cache, one uncompressed Arrow IPC (Feather v2) file each.
+CACHE_TAPES = ('Cancellations', 'Trades', 'Messages')
+
+
+def cache_path(isin: str, date_str: str, tape: str) -> str:
+    """ Path of a tape of the replay cache, eg: replayMessages_{isin}_{date}.arrow. """
+    return os.path.join(PATHS['replay_cache'], isin, f'replay{tape}_{isin}_{date_str}.arrow')
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """ Table with the dtypes of the frame. Numeric columns are taken as is 
+    (NaN kept as NaN, as in the frames), missing strings become nulls. """
+    arrays = {}
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_extension_array_dtype(df[column]):
+            arrays[column] = pa.array(df[column].to_numpy())
+        else:
+            arrays[column] = pa.array(df[column], from_pandas=True)
+    return pa.table(arrays)
+
+
+def _write(table: pa.Table, path: str) -> None:
+    """ Writes a table as an uncompressed Arrow IPC file (one record batch). """
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+    os.replace(path + '.tmp', path)
+
+
+def _read(path: str) -> pa.Table:
+    """ Opens an Arrow IPC file by memory-mapping, columns are not copied. """
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def write_replay_cache(isin: str, date_str: str) -> Dict[str, int]:
+    """
+    Builds the replay cache of an isin for one day: messages (history then
+    orders, history rows in the metadata), cancellations sorted by time and
+    trades in reverse order, with the dtypes of the replay (times as int64
+    nanoseconds). The messages file is written last, the cache is only used
+    once it exists. Its metadata holds the fingerprint of the input files
+    (see input_fingerprint), the cache is not used once they change.
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date (YYYYMMDD).
+
+    Returns:
+        Dict[str, int]: rows of each tape.
+    """
+    # Fingerprint before reading: files changed meanwhile invalidate the cache
+    fingerprint = json.dumps(input_fingerprint(isin, date_str))
+    inputs = read_day_inputs(isin, date_str)
+    os.makedirs(os.path.dirname(cache_path(isin, date_str, 'Messages')), exist_ok=True)
+
+    # Cancellations and trades in replay order (see removed_orders_arrays, trades_list)
+    tapes = ReplayTapes.from_frames(isin, date_str, inputs.history, inputs.orders, inputs.removed_orders, inputs.trades)
+    removed_orders_dtm, removed_orders_id = tapes.removed_orders
+    cancellations = pa.table({'o_dtm_br': removed_orders_dtm, 'o_id_fd': removed_orders_id})
+    # Aggressor of the auction trades missing (NaN), stored as null
+    trades = _to_arrow(pd.DataFrame.from_records(tapes.trades(), columns=TRADE_COLUMNS))
+
+    messages = _to_arrow(pd.concat([inputs.history, inputs.orders], ignore_index=True))
+    messages = messages.replace_schema_metadata({'history_rows': str(len(inputs.history)), 'inputs': fingerprint})
+
+    _write(cancellations, cache_path(isin, date_str, 'Cancellations'))
+    _write(trades, cache_path(isin, date_str, 'Trades'))
+    _write(messages, cache_path(isin, date_str, 'Messages'))
+    return {'messages': len(messages), 'cancellations': len(cancellations), 'trades': len(trades)}
+
+
+def open_replay_cache(isin: str, date_str: str) -> ReplayTapes:
+    """ Returns the tapes of the replay cache (memory-mapped), None if the
+    cache of this isin and day is not built or was built from other input
+    files (see write_replay_cache). """
+    if not os.path.exists(cache_path(isin, date_str, 'Messages')):
+        return None
+
+    messages = _read(cache_path(isin, date_str, 'Messages'))
+    fingerprint = messages.schema.metadata.get(b'inputs')
+    if fingerprint is None or json.loads(fingerprint) != json.loads(json.dumps(input_fingerprint(isin, date_str))):
+        return None
+    cancellations = _read(cache_path(isin, date_str, 'Cancellations'))
+    trades = _read(cache_path(isin, date_str, 'Trades'))
+
+    history_rows = int(messages.schema.metadata[b'history_rows'])
+    removed_orders = (
+        cancellations.column('o_dtm_br').to_numpy(),
+        cancellations.column('o_id_fd').to_numpy(),
+    )
+    return ReplayTapes(isin, date_str, messages, history_rows, removed_orders, trades)
+
+
+def read_tapes(isin: str, date_str: str) -> ReplayTapes:
+    """ Returns the replay-ready inputs of an isin for one day, from the replay
+    cache if built, from the input files otherwise. """
+    tapes = open_replay_cache(isin, date_str)
+    if tapes is None:
+        inputs = read_day_inputs(isin, date_str)
+        tapes = ReplayTapes.from_frames(isin, date_str, inputs.history, inputs.orders, inputs.removed_orders, inputs.trades)
+    return tapes
@@ -0,0 +1,240 @@
+# Import Built-Ins
+import datetime as dt
+from typing import Callable, Dict, Iterator, List, Tuple
+import heapq
+import itertools
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from logger import logger
+from .orderbook import DEPTH_FIELDS
+from src.utils.time_utils import nanoseconds_to_datetime
+
+
+# Time of the first snapshot of a day (after the opening auction).
+SNAPSHOT_START = dt.time(hour=9, minute=1)
+
+
+class TimeGrid:
+    """
+    Clock sampling the book at fixed times (int64 nanoseconds), from start to
+    end (included) every step.
+    """
+    def __init__(self, name: str, start: int, end: int, step: int) -> None:
+        self.name = name
+        self.start = start
+        self.end = end
+        self.step = step
+
+
+    def __len__(self) -> int:
+        return max(0, (self.end - self.start) // self.step + 1)
+
+
+    def times(self) -> Iterator[int]:
+        """ Generator of the sampling times. """
+        return iter(range(self.start, self.end + 1, self.step))
+
+
+class EventClock:
+    """ Clock sampling the book after every message. """
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class TradeClock:
+    """ Clock sampling the book after every n trades. """
+    def __init__(self, name: str, trades: int=1) -> None:
+        self.name = name
+        self.trades = trades
+
+
+class VolumeClock:
+    """ Clock sampling the book every time volume shares have been traded. """
+    def __init__(self, name: str, volume: int) -> None:
+        self.name = name
+        self.volume = volume
+
+
+def time_grids(
+    date: dt.date, start: dt.time, end: dt.time, steps: Dict[str, str]
+) -> List[TimeGrid]:
+    """ Returns time grids of the same day with different steps.
+
+    Args:
+        date (dt.date): day of the grids.
+        start (dt.time): time of the first sample.
+        end (dt.time): time of the last sample (included).
+        steps (Dict[str, str]): grid names and steps, eg: {'1s': '1s'}.
+
+    Returns:
+        List[TimeGrid]: one grid per step.
+    """
+    start_ns = pd.Timestamp(dt.datetime.combine(date, start)).value
+    end_ns = pd.Timestamp(dt.datetime.combine(date, end)).value
+    return [TimeGrid(name, start_ns, end_ns, pd.Timedelta(step).value) for name, step in steps.items()]
+
+
+class Sampler:
+    """
+    Drives the snapshots of a replay for several clocks at once: time grids
+    (merged into one generator of (time, clock) in time order), every event,
+    trade and volume clocks. The replay calls before_message and after_message
+    around each message, and each sample is sent to the sink as
+    sink(clock_name, timestamp, orderbook). Clocks sampling at the same time
+    share the same book state.
+    """
+    def __init__(self, clocks: list, sink: Callable) -> None:
+        """
+        Args:
+            clocks (list): TimeGrid, EventClock, TradeClock and VolumeClock.
+            sink (Callable): called with (clock_name, timestamp, orderbook).
+        """
+        self.sink = sink
+        self.time_grids = [clock for clock in clocks if isinstance(clock, TimeGrid)]
+        self.event_clocks = [clock for clock in clocks if isinstance(clock, EventClock)]
+        self.trade_clocks = [clock for clock in clocks if isinstance(clock, TradeClock)]
+        self.volume_clocks = [clock for clock in clocks if isinstance(clock, VolumeClock)]
+
+        # Merged times of the grids: (time, name)
+        self._grid_times: Iterator[Tuple[int, str]] = heapq.merge(
+            *(zip(grid.times(), itertools.repeat(grid.name)) for grid in self.time_grids)
+        )
+        self._next_grid_time: Tuple[int, str] = next(self._grid_times, None)
+
+        # Last trade count / traded volume bucket sampled per clock
+        self._trade_marks = {clock.name: 0 for clock in self.trade_clocks}
+        self._volume_marks = {clock.name: 0 for clock in self.volume_clocks}
+
+
+    @property
+    def grids_done(self) -> bool:
+        """ True once every time grid sampled its last time (event, trade and
+        volume clocks left aside). """
+        return self._next_grid_time is None
+
+
+    def skip(self, timestamp: int) -> None:
+        """ Drops the grid times before timestamp (replay resumed from a book
+        saved at timestamp). """
+        while self._next_grid_time is not None and self._next_grid_time[0] < timestamp:
+            self._next_grid_time = next(self._grid_times, None)
+
+
+    def before_message(self, orderbook, message_dtm: int) -> None:
+        """ Samples the time grids at every time before the message. Canceled
+        orders are removed up to each sampling time. """
+        while self._next_grid_time is not None and message_dtm > self._next_grid_time[0]:
+            timestamp = self._next_grid_time[0]
+            orderbook._check_for_order_cancelations(timestamp)
+
+            # Every grid sampling at this time
+            while self._next_grid_time is not None and self._next_grid_time[0] == timestamp:
+                self.sink(self._next_grid_time[1], timestamp, orderbook)
+                self._next_grid_time = next(self._grid_times, None)
+
+
+    def after_message(self, orderbook, message_dtm: int) -> None:
+        """ Samples the event, trade and volume clocks after a message. """
+        for clock in self.event_clocks:
+            self.sink(clock.name, message_dtm, orderbook)
+
+        for clock in self.trade_clocks:
+            mark = orderbook.trade_count // clock.trades
+            if mark > self._trade_marks[clock.name]:
+                self._trade_marks[clock.name] = mark
+                self.sink(clock.name, message_dtm, orderbook)
+
+        for clock in self.volume_clocks:
+            mark = orderbook.traded_volume // clock.volume
+            if mark > self._volume_marks[clock.name]:
+                self._volume_marks[clock.name] = mark
+                self.sink(clock.name, message_dtm, orderbook)
+
+
+class DepthBuffer:
+    """
+    Growing array of depth matrices (see Orderbook.fill_depth_matrix), rows are
+    handed out to be filled in place. The capacity doubles when full.
+    """
+    def __init__(self, depth: int, fields: int, capacity: int=1024) -> None:
+        self._data = np.full((max(capacity, 1), 2, depth, fields), np.nan)
+        self._size = 0
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def next_row(self) -> np.ndarray:
+        """ Returns the next row (view) to fill. """
+        if self._size == len(self._data):
+            data = np.full((2 * len(self._data),) + self._data.shape[1:], np.nan)
+            data[:self._size] = self._data
+            self._data = data
+        row = self._data[self._size]
+        self._size += 1
+        return row
+
+
+    @property
+    def data(self) -> np.ndarray:
+        """ Filled rows. """
+        return self._data[:self._size]
+
+
+class SnapshotSink:
+    """
+    Stores the snapshots of each clock: best limits, spread, liquidity metrics
+    (see Orderbook.get_liquidity_metrics) and the depth matrix of the best 
+    levels (filled in place, see Orderbook.fill_depth_matrix).
+    """
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+        self.rows: Dict[str, List[dict]] = {}
+        self.depths: Dict[str, DepthBuffer] = {}
+
+
+    def __call__(self, clock: str, timestamp: int, orderbook) -> None:
+        if clock not in self.rows:
+            self.rows[clock] = []
+            self.depths[clock] = DepthBuffer(self.depth, len(DEPTH_FIELDS))
+
+        best_bid = orderbook.best_bid.price if orderbook.best_bid is not None else np.nan
+        best_ask = orderbook.best_ask.price if orderbook.best_ask is not None else np.nan
+        spread = round(best_ask - best_bid, 3)
+        if spread <= 0:
+            logger.error(f'{timestamp} - Spread null or negative: {spread}')
+
+        self.rows[clock].append({
+            'timestamp': timestamp,
+            'spread': spread,
+            'best_bid': best_bid,
+            'best_ask': best_ask,
+            **orderbook.get_liquidity_metrics(),
+        })
+        orderbook.fill_depth_matrix(self.depths[clock].next_row())
+
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.rows.values())
+
+
+    def to_frame(self, clock: str) -> pd.DataFrame:
+        """ Returns the snapshots of a clock, depth as columns named
+        {side}_{level}_{field}, eg: 'bids_0_price'. """
+        df = pd.DataFrame.from_records(self.rows.get(clock, []))
+        if len(df) > 0:
+            df['timestamp'] = nanoseconds_to_datetime(df['timestamp'])
+
+        depths = self.depths[clock].data if clock in self.depths else np.empty((0, 2, self.depth, len(DEPTH_FIELDS)))
+        columns = {}
+        for s, side in enumerate(('bids', 'asks')):
+            for n in range(depths.shape[2]):
+                for f, field in enumerate(DEPTH_FIELDS):
+                    columns[f'{side}_{n}_{field}'] = depths[:, s, n, f]
+
+        return pd.concat([df, pd.DataFrame(columns)], axis=1)
@@ -0,0 +1,178 @@
+# Import Built-Ins
+import io
+import os
+from typing import Tuple
+
+# Import Third-Party
+import numpy as np
+
+# Import Homebrew
+from .orderbook import DEPTH_FIELDS
+from .sampling import DepthBuffer
+from src.constants.constants import PATHS
+
+
+# Features of the tensors: the fields of the depth matrix (see
+# Orderbook.fill_depth_matrix), price as a number of ticks from the mid.
+TENSOR_FIELDS = ('ticks',) + DEPTH_FIELDS[1:]
+
+# Tick sizes of the shares by price band (lowest price of the band, tick).
+TICK_SIZES = ((0., 0.001), (10., 0.005), (50., 0.01), (100., 0.05))
+
+# Dtype of the tensors.
+TENSOR_DTYPE = np.float32
+
+
+def tensor_path(isin: str, clock: str) -> str:
+    """ Path of the tensor of an isin for a clock, eg: LOBs_{isin}_1s.npy. """
+    return os.path.join(PATHS['tensors'], isin, f'LOBs_{isin}_{clock}.npy')
+
+
+def timestamps_path(isin: str, clock: str) -> str:
+    """ Path of the timestamps (int64 nanoseconds) of the rows of a tensor. """
+    return os.path.join(PATHS['tensors'], isin, f'LOBs_{isin}_{clock}_timestamps.npy')
+
+
+def tick_sizes(prices: np.ndarray) -> np.ndarray:
+    """ Tick sizes of prices (see TICK_SIZES), NaN for NaN prices. """
+    bounds = np.array([bound for bound, _ in TICK_SIZES])
+    ticks = np.array([tick for _, tick in TICK_SIZES])
+    sizes = ticks[np.clip(np.searchsorted(bounds, prices, side='right') - 1, 0, len(ticks) - 1)]
+    return np.where(np.isnan(prices), np.nan, sizes)
+
+
+def append_npy(path: str, array: np.ndarray, rows: int=None) -> None:
+    """
+    Appends rows to a .npy file (created if missing): the rows are written at
+    the end of the file, then the header is updated with the new shape (the
+    header keeps room for the number of rows to grow, see numpy.lib.format).
+
+    Args:
+        path (str): path of the file.
+        array (np.ndarray): rows, same dtype and row shape as the file.
+        rows (int, optional): rows of the file kept, the next ones are
+            overwritten. Defaults to None (all).
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as file:
+            np.save(file, np.ascontiguousarray(array))
+        os.replace(path + '.tmp', path)
+        return
+
+    with open(path, 'r+b') as file:
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(file)
+        header_size = file.tell()
+        if fortran_order or dtype != array.dtype or shape[1:] != array.shape[1:]:
+            raise ValueError(f'Rows {array.dtype} {array.shape[1:]} do not match {path}: {dtype} {shape[1:]}')
+
+        rows = shape[0] if rows is None else min(rows, shape[0])
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else np.lib.format.write_array_header_2_0
+        write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows + len(array),) + shape[1:]})
+        if len(header.getvalue()) != header_size:
+            raise ValueError(f'Header of {path} cannot grow in place')
+
+        # Rows first, the header only once they are written
+        file.seek(header_size + rows * dtype.itemsize * int(np.prod(shape[1:])))
+        file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate()
+        file.seek(0)
+        file.write(header.getvalue())
+
+
+class TensorSink:
+    """
+    Sink of the snapshots of one clock (see Sampler) as a fixed-shape tensor:
+    the depth matrix of each snapshot is filled in place during the replay,
+    no row is built. Rows are of shape (2 * depth, len(TENSOR_FIELDS)), the
+    bid levels from the best then the ask levels from the best, missing levels
+    as NaN. Rows of successive days are appended to the tensor of the isin, a
+    .npy file read memory-mapped (see open_tensor), with the timestamps of the
+    rows in a sidecar file.
+    """
+    def __init__(self, clock: str, depth: int, tick: float=None) -> None:
+        """
+        Args:
+            clock (str): name of the clock exported.
+            depth (int): number of levels per side.
+            tick (float, optional): tick size. Defaults to None (by price
+                band of the mid, see TICK_SIZES).
+        """
+        self.clock = clock
+        self.depth = depth
+        self.tick = tick
+        self._depths = DepthBuffer(depth, len(DEPTH_FIELDS))
+        self._timestamps = []
+
+
+    def __call__(self, clock: str, timestamp: int, orderbook) -> None:
+        if clock == self.clock:
+            orderbook.fill_depth_matrix(self._depths.next_row())
+            self._timestamps.append(timestamp)
+
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+
+    def to_array(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the tensor of the snapshots (rows, 2 * depth, features)
+        and their timestamps (int64 nanoseconds). """
+        depths = self._depths.data
+        mid = (depths[:, 0, 0, 0] + depths[:, 1, 0, 0]) / 2
+        tick = np.full(len(mid), self.tick) if self.tick is not None else tick_sizes(mid)
+
+        # Ticks computed before the cast (prices exact in float64)
+        shape = (len(depths), 2 * self.depth, len(DEPTH_FIELDS))
+        tensor = depths.reshape(shape).astype(TENSOR_DTYPE)
+        tensor[:, :, 0] = (depths[:, :, :, 0] - mid[:, None, None]).reshape(shape[:2]) / tick[:, None]
+        return tensor, np.array(self._timestamps, dtype=np.int64)
+
+
+    def append(self, isin: str) -> int:
+        """
+        Appends the snapshots to the tensor of the isin (see tensor_path).
+        Snapshots must come after the rows already exported.
+
+        Args:
+            isin (str): isin code of the security.
+
+        Returns:
+            int: number of rows appended.
+        """
+        tensor, timestamps = self.to_array()
+        if len(timestamps) == 0:
+            return 0
+
+        path = timestamps_path(isin, self.clock)
+        exported = np.load(path, mmap_mode='r') if os.path.exists(path) else np.empty(0, dtype=np.int64)
+        rows, last = len(exported), exported[-1] if len(exported) > 0 else None
+        del exported
+        if last is not None and last >= timestamps[0]:
+            raise ValueError(f'Snapshots of {isin} up to {last} already exported')
+
+        # Timestamps last: rows of the tensor without timestamps (interrupted
+        # export) are overwritten
+        append_npy(tensor_path(isin, self.clock), tensor, rows=rows)
+        append_npy(path, timestamps)
+        return len(timestamps)
+
+
+def open_tensor(isin: str, clock: str='1s') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tensor of an isin (memory-mapped) and the timestamps of its rows.
+
+    Args:
+        isin (str): isin code of the security.
+        clock (str, optional): clock exported. Defaults to '1s'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: tensor (rows, 2 * depth, features, see
+            TENSOR_FIELDS) and timestamps (int64 nanoseconds).
+    """
+    timestamps = np.load(timestamps_path(isin, clock))
+    tensor = np.load(tensor_path(isin, clock), mmap_mode='r')
+    return tensor[:len(timestamps)], timestamps
@@ -0,0 +1,123 @@
+# Import Built-Ins
+from typing import List
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+
+
+MEMBERS = ('hft', 'mix', 'non')
+
+
+class TimeWeightedLiquidity:
+    """
+    Time-weighted liquidity accumulator. The state of the book is integrated
+    exactly between consecutive events (messages, cancellations, snapshots):
+    spread, disclosed and hidden sizes at the touch and at the best N levels
+    per member category, and time spent at the touch per member category.
+    Averages are emitted per bar (bars of bar_size nanoseconds aligned on
+    midnight). The orderbook calls advance before changing, with its current
+    state, so the accumulator holds no reference to the book.
+    """
+    __slots__ = ['bar_size', 'depth', 'start', 'fields', '_last_time', '_bar_start',
+                 '_sums', '_covered', '_spread_sum', '_spread_time', '_rows']
+
+    def __init__(self, bar_size: int, depth: int, start: int=None) -> None:
+        """
+        Args:
+            bar_size (int): bar size (int64 nanoseconds).
+            depth (int): number of levels of the depth quantities.
+            start (int, optional): time (int64 nanoseconds) from which the book
+                is integrated, earlier events are ignored. Defaults to None (first
+                event).
+        """
+        self.bar_size = bar_size
+        self.depth = depth
+        self.start = start
+
+        # Fields integrated (in the order of the values given to advance),
+        # except the spread which is only integrated when both sides exist
+        fields = []
+        for side in ('bid', 'ask'):
+            for quantity in ('dis', 'hid'):
+                fields += [f'{side}_touch_{member}_{quantity}' for member in MEMBERS]
+        for side in ('bid', 'ask'):
+            fields += [f'{side}_touch_time_{member}' for member in MEMBERS]
+        for side in ('bid', 'ask'):
+            for quantity in ('dis', 'hid'):
+                fields += [f'{side}_depth_{depth}_{member}_{quantity}' for member in MEMBERS]
+        self.fields = tuple(fields)
+
+        self._last_time: int = None
+        self._bar_start: int = None
+        self._sums: List[float] = [0] * len(self.fields)
+        self._covered: int = 0
+        self._spread_sum: float = 0.0
+        self._spread_time: int = 0
+        self._rows: List[tuple] = []
+
+
+    def advance(self, timestamp: int, spread: float, values: List[int]) -> None:
+        """
+        Integrates the state of the book since the last event up to timestamp.
+
+        Args:
+            timestamp (int): time of the new event (int64 nanoseconds).
+            spread (float): spread since the last event (None if a side is empty).
+            values (List[int]): values of the fields since the last event.
+        """
+        # First event at or after start: the state since the last event is the
+        # state at start, integrated from there
+        if self._last_time is None:
+            if self.start is not None and timestamp < self.start:
+                return
+            self._last_time = timestamp if self.start is None else self.start
+            self._bar_start = self._last_time - self._last_time % self.bar_size
+
+        while timestamp > self._last_time:
+            bar_end = self._bar_start + self.bar_size
+            end = min(timestamp, bar_end)
+            duration = end - self._last_time
+
+            self._sums = [total + value * duration for total, value in zip(self._sums, values)]
+            self._covered += duration
+            if spread is not None:
+                self._spread_sum += spread * duration
+                self._spread_time += duration
+
+            self._last_time = end
+            if end == bar_end:
+                self._close_bar()
+
+
+    def needs(self, timestamp: int) -> bool:
+        """ True if an event at timestamp changes the accumulators (the book
+        state is only needed then). """
+        if self._last_time is None:
+            return self.start is None or timestamp >= self.start
+        return timestamp > self._last_time
+
+
+    def _close_bar(self) -> None:
+        """ Stores the averages of the current bar and starts the next one. """
+        if self._covered > 0:
+            spread = self._spread_sum / self._spread_time if self._spread_time else np.nan
+            averages = [total / self._covered for total in self._sums]
+            self._rows.append((self._bar_start, self._covered / 1e9, spread, *averages))
+
+        self._bar_start += self.bar_size
+        self._sums = [0] * len(self.fields)
+        self._covered = 0
+        self._spread_sum = 0.0
+        self._spread_time = 0
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """ Returns the averages of the bars closed so far (bar start as
+        datetime, seconds covered by the bar, spread and fields). """
+        columns = ['bar_start', 'duration', 'spread', *self.fields]
+        df = pd.DataFrame.from_records(self._rows, columns=columns)
+        df['bar_start'] = pd.to_datetime(df['bar_start'].astype('int64'))
+        return df
@@ -0,0 +1 @@
+from .trade_costs import trade_costs, summarize_trade_costs, pool_summaries, read_quotes
@@ -0,0 +1,245 @@
+# Import Built-Ins
+import heapq
+import os
+from typing import Iterable, List, Tuple
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+from src.constants.constants import PATHS
+from src.volume.volume_by_interval import MEMBER_CATEGORIES, TRADE_COLUMNS
+
+
+# Horizons of the realized spreads and price impacts.
+HORIZONS = ('1s', '5s', '1min', '5min')
+
+# Roles of the members of a trade in the summaries (the aggressor initiates
+# the trade, the passive side provided the liquidity).
+ROLES = ('aggressor', 'passive')
+
+# Quote stream: times (int64 nanoseconds), best bids and best asks.
+Quotes = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def quotes_from_snapshots(df_lob: pd.DataFrame) -> Quotes:
+    """ Quote stream of snapshots (see SnapshotSink): best limits at each
+    snapshot. """
+    times = df_lob['timestamp'].astype('datetime64[ns]').to_numpy().view('int64')
+    return times, df_lob['best_bid'].to_numpy(dtype='float64'), df_lob['best_ask'].to_numpy(dtype='float64')
+
+
+def _same(a: float, b: float) -> bool:
+    """ True if both prices are equal or both NaN (empty side). """
+    return a == b or (np.isnan(a) and np.isnan(b))
+
+
+def quotes_from_changes(df_changes: pd.DataFrame, df_keyframes: pd.DataFrame) -> Quotes:
+    """
+    Quote stream of a change stream (see ChangeStreamSink): best limits from
+    the first keyframe, then at each sample where they change, and at the last
+    sample.
+
+    Args:
+        df_changes (pd.DataFrame): changes, in stream order.
+        df_keyframes (pd.DataFrame): keyframes, in stream order.
+
+    Returns:
+        Quotes: times, best bids and best asks (NaN for an empty side).
+    """
+    if len(df_keyframes) == 0:
+        return np.empty(0, dtype='int64'), np.empty(0), np.empty(0)
+
+    # Prices of the levels in the book, heaps of the prices (removed prices
+    # only dropped once at the top)
+    first = df_keyframes['seq'].iloc[0]
+    keyframe = df_keyframes.loc[df_keyframes['seq'] == first]
+    levels = {
+        'B': set(keyframe.loc[keyframe['side'] == 'B', 'price']),
+        'S': set(keyframe.loc[keyframe['side'] == 'S', 'price']),
+    }
+    heaps = {'B': [-price for price in levels['B']], 'S': list(levels['S'])}
+    heapq.heapify(heaps['B'])
+    heapq.heapify(heaps['S'])
+
+    def best(side: str) -> float:
+        heap = heaps[side]
+        while heap and (-heap[0] if side == 'B' else heap[0]) not in levels[side]:
+            heapq.heappop(heap)
+        if not heap:
+            return np.nan
+        return -heap[0] if side == 'B' else heap[0]
+
+    times = [pd.Timestamp(keyframe['timestamp'].iloc[0]).value]
+    best_bids, best_asks = [best('B')], [best('S')]
+
+    df_changes = df_changes.loc[df_changes['seq'] > first]
+    change_times = df_changes['timestamp'].astype('datetime64[ns]').to_numpy().view('int64')
+    sequences = df_changes['seq'].to_numpy()
+    sides = df_changes['side'].astype(str).to_numpy()
+    prices = df_changes['price'].to_numpy()
+    present = (df_changes.drop(columns=['timestamp', 'seq', 'side', 'price']).to_numpy() != 0).any(axis=1)
+
+    for i in range(len(df_changes)):
+        side, price = sides[i], prices[i]
+        if present[i]:
+            if price not in levels[side]:
+                levels[side].add(price)
+                heapq.heappush(heaps[side], -price if side == 'B' else price)
+        else:
+            levels[side].discard(price)
+
+        # Quote after the last change of the sample, if it changed
+        if i + 1 == len(df_changes) or sequences[i + 1] != sequences[i]:
+            best_bid, best_ask = best('B'), best('S')
+            if not (_same(best_bid, best_bids[-1]) and _same(best_ask, best_asks[-1])):
+                times.append(change_times[i])
+                best_bids.append(best_bid)
+                best_asks.append(best_ask)
+
+    # Quote at the last sample (end of the stream)
+    end = max(pd.Timestamp(df_keyframes['timestamp'].iloc[-1]).value, change_times[-1] if len(change_times) else 0)
+    if end > times[-1]:
+        times.append(end)
+        best_bids.append(best_bids[-1])
+        best_asks.append(best_asks[-1])
+
+    return np.array(times, dtype='int64'), np.array(best_bids, dtype='float64'), np.array(best_asks, dtype='float64')
+
+
+def read_quotes(isin: str, date_str: str) -> Quotes:
+    """
+    Quote stream of an isin for one day from the outputs of
+    04_recreate_orderbooks: the change stream if saved (best limits after every
+    message), the 1s snapshots otherwise. None if neither exists.
+    """
+    folder = os.path.join(PATHS['limit_order_books'], isin)
+    changes_path = os.path.join(folder, f'LOBChanges_{isin}_{date_str}.parquet')
+    keyframes_path = os.path.join(folder, f'LOBKeyframes_{isin}_{date_str}.parquet')
+    if os.path.exists(changes_path) and os.path.exists(keyframes_path):
+        return quotes_from_changes(pd.read_parquet(changes_path), pd.read_parquet(keyframes_path))
+
+    snapshots_path = os.path.join(folder, f'LOBs_{isin}_{date_str}_1s.parquet')
+    if os.path.exists(snapshots_path):
+        return quotes_from_snapshots(pd.read_parquet(snapshots_path, columns=['timestamp', 'best_bid', 'best_ask']))
+    return None
+
+
+def trade_costs(df_trades: pd.DataFrame, quotes: Quotes, horizons: Iterable=HORIZONS) -> pd.DataFrame:
+    """
+    Costs of each continuous trade (t_agg 'A' buyer or 'V' seller initiated),
+    in bps of the mid before the trade: quoted spread, effective spread
+    2 d (p - m), and for each horizon h the realized spread 2 d (p - m_h) and
+    the price impact 2 d (m_h - m), d the direction of the aggressor. The mid
+    before the trade (m) and after h (m_h) are as-of joins of the trade times
+    on the quote stream: last quote strictly before the trade, last quote at
+    or before the trade time + h (NaN after the end of the stream).
+
+    Args:
+        df_trades (pd.DataFrame): trades (VHD), see TRADE_COLUMNS.
+        quotes (Quotes): quote stream (see read_quotes).
+        horizons (Iterable, optional): horizons (str such as '5s' or
+            timedelta). Defaults to HORIZONS.
+
+    Returns:
+        pd.DataFrame: one row per continuous trade, with the member category
+            of the aggressor and of the passive side.
+    """
+    aggressor = df_trades['t_agg'].astype('string').fillna('').to_numpy()
+    df_trades = df_trades.loc[(aggressor == 'A') | (aggressor == 'V')]
+    aggressor = df_trades['t_agg'].astype('string').fillna('').to_numpy()
+
+    times = df_trades['t_dtm_neg'].astype('datetime64[ns]').to_numpy().view('int64')
+    price = df_trades['t_price'].to_numpy(dtype='float64')
+    buyer = df_trades['t_b_type'].astype('string').fillna('').to_numpy()
+    seller = df_trades['t_s_type'].astype('string').fillna('').to_numpy()
+    is_buy = aggressor == 'A'
+    direction = np.where(is_buy, 1., -1.)
+
+    # Quotes of the as-of joins, index -1 (no quote) gives NaN
+    quote_times, best_bids, best_asks = quotes
+    mids = np.append((best_bids + best_asks) / 2, np.nan)
+    spreads = np.append(best_asks - best_bids, np.nan)
+    stream_end = quote_times[-1] if len(quote_times) else np.iinfo('int64').min
+
+    # Prevailing quote: last quote strictly before the trade
+    before = np.searchsorted(quote_times, times, side='left') - 1
+    mid = mids[before]
+
+    df = pd.DataFrame({
+        't_dtm_neg': df_trades['t_dtm_neg'].to_numpy(),
+        't_price': price,
+        't_q_exchanged': df_trades['t_q_exchanged'].to_numpy(dtype='int64'),
+        't_agg': aggressor,
+        'aggressor_type': np.where(is_buy, buyer, seller),
+        'passive_type': np.where(is_buy, seller, buyer),
+        'mid': mid,
+        'quoted_spread': 1e4 * spreads[before] / mid,
+        'effective_spread': 1e4 * 2 * direction * (price - mid) / mid,
+    })
+
+    for horizon in horizons:
+        horizon_ns = pd.Timedelta(horizon).value
+        after = np.searchsorted(quote_times, times + horizon_ns, side='right') - 1
+        after[times + horizon_ns > stream_end] = -1
+        mid_after = mids[after]
+        df[f'realized_spread_{horizon}'] = 1e4 * 2 * direction * (price - mid_after) / mid
+        df[f'price_impact_{horizon}'] = 1e4 * 2 * direction * (mid_after - mid) / mid
+
+    return df
+
+
+def _metric_columns(df: pd.DataFrame) -> List[str]:
+    """ Cost columns of trade_costs. """
+    return [
+        column for column in df.columns
+        if (column in ('quoted_spread', 'effective_spread') or column.startswith(('realized_spread_', 'price_impact_')))
+        and not column.endswith('_volume')
+    ]
+
+
+def summarize_trade_costs(df_costs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Volume-weighted costs per member category (HFT, MIX, NON) of the
+    aggressor and of the passive side. Each cost comes with the volume of the
+    trades where it is defined ({cost}_volume), so summaries can be pooled
+    (see pool_summaries).
+
+    Args:
+        df_costs (pd.DataFrame): costs of the trades (see trade_costs).
+
+    Returns:
+        pd.DataFrame: one row per role and category.
+    """
+    metrics = _metric_columns(df_costs)
+    quantity = df_costs['t_q_exchanged'].to_numpy(dtype='float64')
+    rows = []
+    for role in ROLES:
+        categories = df_costs[f'{role}_type'].to_numpy()
+        for category in MEMBER_CATEGORIES:
+            selected = categories == category
+            row = {'role': role, 'category': category, 'trades': int(selected.sum()), 'volume': int(quantity[selected].sum())}
+            for metric in metrics:
+                values = df_costs[metric].to_numpy()
+                defined = selected & ~np.isnan(values)
+                weights = quantity[defined]
+                row[metric] = (values[defined] * weights).sum() / weights.sum() if weights.sum() > 0 else np.nan
+                row[f'{metric}_volume'] = int(weights.sum())
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def pool_summaries(df_summaries: pd.DataFrame, by: List[str]=['role', 'category']) -> pd.DataFrame:
+    """ Pools summaries of several isins and days (see summarize_trade_costs),
+    costs weighted by the volume where they are defined. """
+    metrics = _metric_columns(df_summaries)
+    df = df_summaries.copy()
+    for metric in metrics:
+        df[metric] = df[metric].fillna(0) * df[f'{metric}_volume']
+
+    df = df.groupby(by, sort=False)[['trades', 'volume', *metrics, *(f'{metric}_volume' for metric in metrics)]].sum()
+    for metric in metrics:
+        volume = df[f'{metric}_volume']
+        df[metric] = (df[metric] / volume).where(volume > 0)
+    return df.reset_index()
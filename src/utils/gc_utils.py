@@ -0,0 +1,84 @@
+# Import Built-Ins
+import gc
+import time
+from contextlib import contextmanager
+
+# Import Third-Party
+
+# Import Homebrew
+
+
+class GcTimer:
+    """
+    Measures the time spent in the cyclic garbage collector (number of
+    collections, total and maximum pause) while the context is active.
+    """
+
+    def __init__(self) -> None:
+        self.collections = 0
+        self.total_time = 0.0
+        self.max_pause = 0.0
+        self._start = None
+
+
+    def __enter__(self):
+        gc.callbacks.append(self._callback)
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        gc.callbacks.remove(self._callback)
+
+
+    def _callback(self, phase: str, info: dict) -> None:
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            pause = time.perf_counter() - self._start
+            self.collections += 1
+            self.total_time += pause
+            self.max_pause = max(self.max_pause, pause)
+            self._start = None
+
+
+    def __repr__(self):
+        return (f'GC: {self.collections} collections, {self.total_time:.4f} seconds '
+                f'(max pause {self.max_pause * 1000:.2f} ms)')
+
+
+@contextmanager
+def replay_gc(mode: str='frozen'):
+    """
+    Garbage collector settings to use around a replay. The orderbook holds no
+    reference cycles, its objects are freed by reference counting, so the
+    cyclic collector only slows the replay down by scanning the live orders.
+
+    Args:
+        mode (str, optional): 'default' leaves the collector untouched, 'tuned'
+            freezes the objects alive before the replay and raises the
+            collection thresholds, 'frozen' freezes them and disables the
+            collector until the end of the replay. Defaults to 'frozen'.
+    """
+    if mode == 'default':
+        yield
+        return
+    if mode not in ('tuned', 'frozen'):
+        raise ValueError(f'Unknown garbage collector mode: {mode}')
+
+    thresholds = gc.get_threshold()
+    was_enabled = gc.isenabled()
+
+    gc.collect()
+    gc.freeze()
+    if mode == 'tuned':
+        gc.set_threshold(100_000, 50, 100)
+    else:
+        gc.disable()
+
+    try:
+        yield
+    finally:
+        gc.set_threshold(*thresholds)
+        if was_enabled:
+            gc.enable()
+        gc.unfreeze()
@@ -0,0 +1,48 @@
+# Import Built-Ins
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from typing import Callable, Iterable, Iterator, Tuple
+
+# Import Third-Party
+
+# Import Homebrew
+
+
+# End of the jobs (a job may be None).
+_NO_JOB = object()
+
+
+def prefetch(jobs: Iterable, load: Callable, depth: int=1) -> Iterator[Tuple[object, Future]]:
+    """
+    Loads the inputs of the next jobs in a background thread while the current
+    job runs. Jobs are yielded in order with the future of their inputs, at
+    most depth jobs are loaded ahead of the current one. Each job is loaded
+    once. Loading should release the GIL (Parquet reads, numpy conversions) to
+    overlap with the job.
+
+    Args:
+        jobs (Iterable): jobs, eg: (isin, date).
+        load (Callable): called with a job, returns its inputs.
+        depth (int, optional): number of jobs loaded ahead. Defaults to 1.
+
+    Yields:
+        Tuple[object, Future]: job and the future of its inputs (result()
+            raises if loading failed).
+    """
+    jobs = iter(jobs)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch') as executor:
+        # Current job and the jobs ahead
+        for job in jobs:
+            pending.append((job, executor.submit(load, job)))
+            if len(pending) > depth:
+                break
+
+        # Next job submitted once the current one is done (at most depth
+        # ahead while it runs)
+        while pending:
+            job, future = pending.popleft()
+            yield job, future
+            next_job = next(jobs, _NO_JOB)
+            if next_job is not _NO_JOB:
+                pending.append((next_job, executor.submit(load, next_job)))
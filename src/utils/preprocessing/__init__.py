@@ -1,3 +1,4 @@
 from .preprocess_events import preprocess_events
-from .preprocess_orders import preprocess_orders
-from .preprocess_trades import preprocess_trades
\ No newline at end of file
+from .preprocess_orders import preprocess_orders, preprocess_orders_to_parquet
+from .preprocess_trades import preprocess_trades
+from .storage_profile import StorageProfile, DEFAULT_PROFILE, COMPACT_PROFILE
\ No newline at end of file
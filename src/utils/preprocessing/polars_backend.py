@@ -0,0 +1,238 @@
+# Import Built-Ins
+import os
+import traceback
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Import Homebrew
+from .preprocess_events import EVENT_COLUMNS, EVENT_DTYPES, transform_events, preprocess_events as pandas_preprocess_events
+from .preprocess_orders import ORDER_COLUMNS, ORDER_DTYPES, transform_orders, preprocess_orders as pandas_preprocess_orders
+from .preprocess_trades import TRADE_COLUMNS, TRADE_DTYPES, transform_trades, preprocess_trades as pandas_preprocess_trades
+from ..other_utils import check_empty_csv
+from src.orderbook.inputs import orders_path, history_path, removed_orders_path
+from src.orderbook.removed_orders import REMOVED_ORDERS_SELECTION, UNVALID_STATES
+from src.constants.constants import STOCKS, PATHS, CLOSING_AUCTION_CUTOFF
+
+
+def _require_polars() -> None:
+    """ Raises if Polars is not installed (the backend is optional). """
+    if pl is None:
+        raise ImportError("The 'polars' backend needs the polars package (pip install polars).")
+
+
+def _polars_dtype(dtype: str):
+    """ Polars dtype of a column read as dtype by pandas (categories are read
+    as strings, then turned into categories like read_csv does). """
+    return {
+        'int8': pl.Int8, 'int16': pl.Int16, 'int32': pl.Int32, 'int64': pl.Int64,
+        'float': pl.Float64, 'float64': pl.Float64,
+    }.get(dtype, pl.String)
+
+
+def _scan_csv(path: str, columns: List[str], dtypes: Dict[str, str]):
+    """ Lazy scan of a file without header, with the dtypes of the pandas
+    preprocessing. """
+    schema = {column: _polars_dtype(dtypes[column]) for column in columns}
+    return pl.scan_csv(path, has_header=False, schema=schema)
+
+
+def _sample_value(column: str, dtype: str):
+    """ Value of a column in the sample row (dates and times parse). """
+    if dtype in ('int8', 'int16', 'int32', 'int64', 'float', 'float64'):
+        return 20170103 if '_d_' in column else 0
+    if '_d_' in column:
+        return '20170103'
+    if '_t_' in column:
+        return '09:00:00'
+    return '0'
+
+
+@lru_cache(maxsize=None)
+def _reference_dtypes(table: str) -> pd.Series:
+    """ Columns and dtypes of the pandas preprocessing (the transform applied
+    to one sample row): the Polars results are cast to them, whatever the
+    pandas version (eg: datetime resolution). """
+    columns, dtypes, transform = {
+        'events': (EVENT_COLUMNS, EVENT_DTYPES, transform_events),
+        'orders': (ORDER_COLUMNS, ORDER_DTYPES, transform_orders),
+        'trades': (TRADE_COLUMNS, TRADE_DTYPES, transform_trades),
+    }[table]
+    df = pd.DataFrame({column: pd.Series([_sample_value(column, dtypes[column])], dtype=dtypes[column]) for column in columns})
+    return transform(df).dtypes
+
+
+def _datetime(date: str, time: str=None, microseconds: str=None):
+    """ Expression of a datetime from date (YYYYMMDD), time (HH:MM:SS) and
+    microseconds columns, null if the date is missing. """
+    if time is None:
+        expression = pl.col(date).cast(pl.String).str.strptime(pl.Datetime('ns'), '%Y%m%d')
+    else:
+        expression = pl.concat_str([pl.col(date), pl.lit(' '), pl.col(time)]).str.strptime(pl.Datetime('ns'), '%Y%m%d %H:%M:%S')
+    if microseconds is not None:
+        expression = expression + pl.duration(microseconds=pl.col(microseconds).cast(pl.Int64))
+    return expression
+
+
+def _to_pandas(df, table: str) -> pd.DataFrame:
+    """ Result of a query as the frame of the pandas preprocessing (same
+    columns, order and dtypes). """
+    dtypes = _reference_dtypes(table)
+    df = df.select(list(dtypes.index)).to_pandas()
+    for column, dtype in dtypes.items():
+        if df[column].dtype != dtype:
+            df[column] = df[column].astype('category' if isinstance(dtype, pd.CategoricalDtype) else dtype)
+    return df
+
+
+def _collect(path: str, query, table: str) -> pd.DataFrame:
+    """ Runs a preprocessing query, errors and empty files handled like the
+    pandas preprocessing. """
+    try:
+        df = query.collect()
+    except Exception as e:
+        print(traceback.format_exc())
+        print(f'Error path: {path}')
+        return pd.DataFrame()
+    if df.height == 0:
+        columns, dtypes = {'events': (EVENT_COLUMNS, EVENT_DTYPES), 'orders': (ORDER_COLUMNS, ORDER_DTYPES), 'trades': (TRADE_COLUMNS, TRADE_DTYPES)}[table]
+        df = pd.DataFrame({column: pd.Series(dtype=dtypes[column]) for column in columns})
+        check_empty_csv(df, path)
+        return df
+    return _to_pandas(df, table)
+
+
+def preprocess_events(path: str) -> pd.DataFrame:
+    """ Preprocessing of the event file with Polars (see
+    preprocess_events.preprocess_events, same result). """
+    _require_polars()
+    query = _scan_csv(path, EVENT_COLUMNS, EVENT_DTYPES).with_columns(
+        e_dt_me=_datetime('e_d_me', 'e_t_me'),
+        e_d_upd=_datetime('e_d_upd'),
+        e_t_op=pl.when(pl.col('e_t_op') == '0').then(None).otherwise(pl.col('e_t_op').str.strptime(pl.Time, '%H:%M:%S')),
+    )
+    df = _collect(path, query, 'events')
+    if 'e_t_op' in df.columns and len(df) > 0:
+        # Missing opening times as NaN (not None), as the pandas preprocessing
+        df['e_t_op'] = df['e_t_op'].astype(object).where(df['e_t_op'].notna(), np.nan)
+    return df
+
+
+def preprocess_orders(path: str) -> pd.DataFrame:
+    """ Preprocessing of the order file with Polars (see
+    preprocess_orders.preprocess_orders, same result). """
+    _require_polars()
+    query = _scan_csv(path, ORDER_COLUMNS, ORDER_DTYPES).with_columns(
+        o_dtm_be=_datetime('o_d_be', 'o_t_be', 'o_m_be'),
+        o_dtm_br=_datetime('o_d_br', 'o_t_br', 'o_m_br'),
+        o_dtm_va=_datetime('o_d_va', 'o_t_va', 'o_m_va'),
+        o_dtm_mo=_datetime('o_d_mo', 'o_t_mo', 'o_m_mo'),
+        o_dtm_p=_datetime('o_d_p', 'o_t_p', 'o_m_p'),
+        o_dt_expiration=_datetime('o_d_expiration', 'o_t_expiration'),
+        o_dt_upd=_datetime('o_d_upd', 'o_t_upd'),
+    )
+    return _collect(path, query, 'orders')
+
+
+def preprocess_trades(path: str) -> pd.DataFrame:
+    """ Preprocessing of the trade file with Polars (see
+    preprocess_trades.preprocess_trades, same result). """
+    _require_polars()
+    query = _scan_csv(path, TRADE_COLUMNS, TRADE_DTYPES).with_columns(
+        t_d_b_en=_datetime('t_d_b_en'),
+        t_d_s_en=_datetime('t_d_s_en'),
+        t_dtm_neg=_datetime('t_d_neg', 't_t_neg', 't_m_neg'),
+    )
+    return _collect(path, query, 'trades')
+
+
+def derive_removed_orders(isin: str, date_str: str) -> pd.DataFrame:
+    """
+    Removed orders of an isin for one day with Polars (see
+    removed_orders.derive_removed_orders, same rows): only the columns needed
+    are read, the last message of each order is kept in the query.
+
+    Args:
+        isin (str): isin code of the security.
+        date_str (str): date (YYYYMMDD).
+
+    Returns:
+        pd.DataFrame: last message of each removed order.
+    """
+    _require_polars()
+    orders = pl.scan_parquet(orders_path(isin, date_str))
+    if os.path.exists(history_path(isin, date_str)):
+        history = pl.scan_parquet(history_path(isin, date_str))
+        query = pl.concat([history.select(REMOVED_ORDERS_SELECTION), orders.select(REMOVED_ORDERS_SELECTION)], how='vertical_relaxed')
+    else:
+        query = orders
+
+    query = query.filter(pl.col('o_id_fd').is_last_distinct())
+    query = query.filter(~pl.col('o_state').cast(pl.String).is_in(UNVALID_STATES))
+    return query.collect().to_pandas()
+
+
+def get_removed_orders_file(isin: str, date_str: str) -> None:
+    """ Derives and saves the removed orders file of an isin for one day with
+    Polars (see removed_orders.get_removed_orders_file). """
+    derive_removed_orders(isin, date_str).to_parquet(removed_orders_path(isin, date_str), index=False)
+
+
+def get_auctions(isins: List[str]=None) -> pd.DataFrame:
+    """
+    Auction times and prices of every isin and day with Polars (see
+    03_get_auctions): the first trade of each file and the first trade after
+    CLOSING_AUCTION_CUTOFF, queries of all the files run in parallel.
+
+    Args:
+        isins (List[str], optional): isin codes. Defaults to None (all).
+
+    Returns:
+        pd.DataFrame: one row per isin and day.
+    """
+    _require_polars()
+    files = []
+    queries = []
+    for isin in isins if isins is not None else STOCKS.all:
+        for file in os.listdir(os.path.join(PATHS['trades'], isin)):
+            trades = pl.scan_parquet(os.path.join(PATHS['trades'], isin, file)).select(['t_dtm_neg', 't_price'])
+            files.append(isin)
+            queries.append(trades.head(1))
+            queries.append(trades.filter(pl.col('t_dtm_neg').dt.time() > CLOSING_AUCTION_CUTOFF).head(1))
+
+    results = pl.collect_all(queries)
+    rows = []
+    for i, isin in enumerate(files):
+        df_open, df_close = results[2 * i].to_pandas(), results[2 * i + 1].to_pandas()
+        auction_open_datetime = df_open.iloc[0].t_dtm_neg
+        rows.append({
+            'isin': isin,
+            'date': auction_open_datetime.date(),
+            'auct_open_datetime': auction_open_datetime,
+            'auct_open_price': df_open.iloc[0].t_price,
+            'auct_close_datetime': df_close.iloc[0].t_dtm_neg if len(df_close) else None,
+            'auct_close_price': df_close.iloc[0].t_price if len(df_close) else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def preprocessing_functions(backend: str) -> Dict[str, Callable]:
+    """ Returns the preprocessing functions (events, orders, trades) of a
+    backend: 'pandas' or 'polars'. """
+    if backend == 'polars':
+        _require_polars()
+        return {'events': preprocess_events, 'orders': preprocess_orders, 'trades': preprocess_trades}
+    if backend == 'pandas':
+        return {
+            'events': pandas_preprocess_events,
+            'orders': pandas_preprocess_orders,
+            'trades': pandas_preprocess_trades,
+        }
+    raise ValueError(f'Unknown backend: {backend}')
@@ -9,6 +9,31 @@ import numpy as np
 from ..other_utils import check_empty_csv
 
 
+# Columns of the event files (no header) and their dtypes.
+EVENT_COLUMNS = [
+    'e_seq', 'e_act_m_state', 'e_d_upd', 'e_d_me', 'e_t_me', 
+    'e_d_suspension', 'e_t_suspension', 'e_ct_state', 'e_value_state',
+    'e_cd_gc', 'e_t_op', 'e_reservation', 'e_isin', 'e_cd_pc'
+]
+
+EVENT_DTYPES = {
+    'e_seq': 'int32',
+    'e_act_m_state': 'category',
+    'e_d_upd': 'object',
+    'e_d_me': 'string',
+    'e_t_me': 'string',
+    'e_d_suspension': 'float',
+    'e_t_suspension': 'float',
+    'e_ct_state': 'float',
+    'e_value_state': 'category',
+    'e_cd_gc': 'category',
+    'e_t_op': 'object',
+    'e_reservation': 'category',
+    'e_isin': 'category',
+    'e_cd_pc': 'category'
+}
+
+
 def preprocess_events(path: str) -> pd.DataFrame:
     """ Preprocessing of the event file. The function will transform the data 
     into a usable database. The data is returned as a pandas dataframe (to then 
@@ -21,31 +46,8 @@ def preprocess_events(path: str) -> pd.DataFrame:
         pd.DataFrame: processed table of the events.
     """
 
-    columns = [
-        'e_seq', 'e_act_m_state', 'e_d_upd', 'e_d_me', 'e_t_me', 
-        'e_d_suspension', 'e_t_suspension', 'e_ct_state', 'e_value_state',
-        'e_cd_gc', 'e_t_op', 'e_reservation', 'e_isin', 'e_cd_pc'
-    ]
-
-    dtypes = {
-        'e_seq': 'int32',
-        'e_act_m_state': 'category',
-        'e_d_upd': 'object',
-        'e_d_me': 'string',
-        'e_t_me': 'string',
-        'e_d_suspension': 'float',
-        'e_t_suspension': 'float',
-        'e_ct_state': 'float',
-        'e_value_state': 'category',
-        'e_cd_gc': 'category',
-        'e_t_op': 'object',
-        'e_reservation': 'category',
-        'e_isin': 'category',
-        'e_cd_pc': 'category'
-    }
-
     try:
-        df = pd.read_csv(path, names=columns, dtype=dtypes)
+        df = pd.read_csv(path, names=EVENT_COLUMNS, dtype=EVENT_DTYPES)
     except Exception as e:
         print(traceback.format_exc())
         print(f'Error path: {path}')
@@ -54,6 +56,19 @@ def preprocess_events(path: str) -> pd.DataFrame:
     if check_empty_csv(df, path):
         return df
     
+    return transform_events(df)
+
+
+def transform_events(df: pd.DataFrame) -> pd.DataFrame:
+    """ Datetime columns built (market event time, update date, programmed
+    opening time), unused columns dropped (see preprocess_events).
+
+    Args:
+        df (pd.DataFrame): rows of the event file as read.
+
+    Returns:
+        pd.DataFrame: processed rows.
+    """
     # Time columns
     new_columns = ['e_dt_me']
     date_columns = ['e_d_me']
@@ -83,4 +98,4 @@ def preprocess_events(path: str) -> pd.DataFrame:
         'e_cd_pc'
         ], inplace=True)
 
-    return df
\ No newline at end of file
+    return df
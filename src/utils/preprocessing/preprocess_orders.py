@@ -1,12 +1,95 @@
 # Import Built-Ins
+import os
 import traceback
+from typing import List
 
 # Import Third-Party
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 # Import Homebrew
 from ..other_utils import check_empty_csv
 from ..time_utils import timeit
+from .storage_profile import CATEGORICAL_COLUMNS, SORTABLE, TIME_COLUMNS, StorageProfile
+
+
+# Rows of an order file read and written at once by
+# preprocess_orders_to_parquet (memory bounded by the chunk, not the file).
+ORDERS_CHUNK_SIZE = 500_000
+
+# Rows read at once from each sorted run when they are merged (see
+# _merge_runs).
+ORDERS_MERGE_BATCH_SIZE = 65_536
+
+# Columns of the order files (no header) and their dtypes.
+ORDER_COLUMNS = [
+    'o_seq', 'o_isin', 'o_d_i', 'o_t_i', 'o_cha_id', 'o_id_fd', 'o_d_be', 
+    'o_t_be', 'o_m_be', 'o_d_br', 'o_t_br', 'o_m_br', 'o_d_va', 'o_t_va',
+    'o_m_va', 'o_d_mo', 'o_t_mo', 'o_m_mo', 'o_d_en', 'o_t_en', 'o_sq_nb',
+    'o_sq_nbm', 'o_d_p', 'o_t_p', 'o_m_p', 'o_state', 'o_currency', 'o_bs',
+    'o_type', 'o_execution', 'o_validity', 'o_d_expiration', 
+    'o_t_expiration', 'o_price', 'o_price_stop', 'o_price_dfpg', 'o_disoff',
+    'o_q_ini', 'o_q_min', 'o_q_dis', 'o_q_neg', 'o_app', 'o_origin',
+    'o_account', 'o_nb_tr','o_q_rem', 'o_d_upd', 'o_t_upd', 'o_member'
+]
+
+ORDER_DTYPES = {
+    'o_seq': 'int32',
+    'o_isin': 'string',
+    'o_d_i': 'string',
+    'o_t_i': 'string',
+    'o_cha_id': 'int16',
+    'o_id_fd': 'int64',
+    'o_d_be': 'string',
+    'o_t_be': 'string',
+    'o_m_be': 'int32',
+    'o_d_br': 'string',
+    'o_t_br': 'string',
+    'o_m_br': 'int32',
+    'o_d_va': 'string',
+    'o_t_va': 'string',
+    'o_m_va': 'int32',
+    'o_d_mo': 'string',
+    'o_t_mo': 'string',
+    'o_m_mo': 'float64',
+    'o_d_en': 'string',
+    'o_t_en': 'string',
+    'o_sq_nb': 'int32',
+    'o_sq_nbm': 'int32',
+    'o_d_p': 'string',
+    'o_t_p': 'string',
+    'o_m_p': 'float64',
+    'o_state': 'category',
+    'o_currency': 'category',
+    'o_bs': 'category',
+    'o_type': 'category',
+    'o_execution': 'category',
+    'o_validity': 'category',
+    'o_d_expiration': 'string',
+    'o_t_expiration': 'string',
+    'o_price': 'float64',
+    'o_price_stop': 'float64',
+    'o_price_dfpg': 'int8',
+    'o_disoff': 'int8',
+    'o_q_ini': 'int32',
+    'o_q_min': 'int32',
+    'o_q_dis': 'int32',
+    'o_q_neg': 'int32',
+    'o_app': 'category',
+    'o_origin': 'category',
+    'o_account': 'category',
+    'o_nb_tr': 'int16',
+    'o_q_rem': 'int32',
+    'o_d_upd': 'string',
+    'o_t_upd': 'string',
+    'o_member': 'category',
+}
+
+# Datetime columns built by transform_orders.
+ORDER_DATETIME_COLUMNS = ['o_dtm_be', 'o_dtm_br', 'o_dtm_va', 'o_dtm_mo', 'o_dtm_p', 'o_dt_expiration', 'o_dt_upd']
 
 
 def preprocess_orders(path: str) -> pd.DataFrame:
@@ -21,71 +104,8 @@ def preprocess_orders(path: str) -> pd.DataFrame:
         pd.DataFrame: processed table of the orders.
     """
 
-    columns = [
-        'o_seq', 'o_isin', 'o_d_i', 'o_t_i', 'o_cha_id', 'o_id_fd', 'o_d_be', 
-        'o_t_be', 'o_m_be', 'o_d_br', 'o_t_br', 'o_m_br', 'o_d_va', 'o_t_va',
-        'o_m_va', 'o_d_mo', 'o_t_mo', 'o_m_mo', 'o_d_en', 'o_t_en', 'o_sq_nb',
-        'o_sq_nbm', 'o_d_p', 'o_t_p', 'o_m_p', 'o_state', 'o_currency', 'o_bs',
-        'o_type', 'o_execution', 'o_validity', 'o_d_expiration', 
-        'o_t_expiration', 'o_price', 'o_price_stop', 'o_price_dfpg', 'o_disoff',
-        'o_q_ini', 'o_q_min', 'o_q_dis', 'o_q_neg', 'o_app', 'o_origin',
-        'o_account', 'o_nb_tr','o_q_rem', 'o_d_upd', 'o_t_upd', 'o_member'
-    ]
-
-    dtypes = {
-        'o_seq': 'int32',
-        'o_isin': 'string',
-        'o_d_i': 'string',
-        'o_t_i': 'string',
-        'o_cha_id': 'int16',
-        'o_id_fd': 'int64',
-        'o_d_be': 'string',
-        'o_t_be': 'string',
-        'o_m_be': 'int32',
-        'o_d_br': 'string',
-        'o_t_br': 'string',
-        'o_m_br': 'int32',
-        'o_d_va': 'string',
-        'o_t_va': 'string',
-        'o_m_va': 'int32',
-        'o_d_mo': 'string',
-        'o_t_mo': 'string',
-        'o_m_mo': 'float64',
-        'o_d_en': 'string',
-        'o_t_en': 'string',
-        'o_sq_nb': 'int32',
-        'o_sq_nbm': 'int32',
-        'o_d_p': 'string',
-        'o_t_p': 'string',
-        'o_m_p': 'float64',
-        'o_state': 'category',
-        'o_currency': 'category',
-        'o_bs': 'category',
-        'o_type': 'category',
-        'o_execution': 'category',
-        'o_validity': 'category',
-        'o_d_expiration': 'string',
-        'o_t_expiration': 'string',
-        'o_price': 'float64',
-        'o_price_stop': 'float64',
-        'o_price_dfpg': 'int8',
-        'o_disoff': 'int8',
-        'o_q_ini': 'int32',
-        'o_q_min': 'int32',
-        'o_q_dis': 'int32',
-        'o_q_neg': 'int32',
-        'o_app': 'category',
-        'o_origin': 'category',
-        'o_account': 'category',
-        'o_nb_tr': 'int16',
-        'o_q_rem': 'int32',
-        'o_d_upd': 'string',
-        'o_t_upd': 'string',
-        'o_member': 'category',
-    }
-
     try:
-        df = pd.read_csv(path, names=columns, dtype=dtypes)
+        df = pd.read_csv(path, names=ORDER_COLUMNS, dtype=ORDER_DTYPES)
     except Exception as e:
         print(traceback.format_exc())
         print(f'Error path: {path}')
@@ -94,10 +114,23 @@ def preprocess_orders(path: str) -> pd.DataFrame:
     if check_empty_csv(df, path):
         return df
 
+    return transform_orders(df)
+
+
+def transform_orders(df: pd.DataFrame) -> pd.DataFrame:
+    """ Datetime columns (o_dtm_*) built from the date, time and microseconds
+    columns, unused columns dropped (see preprocess_orders).
+
+    Args:
+        df (pd.DataFrame): rows of the order file as read.
+
+    Returns:
+        pd.DataFrame: processed rows.
+    """
     date_columns = ['o_d_be', 'o_d_br', 'o_d_va', 'o_d_mo', 'o_d_p', 'o_d_expiration', 'o_d_upd']
     time_columns = ['o_t_be', 'o_t_br', 'o_t_va', 'o_t_mo', 'o_t_p', 'o_t_expiration', 'o_t_upd']
     microseconds_columns = ['o_m_be', 'o_m_br', 'o_m_va', 'o_m_mo', 'o_m_p']
-    new_columns = ['o_dtm_be', 'o_dtm_br', 'o_dtm_va', 'o_dtm_mo', 'o_dtm_p', 'o_dt_expiration', 'o_dt_upd']
+    new_columns = ORDER_DATETIME_COLUMNS
 
     for i, col in enumerate(date_columns):
 
@@ -132,4 +165,181 @@ def preprocess_orders(path: str) -> pd.DataFrame:
         'o_price_dfpg', 'o_disoff',
     ], inplace=True)
 
-    return df
\ No newline at end of file
+    return df
+
+
+def _orders_schema(columns: list, profile: StorageProfile, table: str) -> pa.Schema:
+    """ Arrow schema of the rows written by preprocess_orders_to_parquet, from
+    the dtypes of the order file (not from the values of a chunk): datetimes
+    as nanosecond timestamps, categoricals as string dictionaries. """
+    categorical = {column for column, dtype in ORDER_DTYPES.items() if dtype == 'category'}
+    if profile.dictionary:
+        categorical.update(CATEGORICAL_COLUMNS[table])
+
+    fields = []
+    for column in columns:
+        if column in ORDER_DATETIME_COLUMNS:
+            fields.append(pa.field(column, pa.timestamp('ns')))
+        elif column in categorical:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif ORDER_DTYPES[column] == 'string':
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.field(column, pa.from_numpy_dtype(np.dtype(ORDER_DTYPES[column]))))
+    return pa.schema(fields)
+
+
+def _run_times(table, time_column: str) -> np.ndarray:
+    """ Times of the rows of a run (int64 nanoseconds), missing times last as
+    when the frame is sorted. """
+    times = table.column(time_column).cast(pa.int64())
+    return pc.fill_null(times, np.iinfo(np.int64).max).to_numpy()
+
+
+def _merge_runs(runs: List[str], writer: pq.ParquetWriter, time_column: str, row_group_size: int) -> None:
+    """
+    Merges runs (Parquet files sorted on time_column) into the writer, by row
+    groups of row_group_size rows. The merge is stable (rows of equal times
+    in the order of the runs), only ORDERS_MERGE_BATCH_SIZE rows of each run
+    are read at once.
+
+    Args:
+        runs (List[str]): paths of the runs, in file order.
+        writer (pq.ParquetWriter): writer of the destination.
+        time_column (str): time column the runs are sorted on.
+        row_group_size (int): rows per row group.
+    """
+    batches = [pq.ParquetFile(run).iter_batches(batch_size=ORDERS_MERGE_BATCH_SIZE) for run in runs]
+    buffers = [(np.empty(0, dtype=np.int64), None)] * len(runs)
+    exhausted = [False] * len(runs)
+    pending = []
+
+    while True:
+        # Next batch of each run whose rows were all merged
+        for i, run_batches in enumerate(batches):
+            if not exhausted[i] and len(buffers[i][0]) == 0:
+                batch = next(run_batches, None)
+                if batch is None:
+                    exhausted[i] = True
+                else:
+                    table = pa.Table.from_batches([batch])
+                    buffers[i] = (_run_times(table, time_column), table)
+        if all(exhausted) and all(len(times) == 0 for times, _ in buffers):
+            break
+
+        # Rows before the lowest last time read of the runs not exhausted are
+        # merged. At that time, rows of the runs up to the first one ending
+        # there only (the next runs may have more rows of that time ahead)
+        reading = [i for i in range(len(runs)) if not exhausted[i]]
+        if reading:
+            first = min(reading, key=lambda i: buffers[i][0][-1])
+            bound = buffers[first][0][-1]
+        else:
+            bound, first = np.iinfo(np.int64).max, len(runs)
+
+        merged_times, merged = [], []
+        for i, (times, table) in enumerate(buffers):
+            end = np.searchsorted(times, bound, side='right' if i <= first else 'left')
+            if end > 0:
+                merged_times.append(times[:end])
+                merged.append(table.slice(0, end))
+                buffers[i] = (times[end:], table.slice(end))
+
+        order = np.argsort(np.concatenate(merged_times), kind='stable')
+        pending.append(pa.concat_tables(merged).take(order))
+
+        # Whole row groups written, the rest kept for the next ones
+        table = pa.concat_tables(pending)
+        rows = len(table) - len(table) % row_group_size
+        if rows > 0:
+            writer.write_table(table.slice(0, rows), row_group_size=row_group_size)
+        pending = [table.slice(rows)]
+
+    table = pa.concat_tables(pending)
+    if len(table) > 0:
+        writer.write_table(table, row_group_size=row_group_size)
+
+
+def preprocess_orders_to_parquet(
+    path: str, destination: str, profile: StorageProfile, table: str='orders', chunk_size: int=ORDERS_CHUNK_SIZE
+) -> int:
+    """
+    Preprocessing of the order file by chunks of rows, each chunk parsed,
+    transformed (see transform_orders) and written before the next one is
+    read: memory stays bounded whatever the size of the file. The rows written
+    are those of preprocess_orders followed by profile.write (categorical
+    columns get the categories of the whole file once read). If the profile
+    sorts the rows, each chunk is sorted and written as a run next to the
+    destination, the runs are then merged (external sort, see _merge_runs).
+
+    Args:
+        path (str): path of the order file.
+        destination (str): path of the Parquet file.
+        profile (StorageProfile): storage profile of the Parquet file.
+        table (str, optional): 'orders' or 'histories'. Defaults to 'orders'.
+        chunk_size (int, optional): rows per chunk. Defaults to
+            ORDERS_CHUNK_SIZE.
+
+    Returns:
+        int: number of rows written, 0 if the file could not be preprocessed
+            (the destination is then left as it was).
+    """
+    rows = 0
+    writer = None
+    schema = None
+    time_column = TIME_COLUMNS[table]
+    sort = profile.sort and SORTABLE[table]
+    runs = []
+    try:
+        reader = pd.read_csv(path, names=ORDER_COLUMNS, dtype=ORDER_DTYPES, chunksize=chunk_size)
+        for df in reader:
+            if len(df) == 0:
+                continue
+            df = profile.apply(transform_orders(df), table, sort=sort)
+
+            # Same schema for every chunk (see _orders_schema): datetimes even
+            # if a chunk has none, dictionaries even if a chunk has no category
+            for column in ORDER_DATETIME_COLUMNS:
+                if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+                    df[column] = pd.to_datetime(df[column])
+            chunk = pa.Table.from_pandas(df, preserve_index=False)
+            if schema is None:
+                schema = _orders_schema(list(df.columns), profile, table)
+                writer = pq.ParquetWriter(
+                    destination + '.tmp', schema, compression=profile.compression,
+                    compression_level=profile.compression_level,
+                )
+
+            # Sorted chunk as a run to merge, or rows written in file order
+            if sort:
+                runs.append(f'{destination}.run{len(runs)}.tmp')
+                pq.write_table(chunk.cast(schema), runs[-1], compression='snappy')
+            else:
+                writer.write_table(chunk.cast(schema), row_group_size=profile.row_group_size)
+            rows += len(df)
+
+        if runs:
+            _merge_runs(runs, writer, time_column, profile.row_group_size or chunk_size)
+
+    except Exception as e:
+        print(traceback.format_exc())
+        print(f'Error path: {path}')
+        # Destination left as it was
+        if writer is not None:
+            writer.close()
+            os.remove(destination + '.tmp')
+        return 0
+
+    finally:
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+
+    if writer is None:
+        # Empty file (nothing to stream)
+        profile.write(preprocess_orders(path), destination, table)
+        return 0
+
+    writer.close()
+    os.replace(destination + '.tmp', destination)
+    return rows
@@ -0,0 +1,162 @@
+# Import Built-Ins
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+
+
+# Time column of each table (write order and row group statistics) and whether
+# rows can be sorted on it: history messages are replayed in file order (time
+# priority of the re-entered orders), they are never sorted.
+TIME_COLUMNS = {'orders': 'o_dtm_va', 'histories': 'o_dtm_va', 'trades': 't_dtm_neg'}
+SORTABLE = {'orders': True, 'histories': False, 'trades': True}
+
+# Narrowest dtypes of the integer columns (Parquet stores 8 and 16 bit
+# integers as INT32, the gain is in memory once read and int64 -> int32).
+NARROW_DTYPES = {
+    'orders': {
+        'o_cha_id': 'int16', 'o_sq_nb': 'int32', 'o_sq_nbm': 'int32', 'o_q_ini': 'int32',
+        'o_q_min': 'int32', 'o_q_dis': 'int32', 'o_q_neg': 'int32', 'o_q_rem': 'int32', 'o_nb_tr': 'int16',
+    },
+    'trades': {
+        't_b_sq_nb': 'int32', 't_s_sq_nb': 'int32', 't_q_exchanged': 'int32', 't_tr_nb': 'int32',
+    },
+}
+NARROW_DTYPES['histories'] = NARROW_DTYPES['orders']
+
+# Columns with few values, stored as dictionaries (category once read).
+CATEGORICAL_COLUMNS = {
+    'orders': [
+        'o_member', 'o_account', 'o_bs', 'o_execution', 'o_validity', 'o_type', 'o_state',
+        'o_app', 'o_origin',
+    ],
+    'trades': ['t_app', 't_b_account', 't_s_account', 't_agg', 't_b_type', 't_s_type'],
+}
+CATEGORICAL_COLUMNS['histories'] = CATEGORICAL_COLUMNS['orders']
+
+# Columns never read downstream (replay, removed orders, auctions, volume by
+# interval).
+UNUSED_COLUMNS = {
+    'orders': ['o_sq_nb', 'o_sq_nbm', 'o_q_neg', 'o_app', 'o_origin', 'o_dtm_mo', 'o_dtm_p', 'o_dt_upd'],
+    'trades': ['t_capital', 't_d_b_en', 't_d_s_en', 't_app', 't_b_sq_nb', 't_s_sq_nb', 't_tr_nb'],
+}
+UNUSED_COLUMNS['histories'] = UNUSED_COLUMNS['orders']
+
+
+class StorageProfile:
+    """
+    How the preprocessed files (orders, histories, trades) are written to
+    Parquet: compression codec and level, rows per row group (the row group
+    statistics on the time column let windowed reads skip the rest of the day),
+    rows sorted on the time column, narrow integer dtypes, dictionary encoded
+    categoricals and unused columns dropped.
+    """
+    __slots__ = ['name', 'compression', 'compression_level', 'row_group_size', 'sort',
+                 'narrow_dtypes', 'dictionary', 'drop_unused']
+
+    def __init__(
+        self, name: str, compression: str='snappy', compression_level: int=None,
+        row_group_size: int=None, sort: bool=False, narrow_dtypes: bool=False,
+        dictionary: bool=False, drop_unused: bool=False
+    ) -> None:
+        """
+        Args:
+            name (str): name of the profile (reports).
+            compression (str, optional): Parquet codec. Defaults to 'snappy'.
+            compression_level (int, optional): level of the codec. Defaults to
+                None (codec default).
+            row_group_size (int, optional): rows per row group. Defaults to
+                None (whole file).
+            sort (bool, optional): rows sorted (stable) on the time column.
+                Defaults to False.
+            narrow_dtypes (bool, optional): integer columns cast to
+                NARROW_DTYPES. Defaults to False.
+            dictionary (bool, optional): CATEGORICAL_COLUMNS stored as
+                dictionaries. Defaults to False.
+            drop_unused (bool, optional): UNUSED_COLUMNS dropped. Defaults to
+                False.
+        """
+        self.name = name
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.sort = sort
+        self.narrow_dtypes = narrow_dtypes
+        self.dictionary = dictionary
+        self.drop_unused = drop_unused
+
+
+    def __repr__(self) -> str:
+        return f'StorageProfile({", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)})'
+
+
+    def apply(self, df: pd.DataFrame, table: str, sort: bool=True) -> pd.DataFrame:
+        """
+        Returns the frame as stored with this profile.
+
+        Args:
+            df (pd.DataFrame): preprocessed frame (see preprocess_orders,
+                preprocess_trades).
+            table (str): 'orders', 'histories' or 'trades'.
+            sort (bool, optional): rows sorted if the profile sorts (False for
+                a chunk of a file). Defaults to True.
+
+        Returns:
+            pd.DataFrame: frame to write.
+        """
+        if self.drop_unused:
+            df = df.drop(columns=[column for column in UNUSED_COLUMNS[table] if column in df.columns])
+
+        if self.narrow_dtypes:
+            for column, dtype in NARROW_DTYPES[table].items():
+                if column in df.columns and df[column].dtype != dtype and _fits(df[column], dtype):
+                    df[column] = df[column].astype(dtype)
+
+        if self.dictionary:
+            for column in CATEGORICAL_COLUMNS[table]:
+                if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+                    df[column] = df[column].astype('category')
+
+        time_column = TIME_COLUMNS[table]
+        if sort and self.sort and SORTABLE[table] and time_column in df.columns:
+            if not df[time_column].is_monotonic_increasing:
+                df = df.sort_values(time_column, kind='stable', ignore_index=True)
+        return df
+
+
+    def write(self, df: pd.DataFrame, path: str, table: str) -> None:
+        """
+        Writes a preprocessed frame to Parquet with this profile.
+
+        Args:
+            df (pd.DataFrame): preprocessed frame.
+            path (str): path of the Parquet file.
+            table (str): 'orders', 'histories' or 'trades'.
+        """
+        df = self.apply(df, table)
+        df.to_parquet(
+            path, index=False, compression=self.compression, compression_level=self.compression_level,
+            row_group_size=self.row_group_size,
+        )
+
+
+def _fits(series: pd.Series, dtype: str) -> bool:
+    """ True if the integer values of the series fit in dtype (no missing
+    values). """
+    if not pd.api.types.is_integer_dtype(series) or series.isna().any():
+        return False
+    if len(series) == 0:
+        return True
+    info = np.iinfo(dtype)
+    return info.min <= series.min() and series.max() <= info.max
+
+
+# Files as written so far (row groups sized for windowed reads of the order
+# files) and the compact profile.
+DEFAULT_PROFILE = StorageProfile('default', row_group_size=50_000)
+COMPACT_PROFILE = StorageProfile(
+    'compact', compression='zstd', compression_level=6, row_group_size=50_000, sort=True,
+    narrow_dtypes=True, dictionary=True, drop_unused=True,
+)
@@ -3,10 +3,16 @@ from functools import wraps
 import time
 
 # Import Third-Party
+import numpy as np
+import pandas as pd
 
 # Import Homebrew
 
 
+# Integer used for missing datetimes (NaT) once converted to nanoseconds.
+NAT_NANOSECONDS = np.iinfo('int64').min
+
+
 def timeit(func):
     """ Decorator to measure execution time of a function."""
     @wraps(func)
@@ -17,4 +23,35 @@ def timeit(func):
         total_time = end_time - start_time
         print(f'Function {func.__name__} took {total_time:.4f} seconds.')
         return result
-    return timeit_wrapper
\ No newline at end of file
+    return timeit_wrapper
+
+
+def to_nanoseconds(series: pd.Series) -> np.ndarray:
+    """ Converts a datetime series to an array of int64 nanoseconds since epoch."""
+    return series.astype('datetime64[ns]').to_numpy().view('int64')
+
+
+def datetime_to_nanoseconds(value) -> int:
+    """ 
+    Converts a datetime-like scalar (datetime, pd.Timestamp, np.datetime64) to 
+    int64 nanoseconds since epoch. Missing values give NAT_NANOSECONDS.
+    """
+    if value is None or pd.isna(value):
+        return NAT_NANOSECONDS
+    return pd.Timestamp(value).value
+
+
+def datetime_columns_to_nanoseconds(df: pd.DataFrame) -> pd.DataFrame:
+    """ 
+    Converts (in place) every datetime column of the dataframe to int64 
+    nanoseconds since epoch. Missing values (NaT) become NAT_NANOSECONDS.
+    """
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = to_nanoseconds(df[column])
+    return df
+
+
+def nanoseconds_to_datetime(values) -> pd.DatetimeIndex:
+    """ Converts int64 nanoseconds since epoch back to datetimes (API edges only)."""
+    return pd.to_datetime(np.asarray(values, dtype='int64'), unit='ns')
@@ -0,0 +1 @@
+from .volume_by_interval import volume_by_interval, volume_by_intervals
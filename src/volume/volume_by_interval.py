@@ -0,0 +1,103 @@
+# Import Built-Ins
+from typing import Dict, Iterable
+
+# Import Third-Party
+import pandas as pd
+import numpy as np
+
+# Import Homebrew
+
+
+# Member categories of the trades (t_b_type, t_s_type).
+MEMBER_CATEGORIES = ('HFT', 'MIX', 'NON')
+
+# Columns of the trade files needed.
+TRADE_COLUMNS = ['t_dtm_neg', 't_price', 't_q_exchanged', 't_agg', 't_b_type', 't_s_type']
+
+
+def _trade_values(df_trades: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the values summed per interval, one row per trade: volume, notional,
+    trades, volume per aggressor side (t_agg 'A' buyer, 'V' seller, other for
+    auction trades) and volume per member category of the buyer, the seller 
+    and the aggressor.
+    """
+    quantity = df_trades['t_q_exchanged'].to_numpy(dtype='int64')
+    price = df_trades['t_price'].to_numpy(dtype='float64')
+    aggressor = df_trades['t_agg'].astype('string').fillna('').to_numpy()
+    buyer = df_trades['t_b_type'].astype('string').fillna('').to_numpy()
+    seller = df_trades['t_s_type'].astype('string').fillna('').to_numpy()
+
+    is_buy = aggressor == 'A'
+    is_sell = aggressor == 'V'
+    aggressor_type = np.where(is_buy, buyer, np.where(is_sell, seller, ''))
+
+    values = {
+        'volume': quantity,
+        'notional': quantity * price,
+        'trades': np.ones(len(quantity), dtype='int64'),
+        'volume_buy': np.where(is_buy, quantity, 0),
+        'volume_sell': np.where(is_sell, quantity, 0),
+        'volume_other': np.where(is_buy | is_sell, 0, quantity),
+    }
+    for category in MEMBER_CATEGORIES:
+        name = category.lower()
+        values[f'volume_buyer_{name}'] = np.where(buyer == category, quantity, 0)
+        values[f'volume_seller_{name}'] = np.where(seller == category, quantity, 0)
+        values[f'volume_aggressor_{name}'] = np.where(aggressor_type == category, quantity, 0)
+
+    return pd.DataFrame(values)
+
+
+def _sum_by_interval(
+    times: np.ndarray, values: pd.DataFrame, bar_size: pd.Timedelta
+) -> pd.DataFrame:
+    """ Sums the values per interval (int64 time bins), intervals without 
+    trades between the first and the last one are kept (zeros). """
+    bar_ns = bar_size.value
+    bins = times - times % bar_ns
+
+    df = values.groupby(bins, sort=True).sum()
+    grid = np.arange(bins.min(), bins.max() + bar_ns, bar_ns, dtype='int64')
+    df = df.reindex(grid, fill_value=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = df['notional'].to_numpy() / df['volume'].to_numpy()
+    df.insert(3, 'vwap', np.where(df['volume'].to_numpy() > 0, vwap, np.nan))
+
+    df.index = pd.to_datetime(df.index.to_numpy(dtype='int64'))
+    df.index.name = 'bar_start'
+    return df.reset_index()
+
+
+def volume_by_intervals(
+    df_trades: pd.DataFrame, bar_sizes: Iterable
+) -> Dict[str, pd.DataFrame]:
+    """ Traded volume, notional, trade count, VWAP and aggressor split per 
+    interval, broken down by member category (buyer, seller, aggressor), for 
+    several bar sizes at once (trade values are computed once).
+
+    Args:
+        df_trades (pd.DataFrame): trades (VHD), see TRADE_COLUMNS.
+        bar_sizes (Iterable): bar sizes (str such as '1s', '5min' or 
+            timedelta).
+
+    Returns:
+        Dict[str, pd.DataFrame]: one table per bar size (keys as given, str).
+    """
+    bar_sizes = list(bar_sizes)
+    if len(df_trades) == 0:
+        return {str(bar_size): pd.DataFrame() for bar_size in bar_sizes}
+
+    times = df_trades['t_dtm_neg'].astype('datetime64[ns]').to_numpy().view('int64')
+    values = _trade_values(df_trades)
+
+    return {
+        str(bar_size): _sum_by_interval(times, values, pd.Timedelta(bar_size))
+        for bar_size in bar_sizes
+    }
+
+
+def volume_by_interval(df_trades: pd.DataFrame, bar_size) -> pd.DataFrame:
+    """ Volume by interval for one bar size (see volume_by_intervals). """
+    return volume_by_intervals(df_trades, [bar_size])[str(bar_size)]
@@ -0,0 +1,126 @@
+# Import Built-Ins
+import datetime as dt
+import random
+import unittest
+
+# Import Third-Party
+import pandas as pd
+
+# Import Homebrew
+from src.orderbook.change_stream import CHANGE_FIELDS, ChangeStreamSink, rebuild_levels
+
+
+class _Level:
+    """ Limit level reduced to its quantities (see LimitLevel.quantities). """
+    __slots__ = ['_quantities']
+
+    def __init__(self, quantities: tuple) -> None:
+        self._quantities = quantities
+
+
+    def quantities(self) -> tuple:
+        return self._quantities
+
+
+class _Book:
+    """ Book reduced to its levels and the levels changed (see
+    Orderbook.track_level_changes). """
+    def __init__(self) -> None:
+        self.bids = {}
+        self.asks = {}
+        self._changed_levels = None
+
+
+    def track_level_changes(self) -> None:
+        if self._changed_levels is None:
+            self._changed_levels = set()
+
+
+    def pop_level_changes(self) -> set:
+        changed_levels = self._changed_levels
+        self._changed_levels = set()
+        return changed_levels
+
+
+    def set_level(self, side: str, price: float, quantities: tuple) -> None:
+        """ Sets the quantities of a level, removed if None (emptied levels
+        are sometimes kept with zero quantities, as in the book). """
+        levels = self.bids if side == 'B' else self.asks
+        if quantities is None:
+            levels.pop(price, None)
+        else:
+            levels[price] = _Level(quantities)
+        if self._changed_levels is not None:
+            self._changed_levels.add((side, price))
+
+
+    def levels(self) -> pd.DataFrame:
+        """ Non-empty levels, bids from the best then asks from the best. """
+        rows = []
+        for side, levels, descending in (('B', self.bids, True), ('S', self.asks, False)):
+            prices = sorted((price for price, level in levels.items() if any(level.quantities())), reverse=descending)
+            rows += [(side, price, *levels[price].quantities()) for price in prices]
+        return pd.DataFrame.from_records(rows, columns=['side', 'price', *CHANGE_FIELDS])
+
+
+def _random_quantities(rng: random.Random) -> tuple:
+    disclosed = [rng.choice([0, rng.randint(1, 300)]) for _ in range(3)]
+    hidden = [rng.choice([0, 0, rng.randint(1, 300)]) for _ in range(3)]
+    return (sum(disclosed) + sum(hidden), *disclosed, *hidden)
+
+
+class RebuildLevelsTests(unittest.TestCase):
+    def _compare(self, df_changes: pd.DataFrame, df_keyframes: pd.DataFrame, timestamp: int, expected: pd.DataFrame, depth: int=None) -> None:
+        got = rebuild_levels(df_changes, df_keyframes, timestamp, depth)
+        got = got.astype({'side': str, 'price': 'float64', **{field: 'int64' for field in CHANGE_FIELDS}})
+        expected = expected.astype({'side': str, 'price': 'float64', **{field: 'int64' for field in CHANGE_FIELDS}})
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+    def test_random_streams(self) -> None:
+        second = 10**9
+        start = pd.Timestamp('2017-01-03 09:00:00').value
+        for seed in range(5):
+            rng = random.Random(seed)
+            book = _Book()
+            sink = ChangeStreamSink(keyframe_every=dt.timedelta(seconds=5))
+
+            # Levels set between samples, several samples at the same time
+            # (clocks sampling together), book kept after each time
+            expected = {}
+            timestamp = start
+            for _ in range(300):
+                for _ in range(rng.randint(0, 6)):
+                    side = rng.choice('BS')
+                    price = round((39.9 if side == 'B' else 40.1) + rng.choice([-1, 1]) * rng.randint(0, 20) * 0.005, 3)
+                    draw = rng.random()
+                    book.set_level(side, price, None if draw < 0.2 else (0,) * len(CHANGE_FIELDS) if draw < 0.3 else _random_quantities(rng))
+                if rng.random() < 0.7:
+                    timestamp += rng.randint(1, 2 * second)
+                sink('events', timestamp, book)
+                expected[timestamp] = book.levels()
+
+            df_changes, df_keyframes = sink.to_frames()
+            self.assertGreater(df_keyframes['seq'].nunique(), 10)
+
+            for timestamp, levels in expected.items():
+                self._compare(df_changes, df_keyframes, timestamp, levels)
+
+            # Between samples: the book of the last sample before, none before
+            # the first sample
+            times = sorted(expected)
+            for before, after in zip(times[:-1], times[1:]):
+                if after - before > 1:
+                    self._compare(df_changes, df_keyframes, before + 1, expected[before])
+            self._compare(df_changes, df_keyframes, times[0] - 1, _Book().levels())
+
+            # Best levels only
+            for timestamp in times[::20]:
+                book_levels = expected[timestamp]
+                bids = book_levels.loc[book_levels['side'] == 'B'].head(3)
+                asks = book_levels.loc[book_levels['side'] == 'S'].head(3)
+                self._compare(df_changes, df_keyframes, timestamp, pd.concat([bids, asks]), depth=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,8 @@ from pathlib import Path
 
 # Import Homebrew
 from src.constants.constants import STOCKS, PATHS, DATES
+from src.orderbook.inputs import ReplayTapes, read_day_inputs
+from src.orderbook.replay_cache import open_replay_cache, write_replay_cache
 
 
 def check_integrity() -> None:
@@ -62,6 +64,40 @@ def _check_single_file(path: str, missing_files: list, empty_files: list) -> Non
         missing_files.append(path)
 
 
+def check_replay_cache(isin: str, date_str: str) -> list:
+    """
+    Builds the replay cache of an isin for one day and checks that it gives
+    back the tapes of the input files (trades of the auctions included, their
+    missing aggressor read back as None).
+
+    Returns the tapes that differ.
+    """
+    inputs = read_day_inputs(isin, date_str)
+    tapes = ReplayTapes.from_frames(isin, date_str, inputs.history, inputs.orders, inputs.removed_orders, inputs.trades)
+    write_replay_cache(isin, date_str)
+    cached = open_replay_cache(isin, date_str)
+
+    def same(record: dict, cached_record: dict) -> bool:
+        return all(
+            value == cached_record[key] or (pd.isna(value) and pd.isna(cached_record[key]))
+            for key, value in record.items()
+        )
+
+    different = []
+    pairs = {
+        'history': (tapes.history_messages(), cached.history_messages()),
+        'messages': (list(tapes.order_messages()), list(cached.order_messages())),
+        'trades': (tapes.trades(), cached.trades()),
+    }
+    for tape, (records, cached_records) in pairs.items():
+        if len(records) != len(cached_records) or not all(map(same, records, cached_records)):
+            different.append(tape)
+    for array, cached_array in zip(tapes.removed_orders, cached.removed_orders):
+        if not (array == cached_array).all():
+            different.append('cancellations')
+    return different
+
+
 if __name__ == '__main__':
     print('Checking integrity ...')
     check_integrity()
\ No newline at end of file
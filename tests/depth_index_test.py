@@ -0,0 +1,125 @@
+# Import Built-Ins
+import random
+import unittest
+
+# Import Third-Party
+
+# Import Homebrew
+from src.orderbook.depth_index import DepthIndex, MARKET_PRICES
+
+
+def _ordered(levels: dict, descending: bool) -> list:
+    """ Levels (price, quantity) from the touch outwards, market buy prices
+    first on the bids and last on the asks, market sell prices the other
+    way round. """
+    return sorted(levels.items(), key=lambda level: -level[0] if descending else level[0])
+
+
+def _depth(levels: dict, descending: bool, price: float) -> int:
+    """ Quantity from the touch up to price (included), by a sorted scan. """
+    return sum(
+        quantity for level_price, quantity in levels.items()
+        if (level_price >= price if descending else level_price <= price)
+    )
+
+
+def _fill(levels: dict, descending: bool, quantity: int) -> tuple:
+    """ Worst price and cost of filling quantity, by a sorted scan. """
+    cost = 0.0
+    for price, level_quantity in _ordered(levels, descending):
+        if quantity <= level_quantity:
+            return price, cost + quantity * price
+        cost += level_quantity * price
+        quantity -= level_quantity
+    return None, None
+
+
+class DepthIndexTests(unittest.TestCase):
+    def _check(self, index: DepthIndex, levels: dict) -> None:
+        """ Depth at every price and fills of every size against the
+        references. """
+        levels = {price: quantity for price, quantity in levels.items() if quantity}
+        prices = list(levels) + [39.0, 41.0, 0.5, 99_999.0]
+        for price in prices:
+            self.assertEqual(index.depth(price), _depth(levels, index.descending, price), price)
+
+        total = sum(levels.values())
+        for quantity in list(range(1, min(total, 60) + 1)) + [total // 3, total // 2, total, total + 1]:
+            if quantity <= 0:
+                continue
+            price, cost = index.fill(quantity)
+            expected_price, expected_cost = _fill(levels, index.descending, quantity)
+            self.assertEqual(price, expected_price, quantity)
+            if expected_cost is None:
+                self.assertIsNone(cost)
+            else:
+                self.assertAlmostEqual(cost, expected_cost, places=4)
+
+
+    def _random_book(self, descending: bool, seed: int) -> None:
+        """ Random adds and removals (grid growth, market prices, prices far
+        from the grid), checked along the way. """
+        rng = random.Random(seed)
+        index = DepthIndex(descending)
+        levels = {}
+        for step in range(400):
+            draw = rng.random()
+            if draw < 0.05:
+                price = float(rng.choice(MARKET_PRICES))
+            elif draw < 0.1:
+                # Far away: out of the grid (more than MAX_TICKS ticks)
+                price = round(rng.uniform(2_000, 3_000), 3)
+            elif draw < 0.2:
+                # Grid growth
+                price = round(40 + rng.choice([-1, 1]) * rng.uniform(1, 10 + step), 3)
+            else:
+                price = round(40 + rng.randint(-40, 40) * 0.005, 3)
+
+            # Removals of whole levels or parts, never below 0
+            if levels.get(price) and rng.random() < 0.4:
+                quantity = -rng.randint(1, levels[price])
+            else:
+                quantity = rng.randint(1, 500)
+            index.add(price, quantity)
+            levels[price] = levels.get(price, 0) + quantity
+
+            if step % 25 == 0:
+                self._check(index, levels)
+        self._check(index, levels)
+
+        # Book emptied
+        for price, quantity in list(levels.items()):
+            index.add(price, -quantity)
+            levels[price] = 0
+        self._check(index, levels)
+        self.assertEqual(index.fill(1), (None, None))
+
+
+    def test_bids(self) -> None:
+        for seed in range(5):
+            self._random_book(descending=True, seed=seed)
+
+
+    def test_asks(self) -> None:
+        for seed in range(5):
+            self._random_book(descending=False, seed=seed)
+
+
+    def test_market_prices(self) -> None:
+        bids, asks = DepthIndex(descending=True), DepthIndex(descending=False)
+        for index in (bids, asks):
+            index.add(40.0, 100)
+            index.add(MARKET_PRICES[0], 10)
+            index.add(MARKET_PRICES[1], 20)
+
+        # Market buys are the best bids and the worst asks, sells the other way
+        self.assertEqual(bids.fill(20), (MARKET_PRICES[1], 20 * MARKET_PRICES[1]))
+        self.assertEqual(bids.fill(130), (MARKET_PRICES[0], 20 * MARKET_PRICES[1] + 100 * 40.0))
+        self.assertEqual(asks.fill(10), (MARKET_PRICES[0], 0.0))
+        self.assertEqual(asks.fill(110), (40.0, 100 * 40.0))
+        self.assertEqual(asks.depth(40.0), 110)
+        self.assertEqual(bids.depth(40.0), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,7 @@ from tqdm import tqdm
 # Import Homebrew
 from src.constants.constants import DATES, PATHS, STOCKS
 from src.orderbook.orderbook import Orderbook
+from src.utils.time_utils import datetime_columns_to_nanoseconds
 
 
 # Init Logging Facilities
@@ -35,6 +36,8 @@ class OrderTests(TestCase):
         self.df_h = pd.read_parquet(path_history)
         self.df_t = pd.read_parquet(path_trades)
         self.df_removed = pd.read_parquet(path_removed_orders)
+        for df in (self.df_o, self.df_h, self.df_t, self.df_removed):
+            datetime_columns_to_nanoseconds(df)
         opening_time = pd.to_datetime(df_auction[df_auction.date == dt.date(2017, 1, 2)].auct_open_time).item().time()
         self.opening_datetime = dt.datetime(2017, 1, 2) + dt.timedelta(hours=opening_time.hour, minutes=opening_time.minute, seconds=opening_time.second, microseconds=opening_time.microsecond)
         self.closing_datetime = dt.datetime(2017, 1, 2) + dt.timedelta(hours=17, minutes=30) # arbitrary
@@ -72,12 +75,12 @@ class OrderTests(TestCase):
         dic = {36.665: 30}
 
         self.assertEqual(lob.get_levels()['bids'], dic) 
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_hft, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_mixed, 10)
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_non, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_hft, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_mixed, 20)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_non, 0)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_hft, 0)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_mixed, 10)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_non, 0)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_hft, 0)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_mixed, 20)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_non, 0)
         
 
     def test_history_orders_change_in_price_then_quantity(self):
@@ -96,12 +99,12 @@ class OrderTests(TestCase):
 
         dic = {30.51: 200}
         self.assertEqual(lob.get_levels()['bids'], dic)
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_hft, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_mixed, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.disclosed_size_non, 200)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_hft, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_mixed, 0)
-        self.assertEqual(lob._orders[o_id].parent_limit.hidden_size_non, 0)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_hft, 0)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_mixed, 0)
+        self.assertEqual(lob.get_limit_level(o_id).disclosed_size_non, 200)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_hft, 0)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_mixed, 0)
+        self.assertEqual(lob.get_limit_level(o_id).hidden_size_non, 0)
     
 
     def test_auction_prices_and_trades_january(self):
@@ -115,7 +118,7 @@ class OrderTests(TestCase):
             
             date_str = format(date, '%Y%m%d')
             date_datetime = dt.datetime.strptime(date_str, '%Y%m%d').date()
-            auction1_limit = dt.datetime.strptime(date_str, '%Y%m%d') + dt.timedelta(hours=9, minutes=0, seconds=30)
+            auction1_limit = pd.Timestamp(dt.datetime.strptime(date_str, '%Y%m%d') + dt.timedelta(hours=9, minutes=0, seconds=30)).value
 
             # Read history file (VHOXhistory)
             history_name = f'VHOXhistory_{isin}_{date_str}.parquet'
@@ -131,6 +134,9 @@ class OrderTests(TestCase):
             removed_orders_name = f'removedOrders_{isin}_{date_str}.parquet'
             removed_orders_path = os.path.join(PATHS['removed_orders'], isin, removed_orders_name)
             df_removed_orders = pd.read_parquet(removed_orders_path)
+
+            for df in (df_history, df_orders, df_removed_orders):
+                datetime_columns_to_nanoseconds(df)
         
             # WE FIRST ADD TO THE BOOK ALL ORDERS PRESENT BEFORE THE START OF THE DAY
             #---------------------------------------------------------------------------
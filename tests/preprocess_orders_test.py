@@ -0,0 +1,114 @@
+# Import Built-Ins
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Import Third-Party
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Import Homebrew
+from src.utils.preprocessing import StorageProfile, DEFAULT_PROFILE, COMPACT_PROFILE
+from src.utils.preprocessing.preprocess_orders import ORDER_COLUMNS, preprocess_orders, preprocess_orders_to_parquet
+
+
+def _write_order_file(path: str, rows: int, seed: int=0) -> None:
+    """ Synthetic order file (VHOX, no header): times out of order with ties,
+    some validity times and categories missing. """
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(9 * 3600, 9 * 3600 + 120, rows)
+    times = pd.to_datetime(seconds, unit='s').strftime('%H:%M:%S')
+    columns = {}
+    for column in ORDER_COLUMNS:
+        if column.startswith('o_d_'):
+            columns[column] = np.full(rows, '20170103', dtype=object)
+        elif column.startswith('o_t_'):
+            columns[column] = times
+        elif column.startswith('o_m_'):
+            columns[column] = rng.choice([0, 250_000, 500_000], rows)
+        else:
+            columns[column] = rng.integers(0, 50, rows)
+    df = pd.DataFrame(columns)
+    df['o_isin'] = 'FR0000120404'
+    df['o_seq'] = np.arange(rows)
+    for column in ['o_state', 'o_type', 'o_member', 'o_account', 'o_app', 'o_origin', 'o_execution', 'o_validity', 'o_currency']:
+        df[column] = rng.choice(['A', 'B', '1', '2'], rows)
+    df['o_bs'] = rng.choice(['B', 'S'], rows)
+    df['o_price'] = rng.integers(4000, 4100, rows) / 100
+    df['o_price_stop'] = 0.0
+
+    # Categories missing in the first rows, validity times missing in some
+    df.loc[:200, 'o_execution'] = None
+    df.loc[rng.random(rows) < 0.02, 'o_d_va'] = None
+    df.to_csv(path, header=False, index=False)
+
+
+def _read(path: str) -> pd.DataFrame:
+    """ Parquet file with datetimes in nanoseconds and categories as values. """
+    df = pd.read_parquet(path)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].astype('datetime64[ns]')
+    return df
+
+
+class PreprocessOrdersTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'VHOX_TEST.csv')
+        _write_order_file(self.path, 1_000)
+
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+
+    def _compare(self, profile: StorageProfile, chunk_size: int) -> str:
+        """ Writes the file whole and streamed, checks both are equal. Returns
+        the path of the streamed file. """
+        whole = os.path.join(self.folder.name, f'whole_{profile.name}.parquet')
+        streamed = os.path.join(self.folder.name, f'streamed_{profile.name}.parquet')
+        profile.write(preprocess_orders(self.path), whole, 'orders')
+        rows = preprocess_orders_to_parquet(self.path, streamed, profile, chunk_size=chunk_size)
+
+        self.assertEqual(rows, 1_000)
+        pd.testing.assert_frame_equal(_read(whole), _read(streamed))
+        self.assertEqual(sorted(os.listdir(self.folder.name)), sorted(['VHOX_TEST.csv', os.path.basename(whole), os.path.basename(streamed)]))
+        return streamed
+
+
+    @mock.patch('src.utils.preprocessing.preprocess_orders.ORDERS_MERGE_BATCH_SIZE', 16)
+    def test_compact_profile(self) -> None:
+        streamed = self._compare(COMPACT_PROFILE, chunk_size=137)
+        self.assertTrue(pd.read_parquet(streamed, columns=['o_dtm_va'])['o_dtm_va'].dropna().is_monotonic_increasing)
+
+
+    @mock.patch('src.utils.preprocessing.preprocess_orders.ORDERS_MERGE_BATCH_SIZE', 7)
+    def test_row_groups(self) -> None:
+        profile = StorageProfile('small', sort=True, dictionary=True, row_group_size=64)
+        streamed = self._compare(profile, chunk_size=100)
+        metadata = pq.ParquetFile(streamed).metadata
+        sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        self.assertEqual(sizes, [64] * 15 + [40])
+
+
+    def test_default_profile(self) -> None:
+        self._compare(DEFAULT_PROFILE, chunk_size=137)
+
+
+    def test_failure_keeps_destination(self) -> None:
+        destination = os.path.join(self.folder.name, 'orders.parquet')
+        pd.DataFrame({'o_id_fd': [1]}).to_parquet(destination)
+        with open(self.path, 'a') as file:
+            file.write('x,' * (len(ORDER_COLUMNS) - 1) + 'x\n')
+
+        self.assertEqual(preprocess_orders_to_parquet(self.path, destination, COMPACT_PROFILE, chunk_size=137), 0)
+        self.assertEqual(pd.read_parquet(destination).shape, (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
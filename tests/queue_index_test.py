@@ -0,0 +1,92 @@
+# Import Built-Ins
+import random
+import unittest
+
+# Import Third-Party
+
+# Import Homebrew
+from src.orderbook.order import Order, OrderList
+from src.orderbook.queue_index import QueueIndex
+
+
+def _order(o_id_fd: int, quantity: int, disclosed: int) -> Order:
+    """ Limit order of a quantity, part of it disclosed. """
+    return Order({
+        'o_id_cha': 0, 'o_id_fd': o_id_fd, 'o_member': 'HFT', 'o_account': '1', 'o_bs': 'B',
+        'o_execution': None, 'o_validity': '0', 'o_type': '2', 'o_price': 40.0, 'o_price_stop': 0.0,
+        'o_q_ini': quantity, 'o_q_min': 0, 'o_q_dis': disclosed, 'o_dt_expiration': None,
+        'o_dtm_be': 0, 'o_dtm_va': 0,
+    })
+
+
+def _ahead(orders: OrderList, order: Order) -> tuple:
+    """ Position, remaining and displayed quantity ahead of an order, by a
+    scan of the queue. """
+    position = quantity = displayed = 0
+    for other in orders.orders.values():
+        if other is order:
+            return position, quantity, displayed
+        position += 1
+        quantity += other.o_q_rem
+        displayed += min(other.o_q_rem, other.o_q_dis)
+    raise KeyError(order.o_id_fd)
+
+
+class QueueIndexTests(unittest.TestCase):
+    def _check(self, orders: OrderList, queue: QueueIndex) -> None:
+        for order in orders.orders.values():
+            self.assertEqual(queue.ahead(order), _ahead(orders, order), order.o_id_fd)
+
+
+    def test_random_queues(self) -> None:
+        for seed in range(5):
+            rng = random.Random(seed)
+            orders = OrderList()
+            for o_id_fd in range(5):
+                orders.append(_order(o_id_fd, rng.randint(1, 500), rng.randint(0, 500)))
+            queue = QueueIndex(orders)
+            next_id = 5
+
+            # Appends (slots used up, trees rebuilt), removals anywhere in the
+            # queue, partial fills and disclosed quantity changes
+            for step in range(600):
+                draw = rng.random()
+                if draw < 0.4 or len(orders) == 0:
+                    order = _order(next_id, rng.randint(1, 500), rng.randint(0, 500))
+                    next_id += 1
+                    orders.append(order)
+                    queue.append(order)
+                elif draw < 0.7:
+                    order = rng.choice(list(orders.orders.values()))
+                    orders.remove(order)
+                    queue.remove(order)
+                    self.assertIsNone(order.queue_slot)
+                else:
+                    order = rng.choice(list(orders.orders.values()))
+                    displayed = min(order.o_q_rem, order.o_q_dis)
+                    quantity = order.o_q_rem
+                    order.o_q_rem = rng.randint(1, order.o_q_rem)
+                    order.o_q_dis = rng.randint(0, 500)
+                    queue.update(order, order.o_q_rem - quantity, min(order.o_q_rem, order.o_q_dis) - displayed)
+
+                if step % 10 == 0:
+                    self._check(orders, queue)
+            self._check(orders, queue)
+
+
+    def test_remove_after_change(self) -> None:
+        # Values of the slot are removed whatever the quantities of the order
+        orders = OrderList()
+        first, second = _order(1, 100, 40), _order(2, 50, 50)
+        orders.append(first)
+        orders.append(second)
+        queue = QueueIndex(orders)
+
+        first.o_q_rem = 0
+        orders.remove(first)
+        queue.remove(first)
+        self.assertEqual(queue.ahead(second), (0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()